@@ -0,0 +1,117 @@
+"""
+get_dict 性能基准：对比之前的实现（find/rfind + 正则 + 逐个解析配对的 {}）和当前的实现
+
+运行：python -m benchmarks.get_dict_benchmark
+"""
+
+import json
+import re
+import time
+from collections.abc import Callable
+
+from utils.get_dict import get_dict
+
+
+def legacy_get_dict(text: str) -> dict | None:
+    """
+    之前的实现，仅用于对比
+    """
+    # 方式1：find
+    start_pos = text.find("{")
+    end_pos = text.rfind("}") + 1
+    if 0 <= start_pos < end_pos:
+        json_str = text[start_pos:end_pos]
+        try:
+            parsed = json.loads(json_str)
+            return parsed
+        except json.JSONDecodeError:
+            pass
+
+    # 方式2，正则
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    if match:
+        potential_json = match.group(0)
+        try:
+            # 验证是否是有效的JSON
+            parsed = json.loads(potential_json)
+            return parsed
+        except json.JSONDecodeError:
+            pass
+
+    # 方式3：遍历
+    brace_count = 0
+    start_pos = None
+
+    for i, char in enumerate(text):
+        if char == "{":
+            if brace_count == 0:
+                # 第一个 { 位置
+                start_pos = i
+            # 遇到 {，所有存在一层{}，数量 +1
+            brace_count += 1
+        elif char == "}":
+            # 遇到 }，所有从存放 {} 数量的 brace_count 中 -1
+            brace_count -= 1
+            # 减到最后，已经遍历了所有的 {}
+            if brace_count == 0 and start_pos is not None:
+                # 找到第一个 { 到最后一个 } 之间的内容
+                json_candidate = text[start_pos : i + 1]
+                try:
+                    parsed = json.loads(json_candidate)
+                    return parsed
+                except json.JSONDecodeError:
+                    pass
+
+    raise ValueError("无法从文本中提取到有效的 JSON 数据")
+
+
+def build_corpus(scale: int = 1) -> dict[str, str]:
+    """
+    构造基准语料，scale 控制文本长度
+    """
+    answer = {"title": "结果", "items": [{"id": i, "text": f"item {i}"} for i in range(20)], "ok": True}
+    answer_json = json.dumps(answer, ensure_ascii=False)
+    prose = "这是模型在给出结果前的一段分析说明，其中提到了一些内容。" * 20 * scale
+    return {
+        # 长文本中夹带一个 json 对象
+        "long_output": f"{prose}\n```json\n{answer_json}\n```\n{prose}",
+        # 说明文字中有大量不成对的 {，之前的实现逐个尝试解析
+        "many_open_braces": "{ 说明 " * 2000 * scale + answer_json,
+        # 多层嵌套的无效 json，之前的实现中每一层都会被完整解析一次
+        "nested_invalid": '{"a": [' * 200 + "x" + "]}" * 200 + answer_json,
+        # 字符串中包含不成对的括号，后面的说明文字中也有括号
+        "braces_in_strings": (
+            prose + json.dumps({"code": "if (a) { b(); " * 200 * scale, "ok": True}) + " 其中 {a} 为占位符"
+        ),
+        # 被截断的 json（超出 max_completion_tokens），其中已经输出完整的子对象不应被当作结果
+        "truncated": prose + '{"items": [' + '{"v": "{x}"}, ' * 1000 * scale,
+        # 多个对象，之前的实现先从第一个 { 解析到最后一个 }
+        "multiple_objects": (answer_json + " 以及 ") * 200 * scale,
+    }
+
+
+def run(func: Callable[[str], dict], text: str, repeat: int) -> tuple[float, str]:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        try:
+            result = func(text)
+        except ValueError:
+            result = None
+    elapsed = (time.perf_counter() - start) / repeat
+    return elapsed, "ok" if isinstance(result, dict) else "none"
+
+
+def main(scale: int = 1, repeat: int = 5):
+    print(f"{'case':<20}{'chars':>10}{'legacy(ms)':>14}{'current(ms)':>14}{'speedup':>10}  result")
+    for name, text in build_corpus(scale).items():
+        legacy_elapsed, legacy_result = run(legacy_get_dict, text, repeat)
+        current_elapsed, current_result = run(get_dict, text, repeat)
+        speedup = legacy_elapsed / current_elapsed if current_elapsed else float("inf")
+        print(
+            f"{name:<20}{len(text):>10}{legacy_elapsed * 1000:>14.3f}{current_elapsed * 1000:>14.3f}"
+            f"{speedup:>9.1f}x  {legacy_result}/{current_result}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+OpenAILLMInvoke.invoke 负载基准：在本地 mock 服务（tests/mock_openai_server.py）上以 N 个并发会话
+分别运行流式、非流式和工具调用（web_search + mock Serper）三种模式，统计吞吐量、首 token 延迟（TTFT）和总耗时的分位数
+mock 服务运行在单独的线程和事件循环中，不占用被测调用的事件循环
+
+运行：python -m benchmarks.invoke_load_benchmark --requests 256 --concurrency 32 --token-interval 0.01
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+
+from pydantic import BaseModel
+
+from engines.llm.openai_llm_invoke import OpenAILLMInvoke
+from engines.tools.tool_services.web_search.serper_google_search import SerperGoogleSearch
+from engines.tools.tool_services.web_search_factory import WebSearchFactory
+from tests.mock_openai_server import MockOpenAIServer
+
+MODES = ("stream", "non_stream", "tool")
+
+
+class LoadStats(BaseModel):
+    mode: str
+    requests: int
+    concurrency: int
+    errors: int
+    elapsed: float  # 总耗时（秒）
+    throughput: float  # 每秒完成的请求数
+    ttft: dict[str, float]  # 首 token 延迟分位数（秒），非流式模式为总耗时
+    latency: dict[str, float]  # 总耗时分位数（秒），流式模式为读取完最后一个 chunk
+
+
+class ThreadedMockServer:
+    """
+    在单独的线程中运行 MockOpenAIServer
+    """
+
+    def __init__(self, **server_kwargs):
+        self.server = MockOpenAIServer(**server_kwargs)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="mock_openai_server", daemon=True)
+
+    def __enter__(self) -> MockOpenAIServer:
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self.server.start(), self._loop).result()
+        return self.server
+
+    def __exit__(self, *exc_info):
+        asyncio.run_coroutine_threadsafe(self.server.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    values = sorted(values)
+    return {
+        name: values[min(len(values) - 1, int(len(values) * q))]
+        for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))
+    }
+
+
+async def run_load(llm_invoke: OpenAILLMInvoke, mode: str, requests: int, concurrency: int) -> LoadStats:
+    """
+    以 concurrency 个并发会话执行 requests 次 invoke
+
+    :param mode: stream、non_stream 或 tool（非流式，每次调用执行一次 web_search 工具调用）
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    ttfts, latencies = [], []
+    errors = 0
+
+    async def run_one(index: int):
+        nonlocal errors
+        async with semaphore:
+            start_time = time.perf_counter()
+            ttft = None
+            if mode == "stream":
+                result = await llm_invoke.invoke(user_prompt=f"q{index}", model_id="mock", is_stream=True)
+                contents = []
+                if result is not None:
+                    async for content in result:
+                        if ttft is None:
+                            ttft = time.perf_counter() - start_time
+                        contents.append(content)
+                    result = "".join(contents)
+            elif mode == "tool":
+                result = await llm_invoke.invoke(user_prompt=f"tool:q{index}", model_id="mock", tools=["web_search"])
+            else:
+                result = await llm_invoke.invoke(user_prompt=f"q{index}", model_id="mock")
+
+            latency = time.perf_counter() - start_time
+            if not result:
+                errors += 1
+                return
+            latencies.append(latency)
+            ttfts.append(ttft if ttft is not None else latency)
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*[run_one(index) for index in range(requests)])
+    elapsed = time.perf_counter() - start_time
+    return LoadStats(
+        mode=mode,
+        requests=requests,
+        concurrency=concurrency,
+        errors=errors,
+        elapsed=elapsed,
+        throughput=(requests - errors) / elapsed,
+        ttft=percentiles(ttfts),
+        latency=percentiles(latencies),
+    )
+
+
+async def run_benchmark(
+    modes: tuple[str, ...] = MODES, requests: int = 128, concurrency: int = 16, **server_kwargs
+) -> list[LoadStats]:
+    results = []
+    with ThreadedMockServer(tool_name="web_search", tool_argument="query", **server_kwargs) as server:
+        WebSearchFactory.set_search_instance(
+            "serper", SerperGoogleSearch(api_key="mock", base_url=server.search_base_url)
+        )
+        llm_invoke = OpenAILLMInvoke(api_key="mock", base_url=server.base_url)
+        try:
+            # 预热连接池
+            await run_load(llm_invoke, "non_stream", min(concurrency, requests), concurrency)
+            results.extend([await run_load(llm_invoke, mode, requests, concurrency) for mode in modes])
+        finally:
+            await llm_invoke.endpoint_pool.aclose()
+            await WebSearchFactory.aclose_all()
+    return results
+
+
+def print_results(results: list[LoadStats]):
+    print(
+        f"{'mode':<12}{'requests':>10}{'conc':>6}{'errors':>8}{'req/s':>10}"
+        f"{'ttft p50/p95/p99 (ms)':>26}{'latency p50/p95/p99 (ms)':>29}"
+    )
+    for stats in results:
+        ttft = "/".join(f"{value * 1000:.1f}" for value in stats.ttft.values())
+        latency = "/".join(f"{value * 1000:.1f}" for value in stats.latency.values())
+        print(
+            f"{stats.mode:<12}{stats.requests:>10}{stats.concurrency:>6}{stats.errors:>8}{stats.throughput:>10.1f}"
+            f"{ttft:>26}{latency:>29}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAILLMInvoke.invoke 负载基准")
+    parser.add_argument("--modes", default=",".join(MODES), help=f"逗号分隔，可选 {', '.join(MODES)}")
+    parser.add_argument("--requests", type=int, default=128, help="每种模式的调用次数")
+    parser.add_argument("--concurrency", type=int, default=16, help="并发会话数")
+    parser.add_argument("--response-delay", type=float, default=0.0, help="mock 模型返回响应头前的等待时间（秒）")
+    parser.add_argument("--first-token-delay", type=float, default=0.05, help="mock 模型的首 token 延迟（秒）")
+    parser.add_argument("--token-interval", type=float, default=0.005, help="mock 模型相邻 chunk 的间隔（秒）")
+    parser.add_argument("--chunk-size", type=int, default=4, help="mock 模型每个 chunk 的字符数")
+    parser.add_argument("--search-delay", type=float, default=0.02, help="mock Serper 接口的响应时间（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="mock 模型返回 429 的概率")
+    args = parser.parse_args()
+
+    results = asyncio.run(
+        run_benchmark(
+            modes=tuple(mode.strip() for mode in args.modes.split(",") if mode.strip()),
+            requests=args.requests,
+            concurrency=args.concurrency,
+            response_delay=args.response_delay,
+            first_token_delay=args.first_token_delay,
+            token_interval=args.token_interval,
+            chunk_size=args.chunk_size,
+            search_delay=args.search_delay,
+            error_rate=args.error_rate,
+            error_status=429,
+        )
+    )
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+_stream_generator 每个 chunk 的额外开销：对比不设置回调、设置 MetricsCollector 和事件流调用（event_stream=True）时的耗时
+上游流式响应用内存中的 chunk 代替，只测量生成器本身
+
+运行：python -m benchmarks.stream_overhead_benchmark
+"""
+
+import asyncio
+import time
+
+from openai.types.chat import ChatCompletionChunk
+
+from engines.llm.invoke_metrics import MetricsCollector, StreamObserver
+from engines.llm.llm_schema import InvocationContext
+from engines.llm.openai_llm_invoke import OpenAILLMInvoke, global_conversation_registry
+
+
+class InMemoryStream:
+    def __init__(self, chunks: list[ChatCompletionChunk]):
+        self._chunks = iter(chunks)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> ChatCompletionChunk:
+        try:
+            return next(self._chunks)
+        except StopIteration:
+            raise StopAsyncIteration from None
+
+    async def close(self):
+        pass
+
+
+def build_chunks(count: int) -> list[ChatCompletionChunk]:
+    return [
+        ChatCompletionChunk.model_validate(
+            {
+                "id": "chunk",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": "mock",
+                "choices": [{"index": 0, "delta": {"content": "token"}, "finish_reason": None}],
+            }
+        )
+        for _ in range(count)
+    ]
+
+
+async def consume(llm_invoke: OpenAILLMInvoke, chunks: list[ChatCompletionChunk], mode: str) -> float:
+    entry = global_conversation_registry.register(f"benchmark-{mode}")
+    ctx = InvocationContext(model_id="mock")
+    observer = StreamObserver([MetricsCollector()], ctx, "mock") if mode == "metrics" else None
+    start_time = time.perf_counter()
+    text_generator = OpenAILLMInvoke._stream_generator(
+        chunks[0], InMemoryStream(chunks[1:]), entry, observer=observer, event_ctx=ctx if mode == "events" else None
+    )
+    generator = text_generator
+    if mode == "events":
+        # 事件流调用：invoke 直接返回文本生成器，只测量事件包装本身的开销
+        async def invoke_coro():
+            return text_generator
+
+        generator = llm_invoke._event_generator(ctx, invoke_coro())
+    async for _ in generator:
+        pass
+    return time.perf_counter() - start_time
+
+
+async def run(chunk_count: int, repeat: int):
+    chunks = build_chunks(chunk_count)
+    results = {}
+    llm_invoke = OpenAILLMInvoke(api_key="xxx", base_url="http://127.0.0.1:1/v1")
+    for mode in ("baseline", "metrics", "events"):
+        results[mode] = min([await consume(llm_invoke, chunks, mode) for _ in range(repeat)])
+    print(f"{'chunks':<10}" + "".join(f"{mode + '(ns/chunk)':>22}" for mode in results))
+    print(f"{chunk_count:<10}" + "".join(f"{elapsed / chunk_count * 1e9:>22.0f}" for elapsed in results.values()))
+
+
+def main(chunk_count: int = 100_000, repeat: int = 5):
+    asyncio.run(run(chunk_count, repeat))
+
+
+if __name__ == "__main__":
+    main()
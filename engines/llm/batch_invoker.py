@@ -0,0 +1,253 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Iterable
+from typing import TYPE_CHECKING
+
+from engines.llm.llm_schema import BatchRequest, BatchResult, BatchStats
+from engines.llm.prompts.static.common_prompt_template import COMMON_SYSTEM_PROMPT
+
+if TYPE_CHECKING:
+    from engines.llm.openai_llm_invoke import OpenAILLMInvoke
+
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    令牌桶，按分钟速率匀速补充，桶满时最多积累 capacity 个令牌
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float | None = None):
+        self.rate = rate_per_minute / 60
+        self.capacity = capacity or rate_per_minute
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """
+        获取 amount 个令牌需要等待的时间（秒），超过 capacity 的请求按桶满处理，避免永远无法执行
+        """
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self._tokens >= amount else (amount - self._tokens) / self.rate
+
+    def consume(self, amount: float):
+        self._refill()
+        self._tokens -= min(amount, self.capacity)
+
+
+class _QueueItem:
+    __slots__ = ("future", "request", "submitted_at", "tokens")
+
+    def __init__(self, request: BatchRequest, future: asyncio.Future, tokens: int):
+        self.request = request
+        self.future = future
+        self.tokens = tokens
+        self.submitted_at = time.monotonic()
+
+
+class BatchInvoker:
+    """
+    批量调用 OpenAILLMInvoke.invoke：
+    - 并发数限制，同时执行的 invoke 不超过 max_concurrency
+    - 按请求数（rpm）和 token 数（tpm）的令牌桶限速，token 数由 prompt 估算值加上 max_completion_tokens 得到
+    - 按优先级出队，在线交互请求（PriorityEnum.INTERACTIVE）可以插到排队中的批量任务前面
+    - 结果按完成顺序返回
+
+    NOTE: 速率限制按每次 invoke 计算一次请求，工具调用产生的后续请求不计入
+    """
+
+    def __init__(
+        self,
+        llm_invoke: "OpenAILLMInvoke",
+        max_concurrency: int = 8,
+        rpm: float | None = None,
+        tpm: float | None = None,
+        default_completion_tokens: int = 512,
+    ):
+        """
+        :param llm_invoke: 执行调用的实例
+        :param max_concurrency: 最大并发数
+        :param rpm: 每分钟最多请求数，None 表示不限制
+        :param tpm: 每分钟最多 token 数，None 表示不限制
+        :param default_completion_tokens: 请求未设置 max_completion_tokens 时按该值估算回答的 token 数
+        """
+        self.llm_invoke = llm_invoke
+        self.max_concurrency = max_concurrency
+        self.request_bucket = TokenBucket(rpm) if rpm else None
+        self.token_bucket = TokenBucket(tpm) if tpm else None
+        self.default_completion_tokens = default_completion_tokens
+
+        self._queue: list[tuple[int, int, _QueueItem]] = []  # (优先级, 提交顺序, 请求)
+        self._sequence = itertools.count()
+        self._queue_event = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._dispatcher: asyncio.Task | None = None
+        self._running: set[asyncio.Task] = set()
+
+        self._stats = BatchStats()
+        self._queue_waits: deque[float] = deque(maxlen=1000)  # 最近的排队等待时间，用于计算 p95
+        self._started_at: float | None = None
+
+    def estimate_tokens(self, params: dict) -> int:
+        """
+        估算单次请求消耗的 token 数：system/history/user prompt 加上 max_completion_tokens
+        """
+        messages = [
+            {"role": "system", "content": params.get("system_prompt") or COMMON_SYSTEM_PROMPT},
+            {"role": "user", "content": params.get("user_prompt", "")},
+        ]
+        history_messages = params.get("history_messages")
+        if history_messages:
+            messages[1:1] = history_messages.model_dump().get("messages")
+        completion_tokens = params.get("max_completion_tokens") or self.default_completion_tokens
+        # 与 invoke 使用同一个 token 计数器，历史消息按裁剪前的完整长度估算
+        return self.llm_invoke.token_counter.count_messages(messages) + completion_tokens
+
+    def submit(self, request: BatchRequest) -> asyncio.Future:
+        """
+        提交单个请求，返回结果对应的 future，可以与批量任务共用同一个 BatchInvoker
+        """
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch_loop())
+        if self._started_at is None:
+            self._started_at = time.monotonic()
+
+        future = asyncio.get_running_loop().create_future()
+        item = _QueueItem(request, future, self.estimate_tokens(request.params))
+        heapq.heappush(self._queue, (request.priority.value, next(self._sequence), item))
+        self._stats.submitted += 1
+        self._queue_event.set()
+        return future
+
+    async def invoke_many(self, requests: Iterable[BatchRequest | dict]) -> AsyncIterator[BatchResult]:
+        """
+        批量调用，按完成顺序返回结果；调用方提前结束迭代时，取消还未完成的请求
+
+        :param requests: BatchRequest 或 invoke 的参数 dict
+        """
+        futures = [
+            self.submit(request if isinstance(request, BatchRequest) else BatchRequest(params=request))
+            for request in requests
+        ]
+        try:
+            for future in asyncio.as_completed(futures):
+                yield await future
+        finally:
+            for future in futures:
+                future.cancel()
+
+    async def _dispatch_loop(self):
+        while True:
+            while not self._queue:
+                self._queue_event.clear()
+                await self._queue_event.wait()
+
+            await self._semaphore.acquire()
+            item = await self._next_item()
+            if item is None:
+                self._semaphore.release()
+                continue
+
+            task = asyncio.create_task(self._run(item))
+            self._running.add(task)
+            task.add_done_callback(self._on_task_done)
+            # 调用方取消 future 时取消正在执行的 invoke
+            item.future.add_done_callback(lambda future, task=task: task.cancel() if future.cancelled() else None)
+
+    def _on_task_done(self, task: asyncio.Task):
+        # 在回调中释放并发数，任务在开始执行前被取消时同样会释放
+        self._running.discard(task)
+        self._semaphore.release()
+
+    async def _next_item(self) -> _QueueItem | None:
+        """
+        等待速率限制满足后取出优先级最高的请求，等待期间新提交的高优先级请求可以插到前面
+        """
+        while self._queue:
+            _, _, item = self._queue[0]
+            if item.future.cancelled():
+                heapq.heappop(self._queue)
+                continue
+
+            wait_time = max(
+                self.request_bucket.wait_time(1) if self.request_bucket else 0.0,
+                self.token_bucket.wait_time(item.tokens) if self.token_bucket else 0.0,
+            )
+            if wait_time > 0:
+                await asyncio.sleep(wait_time)
+                continue
+
+            heapq.heappop(self._queue)
+            if self.request_bucket:
+                self.request_bucket.consume(1)
+            if self.token_bucket:
+                self.token_bucket.consume(item.tokens)
+            return item
+        return None
+
+    async def _run(self, item: _QueueItem):
+        queue_wait = time.monotonic() - item.submitted_at
+        self._queue_waits.append(queue_wait)
+        self._stats.max_queue_wait = max(self._stats.max_queue_wait, queue_wait)
+        self._stats.estimated_tokens += item.tokens
+
+        start_time = time.monotonic()
+        result, error = None, None
+        try:
+            result = await self.llm_invoke.invoke(**item.request.params)
+        except Exception as e:
+            logger.exception(f"批量调用出错 [请求ID: {item.request.request_id}]")
+            error = str(e)
+
+        self._stats.completed += 1
+        if error is not None or result is None:
+            self._stats.failed += 1
+        if not item.future.done():
+            item.future.set_result(
+                BatchResult(
+                    request_id=item.request.request_id,
+                    result=result,
+                    error=error,
+                    queue_wait=queue_wait,
+                    elapsed=time.monotonic() - start_time,
+                )
+            )
+
+    def get_stats(self) -> BatchStats:
+        stats = self._stats.model_copy()
+        stats.queued = sum(1 for _, _, item in self._queue if not item.future.cancelled())
+        stats.running = len(self._running)
+        if self._started_at is not None:
+            elapsed = max(time.monotonic() - self._started_at, 1e-9)
+            stats.requests_per_second = stats.completed / elapsed
+            stats.tokens_per_second = stats.estimated_tokens / elapsed
+        if self._queue_waits:
+            queue_waits = sorted(self._queue_waits)
+            stats.avg_queue_wait = sum(queue_waits) / len(queue_waits)
+            stats.p95_queue_wait = queue_waits[min(len(queue_waits) - 1, int(len(queue_waits) * 0.95))]
+        return stats
+
+    async def aclose(self):
+        """
+        停止调度并取消排队中和正在执行的请求
+        """
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        for _, _, item in self._queue:
+            item.future.cancel()
+        self._queue.clear()
+        for task in list(self._running):
+            task.cancel()
+        await asyncio.gather(*self._running, return_exceptions=True)
@@ -0,0 +1,103 @@
+import logging
+import time
+from typing import Literal
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """
+    服务端点处于熔断状态，请求直接失败
+    """
+
+
+class CircuitBreaker:
+    """
+    单个服务端点（base_url）的熔断器
+    - closed：正常请求，连续失败 failure_threshold 次后进入 open
+    - open：请求直接失败，recovery_timeout 秒后进入 half_open
+    - half_open：只放行 half_open_max_calls 个探测请求，成功后恢复为 closed，失败后重新进入 open
+    """
+
+    def __init__(
+        self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0, half_open_max_calls: int = 1
+    ):
+        """
+        :param name: 服务端点名称，用于日志
+        :param failure_threshold: 连续失败多少次后熔断
+        :param recovery_timeout: 熔断后多久开始探测恢复（秒）
+        :param half_open_max_calls: 探测阶段同时放行的请求数
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self._state: Literal["closed", "open", "half_open"] = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._probe_at = 0.0
+
+    @property
+    def state(self) -> Literal["closed", "open", "half_open"]:
+        if self._state == "open" and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = "half_open"
+            self._half_open_calls = 0
+        return self._state
+
+    def before_call(self):
+        """
+        请求前调用，熔断中或探测请求数已满时抛出 CircuitOpenError
+        """
+        state = self.state
+        if state == "closed":
+            return
+        if state == "half_open":
+            now = time.monotonic()
+            # 探测请求可能被取消而没有记录结果，超过 recovery_timeout 后允许重新探测
+            if self._half_open_calls >= self.half_open_max_calls and now - self._probe_at >= self.recovery_timeout:
+                self._half_open_calls = 0
+            if self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                self._probe_at = now
+                return
+        raise CircuitOpenError(f"服务端点熔断中：{self.name}")
+
+    def record_success(self):
+        if self._state != "closed":
+            logger.info(f"服务端点恢复正常：{self.name}")
+        self._state = "closed"
+        self._failures = 0
+
+    def record_failure(self):
+        self._failures += 1
+        if self._state == "half_open" or self._failures >= self.failure_threshold:
+            if self._state != "open":
+                logger.warning(f"服务端点连续失败 {self._failures} 次，开始熔断：{self.name}")
+            self._state = "open"
+            self._opened_at = time.monotonic()
+
+
+class CircuitBreakerRegistry:
+    """
+    按 base_url 共享熔断器，同一个服务端点的所有 OpenAILLMInvoke 实例共用熔断状态
+    """
+
+    def __init__(self, **breaker_kwargs):
+        """
+        :param breaker_kwargs: 创建 CircuitBreaker 的参数
+        """
+        self.breaker_kwargs = breaker_kwargs
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def get(self, base_url: str) -> CircuitBreaker:
+        base_url = base_url.rstrip("/")
+        breaker = self._breakers.get(base_url)
+        if breaker is None:
+            breaker = self._breakers[base_url] = CircuitBreaker(base_url, **self.breaker_kwargs)
+        return breaker
+
+
+# 按 base_url 共享的熔断器
+global_circuit_breakers = CircuitBreakerRegistry()
@@ -0,0 +1,223 @@
+import asyncio
+import logging
+import weakref
+from collections.abc import AsyncIterator
+
+import httpx
+from openai import AsyncOpenAI
+
+from engines.llm.llm_schema import LLMClientConfig, LLMClientPoolStats
+
+logger = logging.getLogger(__name__)
+
+
+class _PooledClient:
+    __slots__ = ("base_url", "client", "config", "http_client", "in_flight", "peak_in_flight", "requests", "transport")
+
+    def __init__(self, base_url: str, api_key: str | None, config: LLMClientConfig):
+        self.base_url = base_url
+        self.config = config
+        self.transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_keepalive_connections,
+                keepalive_expiry=config.keepalive_expiry,
+            ),
+            http2=config.http2,
+            retries=config.retries,
+        )
+        timeout = httpx.Timeout(config.read_timeout, connect=config.connect_timeout)
+        self.http_client = httpx.AsyncClient(
+            transport=_CountingTransport(self.transport, self), timeout=timeout, follow_redirects=True
+        )
+        # 重试由 retry_policy 统一处理，关闭 SDK 内置的重试，避免重试次数叠加
+        self.client = AsyncOpenAI(
+            api_key=api_key, base_url=base_url, max_retries=0, timeout=timeout, http_client=self.http_client
+        )
+        self.requests = 0
+        self.in_flight = 0  # 已经发出、响应还没有读取完的请求数
+        self.peak_in_flight = 0
+
+    def _waiting(self, in_flight: int) -> int:
+        # HTTP/1.1 每个进行中的请求占用一个连接，超过 max_connections 的请求在连接池中排队；HTTP/2 复用连接不排队
+        return 0 if self.config.http2 else max(0, in_flight - self.config.max_connections)
+
+    def get_stats(self) -> LLMClientPoolStats:
+        # 连接数来自 httpcore 连接池，取不到时（httpx 内部实现变化）为 None，不影响其他统计
+        connections = idle = None
+        pool_connections = getattr(getattr(self.transport, "_pool", None), "connections", None)
+        if pool_connections is not None:
+            try:
+                connections = len(pool_connections)
+                idle = sum(1 for connection in pool_connections if connection.is_idle())
+            except (AttributeError, TypeError):
+                connections = idle = None
+        active = self.in_flight if self.config.http2 else min(self.in_flight, self.config.max_connections)
+        return LLMClientPoolStats(
+            base_url=self.base_url,
+            http2=self.config.http2,
+            max_connections=self.config.max_connections,
+            connections=connections,
+            active_connections=active,
+            idle_connections=idle,
+            in_flight_requests=self.in_flight,
+            waiting_requests=self._waiting(self.in_flight),
+            requests=self.requests,
+            peak_in_flight_requests=self.peak_in_flight,
+            peak_waiting_requests=self._waiting(self.peak_in_flight),
+        )
+
+
+class _CountingStream(httpx.AsyncByteStream):
+    """
+    响应读取完或关闭时结束计数，流式响应在整个输出期间都占用连接
+    """
+
+    def __init__(self, stream: httpx.AsyncByteStream, pooled: _PooledClient):
+        self.stream = stream
+        self.pooled = pooled
+        self.closed = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self.stream:
+            yield chunk
+
+    async def aclose(self):
+        if not self.closed:
+            self.closed = True
+            self.pooled.in_flight -= 1
+        await self.stream.aclose()
+
+
+class _CountingTransport(httpx.AsyncBaseTransport):
+    """
+    记录请求数和进行中的请求数，请求交给实际的连接池处理
+    """
+
+    def __init__(self, transport: httpx.AsyncHTTPTransport, pooled: _PooledClient):
+        self.transport = transport
+        self.pooled = pooled
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        pooled = self.pooled
+        pooled.requests += 1
+        pooled.in_flight += 1
+        pooled.peak_in_flight = max(pooled.peak_in_flight, pooled.in_flight)
+        try:
+            response = await self.transport.handle_async_request(request)
+        except BaseException:
+            pooled.in_flight -= 1
+            raise
+        response.stream = _CountingStream(response.stream, pooled)
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class LLMClientRegistry:
+    """
+    按 (base_url, api_key) 共享模型客户端，同一个服务端点的所有 OpenAILLMInvoke 实例共用一个 HTTP 连接池
+    按租户或按请求创建实例时不再重复建立 TCP/TLS 连接，也不会留下大量空闲的连接池
+    - async 连接池和事件循环绑定，每个事件循环使用各自的客户端，事件循环被回收时其客户端随之释放
+    - 被调用方关闭的客户端在下次获取时重新创建
+    """
+
+    def __init__(self, config: LLMClientConfig | None = None):
+        """
+        :param config: 默认的连接池配置，可以在 get 时按服务端点单独指定
+        """
+        self.config = config or LLMClientConfig()
+        # 所有登记过的服务端点及其连接池配置，预热时为其在当前事件循环中创建客户端
+        self._endpoints: dict[tuple[str, str | None], LLMClientConfig] = {}
+        self._loop_clients: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, dict[tuple[str, str | None], _PooledClient]
+        ] = weakref.WeakKeyDictionary()
+        # 没有运行中的事件循环时（如在同步代码中创建实例）获取的客户端
+        self._unbound_clients: dict[tuple[str, str | None], _PooledClient] = {}
+
+    def _clients(self) -> dict[tuple[str, str | None], _PooledClient]:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return self._unbound_clients
+        clients = self._loop_clients.get(loop)
+        if clients is None:
+            clients = self._loop_clients[loop] = {}
+        return clients
+
+    def register(
+        self, base_url: str, api_key: str | None = None, config: LLMClientConfig | None = None
+    ) -> tuple[str, str | None]:
+        """
+        登记服务端点，不创建客户端
+
+        :param config: 该服务端点的连接池配置，为 None 时使用之前指定的或默认配置
+        """
+        key = (base_url.rstrip("/"), api_key)
+        if config is not None or key not in self._endpoints:
+            self._endpoints[key] = config or self.config
+        return key
+
+    def get(self, base_url: str, api_key: str | None = None, config: LLMClientConfig | None = None) -> AsyncOpenAI:
+        """
+        返回当前事件循环中共享的客户端，不存在或已关闭时创建
+        """
+        key = self.register(base_url, api_key, config)
+        return self._get(key).client
+
+    def _get(self, key: tuple[str, str | None]) -> _PooledClient:
+        clients = self._clients()
+        pooled = clients.get(key)
+        if pooled is None or pooled.client.is_closed():
+            pooled = clients[key] = _PooledClient(key[0], key[1], self._endpoints[key])
+        return pooled
+
+    def _all_clients(self) -> list[_PooledClient]:
+        clients = list(self._unbound_clients.values())
+        for loop_clients in list(self._loop_clients.values()):
+            clients.extend(loop_clients.values())
+        return clients
+
+    async def warmup(self, connections: int | None = None) -> int:
+        """
+        为所有登记过的服务端点在当前事件循环中预先建立连接（完成 TCP/TLS 握手），返回成功建立的连接数
+        同时发出多个轻量的 GET 请求迫使连接池打开多个连接，响应状态码不影响连接复用
+
+        :param connections: 每个客户端预先建立的连接数，为 None 时使用各自配置的 warmup_connections
+        """
+        tasks = []
+        for pooled in [self._get(key) for key in self._endpoints]:
+            count = pooled.config.warmup_connections if connections is None else connections
+            # HTTP/2 所有请求复用同一个连接，只需要建立一个
+            count = min(count, pooled.config.max_keepalive_connections, 1 if pooled.config.http2 else count)
+            tasks.extend(pooled.http_client.get(pooled.base_url) for _ in range(count))
+        if not tasks:
+            return 0
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        failures = [result for result in results if isinstance(result, Exception)]
+        if failures:
+            logger.warning(f"模型客户端预热失败 {len(failures)}/{len(results)} 个连接：{failures[0]}")
+        return len(results) - len(failures)
+
+    def get_stats(self) -> list[LLMClientPoolStats]:
+        """
+        当前事件循环中各客户端连接池的统计
+        """
+        return [pooled.get_stats() for pooled in self._clients().values() if not pooled.client.is_closed()]
+
+    async def aclose_all(self):
+        """
+        关闭所有客户端的连接池，用于服务退出
+        """
+        clients = self._all_clients()
+        self._unbound_clients.clear()
+        self._loop_clients.clear()
+        await asyncio.gather(*[pooled.client.close() for pooled in clients], return_exceptions=True)
+
+    def __len__(self) -> int:
+        return len(self._all_clients())
+
+
+# 按 (base_url, api_key) 共享的模型客户端
+global_llm_clients = LLMClientRegistry()
@@ -0,0 +1,199 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from openai import AsyncStream
+
+from engines.llm.stop_signal import InProcessStopSignalBackend, StopSignalBackend
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationStoppedError(Exception):
+    """
+    会话被主动停止
+    """
+
+
+class ConversationEntry:
+    """
+    单个会话的停止标志位和正在读取的上游流式响应
+    """
+
+    __slots__ = ("conversation_id", "created_at", "event", "stopped", "stream")
+
+    def __init__(self, conversation_id: str):
+        self.conversation_id = conversation_id
+        self.event = asyncio.Event()  # 用于等待停止信号
+        self.stopped = False  # 停止信号由外部推送设置，流式输出时每个 chunk 只读取这个属性
+        self.stream: AsyncStream | None = None
+        self.created_at = time.monotonic()
+
+    async def stop(self):
+        """
+        设置停止标志位，并关闭上游的 HTTP 流式响应，服务端可以据此提前结束生成
+        """
+        if self.stopped:
+            return
+        self.stopped = True
+        self.event.set()
+        await self._close_stream()
+
+    def stop_nowait(self) -> asyncio.Task | None:
+        """
+        在同步代码中停止会话，设置停止标志位后在后台关闭上游的流式响应，返回关闭响应的任务
+        """
+        if self.stopped:
+            return None
+        self.stopped = True
+        self.event.set()
+        if self.stream is None:
+            return None
+        return asyncio.get_running_loop().create_task(self._close_stream())
+
+    async def _close_stream(self):
+        if self.stream is not None:
+            try:
+                await self.stream.close()
+            except Exception as e:
+                logger.warning(f"关闭上游流式响应出错 [会话ID: {self.conversation_id}]：{e}", exc_info=True)
+
+
+class ConversationRegistry:
+    """
+    会话注册表，用以实现会话的主动停止
+    - 会话结束（流式输出完成、出错或被停止）时移除
+    - 超过 ttl 的会话由定时器清理（注册新会话时同样会检查），防止未被消费的流式响应一直占用内存
+    - 超过 max_size 时优先移除已经停止的会话，其次移除最早注册的会话
+    - 因超时、数量上限或相同会话 ID 重新注册被移除的会话会先被停止，不会在无法通过会话 ID 停止的情况下继续运行
+    - 停止信号通过 StopSignalBackend 广播，多进程部署时停止请求落在任意进程都能停止对应的会话
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 3600, signal_backend: StopSignalBackend | None = None):
+        """
+        :param max_size: 最多同时保存的会话数
+        :param ttl: 会话的最长保存时间（秒）
+        :param signal_backend: 停止信号后端，默认只在当前进程内生效
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.signal_backend = signal_backend or InProcessStopSignalBackend()
+        self._entries: OrderedDict[str, ConversationEntry] = OrderedDict()
+        # 清理超时会话的定时器及其所属的事件循环
+        self._cleanup_handle: asyncio.TimerHandle | None = None
+        self._cleanup_loop: asyncio.AbstractEventLoop | None = None
+        # 被移除的会话在后台关闭上游响应的任务
+        self._closing: set[asyncio.Task] = set()
+
+    def __contains__(self, conversation_id: str) -> bool:
+        return conversation_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def keys(self) -> list[str]:
+        return list(self._entries.keys())
+
+    def get(self, conversation_id: str) -> ConversationEntry | None:
+        return self._entries.get(conversation_id)
+
+    def register(self, conversation_id: str) -> ConversationEntry:
+        """
+        注册会话，同一个会话 ID 重新注册时停止并覆盖之前的记录
+        """
+        replaced = self._entries.get(conversation_id)
+        if replaced is not None:
+            # 被覆盖的记录无法再通过会话 ID 停止，且与新的调用写入同一个会话的历史记录，先停止
+            logger.warning(f"会话 ID 被重新注册，停止之前的调用 [会话ID: {conversation_id}]")
+            self._drop(replaced)
+        self._evict()
+        entry = ConversationEntry(conversation_id)
+        self._entries[conversation_id] = entry
+        self._schedule_cleanup()
+        return entry
+
+    def release(self, entry: ConversationEntry):
+        """
+        会话结束时移除，只移除同一个记录，不影响相同会话 ID 后续注册的记录
+        """
+        if self._entries.get(entry.conversation_id) is entry:
+            del self._entries[entry.conversation_id]
+
+    async def set_signal_backend(self, signal_backend: StopSignalBackend):
+        """
+        替换停止信号后端并开始接收其他进程发出的停止信号，需要在事件循环中调用（如服务启动时）
+        """
+        await self.signal_backend.close()
+        self.signal_backend = signal_backend
+        await signal_backend.start(self.stop_local)
+
+    async def stop(self, conversation_id: str) -> bool:
+        """
+        停止会话：当前进程中存在该会话时直接停止，否则通过停止信号后端通知其他进程
+
+        :return: 当前进程中存在该会话，或停止信号已经广播给其他进程时返回 True
+        """
+        if await self.stop_local(conversation_id):
+            return True
+        return await self.signal_backend.publish(conversation_id)
+
+    async def stop_local(self, conversation_id: str) -> bool:
+        """
+        只停止当前进程中的会话，停止信号后端收到其他进程的停止信号时调用
+        """
+        entry = self._entries.get(conversation_id)
+        if entry is None:
+            return False
+        await entry.stop()
+        return True
+
+    def _schedule_cleanup(self):
+        # 没有运行中的事件循环时只在注册时清理
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._cleanup_handle is not None and self._cleanup_loop is loop:
+            return
+        if not self._entries:
+            self._cleanup_handle = None
+            return
+        # 在最早注册的会话到期时清理，定时器每次只存在一个
+        oldest = next(iter(self._entries.values()))
+        delay = max(0.0, oldest.created_at + self.ttl - time.monotonic())
+        self._cleanup_loop = loop
+        self._cleanup_handle = loop.call_later(delay, self._on_cleanup)
+
+    def _on_cleanup(self):
+        self._cleanup_handle = None
+        self._evict()
+        self._schedule_cleanup()
+
+    def _drop(self, entry: ConversationEntry):
+        del self._entries[entry.conversation_id]
+        task = entry.stop_nowait()
+        if task is not None:
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+
+    def _evict(self):
+        # 按注册顺序排列，从最早的记录开始清理超时的会话
+        expire_before = time.monotonic() - self.ttl
+        while self._entries:
+            conversation_id, entry = next(iter(self._entries.items()))
+            if entry.created_at > expire_before:
+                break
+            logger.warning(f"会话超时，停止并移除会话 [会话ID: {conversation_id}]")
+            self._drop(entry)
+        if len(self._entries) < self.max_size:
+            return
+        # 已经停止的会话正在结束，优先移除
+        for entry in [entry for entry in self._entries.values() if entry.stopped]:
+            del self._entries[entry.conversation_id]
+            if len(self._entries) < self.max_size:
+                return
+        while len(self._entries) >= self.max_size:
+            conversation_id, entry = next(iter(self._entries.items()))
+            logger.warning(f"会话超出数量上限，停止并移除会话 [会话ID: {conversation_id}]")
+            self._drop(entry)
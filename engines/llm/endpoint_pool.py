@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from collections.abc import Callable
+
+from openai import APIStatusError, AsyncOpenAI, AsyncStream
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+from engines.llm.circuit_breaker import CircuitBreaker, global_circuit_breakers
+from engines.llm.client_pool import LLMClientRegistry, global_llm_clients
+from engines.llm.llm_schema import EndpointStats
+from engines.llm.retry_policy import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+
+class Endpoint:
+    """
+    一个 OpenAI 兼容的服务端点，记录正在处理的请求数和延迟
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str = "",
+        weight: float = 1.0,
+        name: str | None = None,
+        client: AsyncOpenAI | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
+        client_registry: LLMClientRegistry | None = None,
+    ):
+        """
+        :param base_url: 服务地址
+        :param api_key: api key
+        :param weight: 权重，越大分到的请求越多
+        :param name: 名称，用于日志和统计，默认为 base_url
+        :param client: 已经创建的客户端，随服务端点池关闭；为 None 时使用 client_registry 中共享的客户端
+        :param circuit_breaker: 熔断器，默认按 base_url 共享
+        :param client_registry: 共享客户端的 registry，默认为 global_llm_clients
+        """
+        self.base_url = base_url
+        self.name = name or base_url
+        self.weight = weight
+        self.api_key = api_key
+        # 共享的客户端由 registry 的 aclose_all 统一关闭，不随服务端点池关闭
+        self.shared_client = client is None
+        self._client = client
+        self.client_registry = client_registry if client_registry is not None else global_llm_clients
+        if client is None:
+            self.client_registry.register(base_url, api_key)
+        self.circuit_breaker = circuit_breaker or global_circuit_breakers.get(base_url)
+
+        self.outstanding = 0  # 正在等待响应（流式请求为第一个 chunk）的请求数
+        self.ewma_latency: float | None = None
+        self.requests = 0
+        self.failures = 0
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        # 共享的客户端每次从 registry 获取，连接池和当前事件循环绑定，被关闭后自动重新创建
+        if self._client is not None:
+            return self._client
+        return self.client_registry.get(self.base_url, self.api_key)
+
+
+class EndpointPool:
+    """
+    多个部署同一模型的服务端点组成的池
+    - 选择 (正在处理的请求数 + 1) * EWMA 延迟 / 权重 最小的服务端点，熔断中的服务端点不参与选择
+    - 非流式请求可以开启对冲：超过最近延迟的 p95 仍未返回时向另一个服务端点发送相同请求
+      先返回的结果生效，另一个请求被取消
+    - 流式请求可以设置首 token 超时，超时按失败处理，由调用方切换到其他服务端点
+    """
+
+    def __init__(
+        self,
+        endpoints: list[Endpoint],
+        ewma_alpha: float = 0.3,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_min_delay: float = 0.2,
+        hedge_initial_delay: float = 2.0,
+        first_token_timeout: float | None = None,
+        is_failure: Callable[[BaseException], bool] | None = None,
+    ):
+        """
+        :param endpoints: 服务端点列表
+        :param ewma_alpha: 延迟 EWMA 的平滑系数，越大越偏向最近的延迟
+        :param hedge: 非流式请求是否开启对冲
+        :param hedge_quantile: 对冲等待时间取最近延迟的分位数
+        :param hedge_min_delay: 对冲等待时间的下限（秒）
+        :param hedge_initial_delay: 延迟样本不足时的对冲等待时间（秒）
+        :param first_token_timeout: 流式请求的首 token 超时时间（秒），None 表示不限制
+        :param is_failure: 判断异常是否计入熔断失败次数，默认为 RetryPolicy 的可重试错误
+        """
+        if not endpoints:
+            raise ValueError("服务端点列表不能为空")
+        self.endpoints = endpoints
+        self.ewma_alpha = ewma_alpha
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_initial_delay = hedge_initial_delay
+        self.first_token_timeout = first_token_timeout
+        self.is_failure = is_failure or RetryPolicy().is_retryable
+
+        self._latencies: deque[float] = deque(maxlen=500)  # 最近的非流式请求延迟，用于计算对冲等待时间
+
+    def select(self, exclude: set[Endpoint] | None = None) -> Endpoint | None:
+        """
+        选择服务端点，没有可用的服务端点时返回 None
+        """
+        candidates = [
+            endpoint
+            for endpoint in self.endpoints
+            if endpoint.circuit_breaker.state != "open" and (not exclude or endpoint not in exclude)
+        ]
+        if not candidates:
+            return None
+
+        # 还没有延迟数据的服务端点按已知延迟的平均值计算，使其有机会被选中
+        known_latencies = [endpoint.ewma_latency for endpoint in self.endpoints if endpoint.ewma_latency is not None]
+        default_latency = sum(known_latencies) / len(known_latencies) if known_latencies else 1.0
+
+        def score(endpoint: Endpoint) -> tuple[float, float]:
+            latency = endpoint.ewma_latency if endpoint.ewma_latency is not None else default_latency
+            # 分数相同时随机选择
+            return (endpoint.outstanding + 1) * latency / endpoint.weight, random.random()
+
+        return min(candidates, key=score)
+
+    def hedge_delay(self) -> float:
+        if len(self._latencies) < 20:
+            return self.hedge_initial_delay
+        latencies = sorted(self._latencies)
+        return max(self.hedge_min_delay, latencies[int((len(latencies) - 1) * self.hedge_quantile)])
+
+    async def send(
+        self, endpoint: Endpoint, params: dict
+    ) -> tuple[Endpoint, ChatCompletion | AsyncStream, ChatCompletionChunk | None]:
+        """
+        向服务端点发送请求，返回 (实际返回结果的服务端点, 响应, 流式响应的第一个 chunk)
+        """
+        if not self.hedge or params.get("stream") or len(self.endpoints) < 2:
+            return endpoint, *await self._send_one(endpoint, params)
+
+        primary = asyncio.ensure_future(self._send_one(endpoint, params))
+        tasks = {primary: endpoint}
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay())
+            hedge_endpoint = None if done else self.select(exclude={endpoint})
+            if hedge_endpoint is None:
+                return endpoint, *await primary
+
+            logger.info(f"LLM 请求超过对冲等待时间，向 {hedge_endpoint.name} 发送对冲请求")
+            tasks[asyncio.ensure_future(self._send_one(hedge_endpoint, params))] = hedge_endpoint
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return tasks[task], *task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            # 取消未完成的请求（对冲中较慢的一方，或调用方被取消时的所有请求）
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _send_one(
+        self, endpoint: Endpoint, params: dict
+    ) -> tuple[ChatCompletion | AsyncStream, ChatCompletionChunk | None]:
+        endpoint.circuit_breaker.before_call()
+        endpoint.outstanding += 1
+        endpoint.requests += 1
+        start_time = time.monotonic()
+        try:
+            if params.get("stream"):
+                llm_res, first_chunk = await asyncio.wait_for(
+                    self._open_stream(endpoint, params), self.first_token_timeout
+                )
+            else:
+                llm_res, first_chunk = await endpoint.client.chat.completions.create(**params), None
+        except Exception as e:
+            if self.is_failure(e):
+                endpoint.failures += 1
+                endpoint.circuit_breaker.record_failure()
+            elif isinstance(e, APIStatusError):
+                # 参数错误等 4xx 响应说明服务端点本身可用
+                endpoint.circuit_breaker.record_success()
+            raise
+        finally:
+            endpoint.outstanding -= 1
+
+        latency = time.monotonic() - start_time
+        endpoint.ewma_latency = (
+            latency
+            if endpoint.ewma_latency is None
+            else self.ewma_alpha * latency + (1 - self.ewma_alpha) * endpoint.ewma_latency
+        )
+        if not params.get("stream"):
+            self._latencies.append(latency)
+        endpoint.circuit_breaker.record_success()
+        return llm_res, first_chunk
+
+    @staticmethod
+    async def _open_stream(endpoint: Endpoint, params: dict) -> tuple[AsyncStream, ChatCompletionChunk | None]:
+        llm_res = await endpoint.client.chat.completions.create(**params)
+        try:
+            return llm_res, await anext(llm_res, None)
+        except BaseException:
+            # 读取第一个 chunk 出错或超时时关闭连接
+            await llm_res.close()
+            raise
+
+    def get_stats(self) -> list[EndpointStats]:
+        return [
+            EndpointStats(
+                name=endpoint.name,
+                state=endpoint.circuit_breaker.state,
+                outstanding=endpoint.outstanding,
+                ewma_latency=endpoint.ewma_latency,
+                requests=endpoint.requests,
+                failures=endpoint.failures,
+            )
+            for endpoint in self.endpoints
+        ]
+
+    async def aclose(self):
+        for endpoint in self.endpoints:
+            if not endpoint.shared_client:
+                await endpoint.client.close()
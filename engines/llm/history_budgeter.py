@@ -0,0 +1,111 @@
+import logging
+
+from engines.llm.llm_schema import HistoryTrimStats
+from engines.llm.token_counter import EstimateTokenCounter, TokenCounter
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryBudgeter:
+    """
+    按 token 预算裁剪历史消息，system prompt 和最新的 user 消息始终保留
+    1. 截断较早轮次中过长的工具结果（如 web_search 的原始搜索结果）
+    2. 从最早的轮次开始整轮删除，保留最近 keep_recent_turns 轮
+    3. 仍然超出预算时截断最近轮次中过长的工具结果
+    以轮次（一条 user 消息及其后的 assistant/tool 消息）为单位删除，工具调用和对应的工具结果不会被拆开
+    """
+
+    def __init__(
+        self,
+        max_prompt_tokens: int,
+        token_counter: TokenCounter | None = None,
+        keep_recent_turns: int = 2,
+        max_tool_content_tokens: int = 1000,
+    ):
+        """
+        :param max_prompt_tokens: 整个 prompt（system、历史消息和最新的 user 消息）的 token 预算
+        :param token_counter: token 计数器，默认为离线估算
+        :param keep_recent_turns: 始终保留的最近轮数
+        :param max_tool_content_tokens: 超出预算时单个工具结果保留的最大 token 数
+        """
+        self.max_prompt_tokens = max_prompt_tokens
+        self.token_counter = token_counter or EstimateTokenCounter()
+        self.keep_recent_turns = keep_recent_turns
+        self.max_tool_content_tokens = max_tool_content_tokens
+
+    def trim(self, messages: list[dict]) -> tuple[list[dict], HistoryTrimStats]:
+        """
+        裁剪 messages 中的历史消息，不修改传入的 messages
+
+        :param messages: [system 消息, ...历史消息, 最新的 user 消息]
+        :return: 裁剪后的 messages 和裁剪前后的 token 数
+        """
+        counts = [self.token_counter.count_message(message) for message in messages]
+        stats = HistoryTrimStats(budget=self.max_prompt_tokens, tokens_before=sum(counts))
+        stats.tokens_after = stats.tokens_before
+        if stats.tokens_before <= self.max_prompt_tokens:
+            return messages, stats
+
+        head = 0
+        while head < len(messages) - 1 and messages[head].get("role") == "system":
+            head += 1
+        messages = list(messages)
+        turns = self._split_turns(messages, head, len(messages) - 1)
+        protected = turns[-self.keep_recent_turns :] if self.keep_recent_turns > 0 else []
+        older = turns[: len(turns) - len(protected)]
+
+        for turn in older:
+            self._truncate_tool_contents(messages, counts, turn, stats)
+
+        removed: set[int] = set()
+        for turn in older:
+            if stats.tokens_after <= self.max_prompt_tokens:
+                break
+            removed.update(turn)
+            stats.removed_messages += len(turn)
+            stats.tokens_after -= sum(counts[index] for index in turn)
+
+        for turn in reversed(protected):
+            if stats.tokens_after <= self.max_prompt_tokens:
+                break
+            self._truncate_tool_contents(messages, counts, turn, stats)
+
+        if stats.tokens_after > self.max_prompt_tokens:
+            logger.warning(
+                f"历史消息裁剪后仍超出 token 预算 [预算: {self.max_prompt_tokens}, 裁剪后: {stats.tokens_after}]"
+            )
+        logger.info(
+            f"裁剪历史消息 [裁剪前 tokens: {stats.tokens_before}, 裁剪后 tokens: {stats.tokens_after}, "
+            f"删除消息数: {stats.removed_messages}, 截断工具结果数: {stats.truncated_messages}]"
+        )
+        return [message for index, message in enumerate(messages) if index not in removed], stats
+
+    @staticmethod
+    def _split_turns(messages: list[dict], start: int, end: int) -> list[list[int]]:
+        """
+        按 user 消息把 messages[start:end] 分为轮次，返回每轮消息的下标
+        """
+        turns: list[list[int]] = []
+        for index in range(start, end):
+            if not turns or messages[index].get("role") == "user":
+                turns.append([])
+            turns[-1].append(index)
+        return turns
+
+    def _truncate_tool_contents(
+        self, messages: list[dict], counts: list[int], turn: list[int], stats: HistoryTrimStats
+    ):
+        for index in turn:
+            message = messages[index]
+            content = message.get("content")
+            if message.get("role") != "tool" or not content or counts[index] <= self.max_tool_content_tokens:
+                continue
+            keep_chars = len(content) * self.max_tool_content_tokens // counts[index]
+            messages[index] = {
+                **message,
+                "content": f"{content[:keep_chars]}\n...[工具结果过长已截断，原始约 {counts[index]} tokens]",
+            }
+            new_count = self.token_counter.count_message(messages[index])
+            stats.tokens_after -= counts[index] - new_count
+            stats.truncated_messages += 1
+            counts[index] = new_count
@@ -0,0 +1,187 @@
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+
+from utils.sqlite_store import SqliteDatabase
+from utils.ttl_lru_cache import TTLLRUCache
+
+
+def dump_turn(messages: list[dict]) -> str:
+    """
+    将一轮对话的消息序列化为 json 数组，写入时只序列化一次，读取时不再经过 pydantic 校验
+    """
+    return json.dumps(messages, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def load_turns(turns: list[str]) -> list[dict]:
+    """
+    按顺序拼接多轮对话的消息，所有轮次只解析一次
+    """
+    if not turns:
+        return []
+    return [message for turn in json.loads(f"[{','.join(turns)}]") for message in turn]
+
+
+class HistoryStore(ABC):
+    """
+    按会话 ID 保存的历史消息，每一轮对话（user 消息、工具调用的 assistant/tool 消息和最终回答）保存为一条 json 数组
+    按轮读取可以保证工具调用和工具结果不会被拆开
+    """
+
+    @abstractmethod
+    def append_turn(self, conversation_id: str, messages: list[dict]):
+        raise NotImplementedError
+
+    @abstractmethod
+    def load_raw(self, conversation_id: str, max_turns: int) -> list[str]:
+        """
+        返回最近 max_turns 轮对话序列化后的 json 数组，按时间顺序排列
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, conversation_id: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def size(self) -> int:
+        """
+        保存的会话数
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear(self):
+        raise NotImplementedError
+
+    def load(self, conversation_id: str, max_turns: int) -> list[dict]:
+        """
+        返回最近 max_turns 轮对话的消息，可以直接放入 messages 中
+        """
+        return load_turns(self.load_raw(conversation_id, max_turns))
+
+    async def aload(self, conversation_id: str, max_turns: int) -> list[dict]:
+        """
+        默认在事件循环中直接调用 load，SqliteHistoryStore 放到线程中执行
+        """
+        return self.load(conversation_id, max_turns)
+
+    async def aappend_turn(self, conversation_id: str, messages: list[dict]):
+        self.append_turn(conversation_id, messages)
+
+    def close(self):
+        """
+        释放存储持有的连接，默认没有需要释放的资源
+        """
+        return
+
+
+class InMemoryHistoryStore(HistoryStore):
+    """
+    内存历史记录，只保存序列化后的字符串
+    超过 max_conversations 时淘汰最久未使用的会话，每个会话最多保留 max_turns 轮
+    """
+
+    def __init__(self, max_conversations: int = 10000, max_turns: int = 100):
+        if max_conversations <= 0 or max_turns <= 0:
+            raise ValueError(f"max_conversations 和 max_turns 必须大于 0，当前为 {max_conversations}、{max_turns}")
+        self.max_conversations = max_conversations
+        self.max_turns = max_turns
+        # 会话不过期，只按最近使用淘汰
+        self._conversations = TTLLRUCache(max_conversations)
+        self._lock = threading.Lock()
+
+    def append_turn(self, conversation_id: str, messages: list[dict]):
+        turn = dump_turn(messages)
+        with self._lock:
+            turns = self._conversations.get(conversation_id)
+            if turns is None:
+                turns = deque(maxlen=self.max_turns)
+                self._conversations.set(conversation_id, turns)
+            turns.append(turn)
+
+    def load_raw(self, conversation_id: str, max_turns: int) -> list[str]:
+        with self._lock:
+            turns = self._conversations.get(conversation_id)
+            if turns is None or max_turns <= 0:
+                return []
+            return list(turns)[-max_turns:]
+
+    def delete(self, conversation_id: str):
+        with self._lock:
+            self._conversations.pop(conversation_id)
+
+    def size(self) -> int:
+        return len(self._conversations)
+
+    def clear(self):
+        with self._lock:
+            self._conversations.clear()
+
+
+class SqliteHistoryStore(HistoryStore):
+    """
+    sqlite 历史记录，进程重启后仍可读取，多个进程可以共用同一个文件
+    按 (conversation_id, turn) 的主键索引读取最近几轮，每个会话最多保留 max_turns 轮
+    """
+
+    def __init__(self, sqlite_path: str, max_turns: int = 100):
+        if max_turns <= 0:
+            raise ValueError(f"max_turns 必须大于 0，当前为 {max_turns}")
+        self.max_turns = max_turns
+        self._db = SqliteDatabase(
+            sqlite_path,
+            "CREATE TABLE IF NOT EXISTS conversation_history (conversation_id TEXT NOT NULL, turn INTEGER NOT NULL, "
+            "messages TEXT NOT NULL, created_at REAL NOT NULL, PRIMARY KEY (conversation_id, turn)) WITHOUT ROWID",
+        )
+
+    def append_turn(self, conversation_id: str, messages: list[dict]):
+        turn_messages = dump_turn(messages)
+
+        def write(db: sqlite3.Connection):
+            row = db.execute(
+                "SELECT MAX(turn) FROM conversation_history WHERE conversation_id = ?", (conversation_id,)
+            ).fetchone()
+            turn = 0 if row[0] is None else row[0] + 1
+            db.execute(
+                "INSERT INTO conversation_history (conversation_id, turn, messages, created_at) VALUES (?, ?, ?, ?)",
+                (conversation_id, turn, turn_messages, time.time()),
+            )
+            if turn >= self.max_turns:
+                db.execute(
+                    "DELETE FROM conversation_history WHERE conversation_id = ? AND turn <= ?",
+                    (conversation_id, turn - self.max_turns),
+                )
+
+        self._db.transaction(write)
+
+    def load_raw(self, conversation_id: str, max_turns: int) -> list[str]:
+        if max_turns <= 0:
+            return []
+        rows = self._db.query(
+            "SELECT messages FROM conversation_history WHERE conversation_id = ? ORDER BY turn DESC LIMIT ?",
+            (conversation_id, max_turns),
+        )
+        return [row[0] for row in reversed(rows)]
+
+    async def aload(self, conversation_id: str, max_turns: int) -> list[dict]:
+        # json 的解析和序列化也一并在线程中完成
+        return await self._db.arun(self.load, conversation_id, max_turns)
+
+    async def aappend_turn(self, conversation_id: str, messages: list[dict]):
+        await self._db.arun(self.append_turn, conversation_id, messages)
+
+    def delete(self, conversation_id: str):
+        self._db.execute("DELETE FROM conversation_history WHERE conversation_id = ?", (conversation_id,))
+
+    def size(self) -> int:
+        return self._db.query("SELECT COUNT(DISTINCT conversation_id) FROM conversation_history")[0][0]
+
+    def clear(self):
+        self._db.execute("DELETE FROM conversation_history")
+
+    def close(self):
+        self._db.close()
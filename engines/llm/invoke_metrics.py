@@ -0,0 +1,283 @@
+import bisect
+import logging
+import time
+from typing import TYPE_CHECKING, ClassVar
+
+from openai.types import CompletionUsage
+
+if TYPE_CHECKING:
+    from engines.llm.llm_schema import InvocationContext
+    from engines.tools.tool_schema import ToolExecResult
+
+
+logger = logging.getLogger(__name__)
+
+
+class InvokeHooks:
+    """
+    invoke 各阶段的回调，默认不做任何处理，按需重写
+    模型 id、会话 ID 和工具调用轮数从 ctx 中读取，endpoint 为服务端点名称
+    回调在事件循环中同步执行，不应阻塞；回调抛出的异常只记录日志，不影响调用
+    """
+
+    def on_invoke_start(self, ctx: "InvocationContext"):
+        pass
+
+    def on_invoke_end(self, ctx: "InvocationContext", elapsed: float):
+        """
+        invoke 返回时调用，流式调用为返回生成器时
+        """
+
+    def on_request_start(self, ctx: "InvocationContext", endpoint: str):
+        pass
+
+    def on_request_end(self, ctx: "InvocationContext", endpoint: str, elapsed: float, error: BaseException | None):
+        """
+        单次模型请求结束，流式请求为收到第一个 chunk 或出错时
+        """
+
+    def on_first_chunk(self, ctx: "InvocationContext", endpoint: str, ttft: float):
+        """
+        流式请求收到第一个 chunk，ttft 为从发送请求开始的时间（秒）
+        """
+
+    def on_chunk_gap(self, ctx: "InvocationContext", endpoint: str, gap: float):
+        """
+        流式输出收到一个有内容的 chunk，gap 为与上一个有内容的 chunk 的间隔（秒）
+        每个 chunk 都会调用，只有重写了该方法的回调才会被调用
+        """
+
+    def on_stream_end(self, ctx: "InvocationContext", endpoint: str, elapsed: float, stopped: bool):
+        """
+        流式输出结束
+        """
+
+    def on_usage(self, ctx: "InvocationContext", endpoint: str, usage: CompletionUsage):
+        pass
+
+    def on_retry(self, ctx: "InvocationContext", endpoint: str, attempt: int, error: BaseException):
+        pass
+
+    def on_tool_start(self, ctx: "InvocationContext", tool_name: str):
+        pass
+
+    def on_tool_end(self, ctx: "InvocationContext", result: "ToolExecResult"):
+        pass
+
+    def on_stop(self, ctx: "InvocationContext"):
+        pass
+
+
+def emit_hooks(hooks: list[InvokeHooks], event: str, *args):
+    for hook in hooks:
+        try:
+            getattr(hook, event)(*args)
+        except Exception:
+            logger.exception(f"执行回调 {type(hook).__name__}.{event} 出错")
+
+
+class StreamObserver:
+    """
+    记录流式输出的 chunk 间隔，每个 chunk 只记录一次时间并直接交给回调，不保存间隔，内存占用与输出长度无关
+    """
+
+    __slots__ = ("ctx", "endpoint", "gap_callbacks", "hooks", "last_time", "start_time", "usage")
+
+    def __init__(self, hooks: list[InvokeHooks], ctx: "InvocationContext", endpoint: str):
+        self.hooks = hooks
+        # 只有重写了 on_chunk_gap 的回调需要在每个 chunk 调用，预先取出绑定方法
+        self.gap_callbacks = [
+            hook.on_chunk_gap for hook in hooks if type(hook).on_chunk_gap is not InvokeHooks.on_chunk_gap
+        ]
+        self.ctx = ctx
+        self.endpoint = endpoint
+        self.start_time = self.last_time = time.perf_counter()
+        self.usage: CompletionUsage | None = None
+
+    def observe_chunk(self):
+        if not self.gap_callbacks:
+            return
+        now = time.perf_counter()
+        gap = now - self.last_time
+        self.last_time = now
+        for callback in self.gap_callbacks:
+            try:
+                callback(self.ctx, self.endpoint, gap)
+            except Exception:
+                logger.exception(f"执行回调 {type(callback.__self__).__name__}.on_chunk_gap 出错")
+
+    def finish(self, stopped: bool):
+        if self.usage is not None:
+            emit_hooks(self.hooks, "on_usage", self.ctx, self.endpoint, self.usage)
+        elapsed = time.perf_counter() - self.start_time
+        emit_hooks(self.hooks, "on_stream_end", self.ctx, self.endpoint, elapsed, stopped)
+        if stopped:
+            emit_hooks(self.hooks, "on_stop", self.ctx)
+
+
+# 默认的延迟分桶（秒）
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    __slots__ = ("buckets", "count", "counts", "sum")
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最后一个为 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float | None:
+        """
+        按分桶估算分位数，返回所在分桶的上界，落在 +Inf 分桶时返回最大的有限上界
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return self.buckets[min(index, len(self.buckets) - 1)]
+        return self.buckets[-1]
+
+
+class MetricsCollector(InvokeHooks):
+    """
+    内存中的指标收集器，按模型、服务端点和工具函数名分别统计，可以导出为 Prometheus 文本格式
+    只在事件循环线程中更新，不加锁
+    """
+
+    # 指标名 -> (类型, 说明)
+    METRICS: ClassVar[dict[str, tuple[str, str]]] = {
+        "invoke_duration_seconds": ("histogram", "invoke 耗时，流式调用为返回生成器前"),
+        "invoke_tool_rounds": ("histogram", "每次 invoke 的工具调用轮数"),
+        "request_duration_seconds": ("histogram", "单次模型请求耗时，流式请求为首个 chunk 之前"),
+        "time_to_first_token_seconds": ("histogram", "流式请求的首 chunk 延迟"),
+        "inter_token_gap_seconds": ("histogram", "流式输出相邻 chunk 的间隔"),
+        "stream_duration_seconds": ("histogram", "流式输出从首个 chunk 到结束的耗时"),
+        "tool_duration_seconds": ("histogram", "工具函数执行耗时"),
+        "requests_total": ("counter", "模型请求数"),
+        "retries_total": ("counter", "模型请求重试次数"),
+        "tool_calls_total": ("counter", "工具函数调用次数，status 为 memoized 时复用了备忘结果"),
+        "tokens_total": ("counter", "服务端返回的 token 用量"),
+        "stops_total": ("counter", "主动停止的调用数"),
+    }
+    TOOL_ROUND_BUCKETS = (0, 1, 2, 3, 5, 10)
+
+    def __init__(self, prefix: str = "llm_invoke", latency_buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS):
+        """
+        :param prefix: 导出时的指标名前缀
+        :param latency_buckets: 延迟类指标的分桶（秒）
+        """
+        self.prefix = prefix
+        self.latency_buckets = latency_buckets
+        # 指标名 -> {标签: 直方图或计数}
+        self._histograms: dict[str, dict[tuple[tuple[str, str], ...], Histogram]] = {}
+        self._counters: dict[str, dict[tuple[tuple[str, str], ...], float]] = {}
+        # (模型, 服务端点) -> chunk 间隔直方图，每个 chunk 都会更新，不再逐次构造标签
+        self._gap_histograms: dict[tuple[str, str], Histogram] = {}
+
+    def observe(self, name: str, value: float, **labels: str):
+        self._get_histogram(name, labels).observe(value)
+
+    def _get_histogram(self, name: str, labels: dict[str, str]) -> Histogram:
+        series = self._histograms.setdefault(name, {})
+        key = tuple(labels.items())
+        histogram = series.get(key)
+        if histogram is None:
+            buckets = self.TOOL_ROUND_BUCKETS if name == "invoke_tool_rounds" else self.latency_buckets
+            histogram = series[key] = Histogram(buckets)
+        return histogram
+
+    def inc(self, name: str, amount: float = 1, **labels: str):
+        series = self._counters.setdefault(name, {})
+        key = tuple(labels.items())
+        series[key] = series.get(key, 0) + amount
+
+    def get_histogram(self, name: str, **labels: str) -> Histogram | None:
+        return self._histograms.get(name, {}).get(tuple(labels.items()))
+
+    def get_counter(self, name: str, **labels: str) -> float:
+        return self._counters.get(name, {}).get(tuple(labels.items()), 0)
+
+    def on_invoke_end(self, ctx: "InvocationContext", elapsed: float):
+        self.observe("invoke_duration_seconds", elapsed, model=ctx.model_id)
+        self.observe("invoke_tool_rounds", ctx.tool_round, model=ctx.model_id)
+
+    def on_request_end(self, ctx: "InvocationContext", endpoint: str, elapsed: float, error: BaseException | None):
+        self.observe("request_duration_seconds", elapsed, model=ctx.model_id, endpoint=endpoint)
+        status = "ok" if error is None else "error"
+        self.inc("requests_total", model=ctx.model_id, endpoint=endpoint, status=status)
+
+    def on_first_chunk(self, ctx: "InvocationContext", endpoint: str, ttft: float):
+        self.observe("time_to_first_token_seconds", ttft, model=ctx.model_id, endpoint=endpoint)
+
+    def on_chunk_gap(self, ctx: "InvocationContext", endpoint: str, gap: float):
+        key = (ctx.model_id, endpoint)
+        histogram = self._gap_histograms.get(key)
+        if histogram is None:
+            labels = {"model": ctx.model_id, "endpoint": endpoint}
+            histogram = self._gap_histograms[key] = self._get_histogram("inter_token_gap_seconds", labels)
+        histogram.observe(gap)
+
+    def on_stream_end(self, ctx: "InvocationContext", endpoint: str, elapsed: float, stopped: bool):
+        self.observe("stream_duration_seconds", elapsed, model=ctx.model_id, endpoint=endpoint)
+
+    def on_usage(self, ctx: "InvocationContext", endpoint: str, usage: CompletionUsage):
+        self.inc("tokens_total", usage.prompt_tokens, model=ctx.model_id, endpoint=endpoint, type="prompt")
+        self.inc("tokens_total", usage.completion_tokens, model=ctx.model_id, endpoint=endpoint, type="completion")
+
+    def on_retry(self, ctx: "InvocationContext", endpoint: str, attempt: int, error: BaseException):
+        self.inc("retries_total", model=ctx.model_id, endpoint=endpoint)
+
+    def on_tool_end(self, ctx: "InvocationContext", result: "ToolExecResult"):
+        if result.memoized:
+            self.inc("tool_calls_total", tool=result.name, status="memoized")
+            return
+        self.observe("tool_duration_seconds", result.elapsed, tool=result.name)
+        self.inc("tool_calls_total", tool=result.name, status="ok" if result.error is None else "error")
+
+    def on_stop(self, ctx: "InvocationContext"):
+        self.inc("stops_total", model=ctx.model_id)
+
+    def to_prometheus(self) -> str:
+        """
+        导出为 Prometheus 文本格式（text/plain; version=0.0.4）
+        """
+        lines = []
+        for name, (metric_type, help_text) in self.METRICS.items():
+            series = (self._histograms if metric_type == "histogram" else self._counters).get(name)
+            if not series:
+                continue
+            full_name = f"{self.prefix}_{name}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {metric_type}")
+            for labels, value in series.items():
+                if metric_type == "counter":
+                    lines.append(f"{full_name}{self._format_labels(labels)} {value}")
+                    continue
+                cumulative = 0
+                for bucket, bucket_count in zip((*value.buckets, "+Inf"), value.counts, strict=True):
+                    cumulative += bucket_count
+                    lines.append(f"{full_name}_bucket{self._format_labels(labels, le=bucket)} {cumulative}")
+                lines.append(f"{full_name}_sum{self._format_labels(labels)} {value.sum}")
+                lines.append(f"{full_name}_count{self._format_labels(labels)} {value.count}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _format_labels(labels: tuple[tuple[str, str], ...], le: float | str | None = None) -> str:
+        items = list(labels) if le is None else [*labels, ("le", str(le))]
+        if not items:
+            return ""
+        return "{" + ",".join(f'{key}="{_escape_label_value(value)}"' for key, value in items) + "}"
+
+
+def _escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
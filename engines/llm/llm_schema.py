@@ -1,8 +1,12 @@
-from typing import Literal
+from collections.abc import Callable
+from typing import Any, Literal
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from openai.types.chat import ChatCompletionMessage
 
+from utils.base_enum import BaseEnum
+from utils.commons import get_uuid
+
 
 class ChatMessage(BaseModel):
     role: Literal["system", "user", "assistant", "tool"]
@@ -19,3 +23,195 @@ class ToolcallMessage(ChatMessage):
 
 class HistoryMessages(BaseModel):
     messages: list[ChatMessage | ChatCompletionMessage]
+
+
+class HistoryTrimStats(BaseModel):
+    budget: int  # prompt token 预算
+    tokens_before: int  # 裁剪前的 prompt tokens
+    tokens_after: int = 0  # 裁剪后的 prompt tokens
+    removed_messages: int = 0  # 删除的历史消息数
+    truncated_messages: int = 0  # 截断的工具结果数
+
+
+class InvocationContext(BaseModel):
+    """
+    单次 invoke 调用的状态，所有调用期间产生的状态都放在这里，OpenAILLMInvoke 实例本身不保存任何单次调用的状态
+    调用方可以传入自己创建的 InvocationContext，在调用结束后读取工具调用记录等信息
+    """
+
+    conversation_id: str | None = None
+    model_id: str | None = None
+    endpoint: str | None = None  # 最近一次模型请求实际使用的服务端点名称
+    messages: list[dict] = []  # 本次调用实际发送给模型的 messages
+    tools_history_message: HistoryMessages = HistoryMessages(messages=[])  # 本次调用产生的 assistant/tool 消息
+    tool_origin_res: dict = {}  # 工具函数名 -> 工具函数的原始结果
+    tool_round: int = 0  # 已经执行的工具调用轮数
+    retry_count: int = 0  # 模型请求失败后的重试次数，与工具调用轮数分开计算
+    prompt_tokens_used: int = 0  # 所有请求累计的 prompt tokens
+    # 历史消息裁剪前后的 token 数，未配置 history_budgeter 或没有历史消息时为 None
+    history_trim: HistoryTrimStats | None = None
+    tool_memo: dict = {}  # scope 为 invocation 的幂等工具函数的备忘结果
+    # 事件流调用（event_stream=True）时接收 InvokeEvent 的回调，其他调用为 None
+    event_sink: Callable[["InvokeEvent"], None] | None = Field(None, exclude=True)
+    # 本次调用注册的会话（ConversationEntry），事件流调用提前关闭时只停止本次调用的会话，注册之前为 None
+    conversation_entry: Any = Field(None, exclude=True)
+
+
+class StreamJsonEvent(BaseModel):
+    """
+    流式调用且 is_dict 为 True 时生成器返回的事件
+    - partial：当前已知的部分结果，data 为已完整的顶层字段加上正在输出的字段
+    - field：一个顶层字段已经完整，key/value 为该字段
+    - final：流式输出结束，data 为校验后的完整结果，没有有效的 json 对象时为空 dict
+    """
+
+    type: Literal["partial", "field", "final"]
+    key: str | None = None
+    value: Any = None
+    data: dict = {}
+
+
+class InvokeEvent(BaseModel):
+    """
+    事件流调用（event_stream=True）时生成器返回的事件，round 为事件所属的工具调用轮数（从 0 开始）
+    - round_start：开始一轮模型请求
+    - tool_call_started：模型给出的一个工具调用参数完整，开始执行，tool_name/tool_call_id/arguments 为调用信息
+    - tool_result：工具函数执行结束，content/error/elapsed/memoized 与 ToolExecResult 一致
+    - round_end：本轮工具调用的结果都已返回，下一轮模型请求开始之前
+    - text：模型输出的文本片段
+    - usage：服务端返回的 token 用量
+    - stop：会话被主动停止；error：调用出错，error 为错误信息
+    - finish：正常结束，content 为完整的回答，之后不再有事件
+    """
+
+    type: Literal[
+        "round_start", "tool_call_started", "tool_result", "round_end", "text", "usage", "stop", "error", "finish"
+    ]
+    round: int = 0
+    content: str | None = None
+    tool_name: str | None = None
+    tool_call_id: str | None = None
+    arguments: dict | None = None
+    elapsed: float | None = None
+    error: str | None = None
+    memoized: bool = False
+    usage: dict | None = None
+
+
+class InvokeTextEvent:
+    """
+    事件流调用的 text 事件，每个文本片段都会创建一个，不使用 pydantic 模型以减少每个 chunk 的开销
+    除 round/content 以外的字段与 InvokeEvent 的默认值一致，调用方可以和其他事件一样读取
+    """
+
+    __slots__ = ("content", "round")
+
+    type = "text"
+    tool_name = None
+    tool_call_id = None
+    arguments = None
+    elapsed = None
+    error = None
+    memoized = False
+    usage = None
+
+    def __init__(self, content: str, round: int):
+        self.content = content
+        self.round = round
+
+    def __repr__(self) -> str:
+        return f"InvokeTextEvent(round={self.round}, content={self.content!r})"
+
+    def model_dump(self) -> dict:
+        return InvokeEvent(type="text", round=self.round, content=self.content).model_dump()
+
+
+class PriorityEnum(BaseEnum):
+    """
+    批量调用的优先级，值越小越先执行
+    """
+
+    INTERACTIVE = 0  # 在线交互请求，优先于排队中的批量任务
+    DEFAULT = 1
+    BATCH = 2  # 离线批量任务
+
+
+class BatchRequest(BaseModel):
+    request_id: str = Field(default_factory=get_uuid)
+    priority: PriorityEnum = PriorityEnum.BATCH
+    params: dict  # OpenAILLMInvoke.invoke 的参数
+
+
+class BatchResult(BaseModel):
+    request_id: str
+    result: Any = None  # invoke 的返回结果
+    error: str | None = None  # invoke 抛出异常时的错误信息（invoke 内部出错时返回 None，不会抛出）
+    queue_wait: float  # 排队等待时间（秒），包括等待并发数和速率限制
+    elapsed: float  # invoke 执行耗时（秒）
+
+
+class BatchStats(BaseModel):
+    submitted: int = 0
+    completed: int = 0
+    failed: int = 0  # 抛出异常或返回 None 的请求数
+    queued: int = 0
+    running: int = 0
+    estimated_tokens: int = 0  # 已执行请求的估算 token 数（prompt + max_completion_tokens）
+    requests_per_second: float = 0.0
+    tokens_per_second: float = 0.0
+    avg_queue_wait: float = 0.0
+    p95_queue_wait: float = 0.0
+    max_queue_wait: float = 0.0
+
+
+class EndpointStats(BaseModel):
+    name: str
+    state: Literal["closed", "open", "half_open"]  # 熔断器状态
+    outstanding: int  # 正在等待响应的请求数
+    ewma_latency: float | None  # 延迟的指数加权平均值（秒），流式请求为首 token 延迟
+    requests: int
+    failures: int
+
+
+class ResponseCacheStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0  # 等待进行中的相同请求结果的次数
+    size: int = 0  # 缓存条目数（包括未清理的过期条目）
+    inflight: int = 0  # 正在请求模型的 key 数
+
+
+class StreamCoalesceStats(BaseModel):
+    chunks: int = 0  # 从上游读取的 chunk 数
+    flushes: int = 0  # 合并后返回给调用方的次数
+    overflows: int = 0  # 缓冲区满而中止的流式输出数
+    blocked: int = 0  # 缓冲区满而暂停读取上游的次数
+
+
+class LLMClientConfig(BaseModel):
+    """
+    模型客户端的 HTTP 连接池配置，同一个 (base_url, api_key) 的所有 OpenAILLMInvoke 实例共用一个连接池
+    """
+
+    max_connections: int = 100  # 连接池最大连接数，超过后请求排队等待空闲连接
+    max_keepalive_connections: int = 20  # 最多保持的空闲 keep-alive 连接数
+    keepalive_expiry: float = 60.0  # 空闲 keep-alive 连接的过期时间（秒）
+    http2: bool = False  # 是否启用 HTTP/2（需要安装 httpx[http2]），多个请求复用同一个连接
+    connect_timeout: float = 5.0  # 建立连接超时时间（秒）
+    read_timeout: float = 600.0  # 读取响应超时时间（秒），流式响应为相邻 chunk 的最长间隔
+    retries: int = 1  # 建立连接失败时的重试次数，用于从已断开的 keep-alive 连接中恢复
+    warmup_connections: int = 0  # warmup 时预先建立的连接数，不超过 max_keepalive_connections
+
+
+class LLMClientPoolStats(BaseModel):
+    base_url: str
+    http2: bool
+    max_connections: int
+    connections: int | None  # 当前打开的连接数，httpx 的连接池不支持读取时为 None
+    active_connections: int  # 正在处理请求的连接数
+    idle_connections: int | None  # 空闲的 keep-alive 连接数，httpx 的连接池不支持读取时为 None
+    in_flight_requests: int  # 已经发出、响应还没有读取完的请求数（流式响应在输出期间一直计入）
+    waiting_requests: int  # 等待空闲连接的请求数，持续大于 0 时说明 max_connections 偏小
+    requests: int  # 累计发出的请求数
+    peak_in_flight_requests: int  # 进行中的请求数的峰值
+    peak_waiting_requests: int  # 等待空闲连接的请求数的峰值
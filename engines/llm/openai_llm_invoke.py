@@ -1,39 +1,140 @@
 import json
 from json.decoder import JSONDecodeError
 import logging
-from typing import AsyncGenerator
+import time
+from collections.abc import AsyncGenerator, Awaitable, Callable
 import asyncio
+import contextlib
+from collections import deque
 
 from openai import AsyncOpenAI, AsyncStream, NOT_GIVEN
-from openai.types.chat import ChatCompletionChunk
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
 
 from utils.get_dict import get_dict
 from utils.commons import get_uuid
 from engines.llm.prompts.static.common_prompt_template import COMMON_SYSTEM_PROMPT
-from engines.llm.llm_schema import HistoryMessages, ToolcallMessage, ChatMessage
-from engines.tools import tool_functions
+from engines.llm.llm_schema import (
+    HistoryMessages,
+    ToolcallMessage,
+    ChatMessage,
+    InvocationContext,
+    StreamJsonEvent,
+    InvokeEvent,
+    InvokeTextEvent,
+    BatchRequest,
+    BatchResult,
+)
+from engines.llm.batch_invoker import BatchInvoker
+from engines.llm.retry_policy import RetryPolicy
+from engines.llm.circuit_breaker import CircuitBreaker, CircuitOpenError
+from engines.llm.endpoint_pool import Endpoint, EndpointPool
+from engines.llm.client_pool import LLMClientRegistry, global_llm_clients
+from engines.llm.history_store import HistoryStore
+from engines.llm.response_cache import ResponseCache
+from engines.llm.token_counter import TokenCounter, EstimateTokenCounter
+from engines.llm.history_budgeter import HistoryBudgeter
+from engines.llm.invoke_metrics import InvokeHooks, StreamObserver, emit_hooks
+from engines.llm.stream_coalescer import StreamCoalescer
+from engines.llm.stream_hub import StreamHub
+from engines.llm.tool_call_assembler import ToolCallAssembler, AssembledToolCall
+from engines.llm.stream_json_extractor import StreamJsonExtractor
+from engines.llm.conversation_registry import ConversationRegistry, ConversationEntry, ConversationStoppedError
 from engines.tools.tool_schema import ToolParam
-
+from engines.tools.tool_services.tool_executor import ToolExecutor, global_tool_executor
+from engines.tools.tool_services.tool_memo import ToolMemoTable, global_tool_memo
+from engines.tools.tool_services.tool_registry import global_tool_registry
 
 
 logger = logging.getLogger(__name__)
 
-# 用以实现流式会话的中断
-global_conversation_events: dict[str, asyncio.Event] = {}
+# 用以实现会话的中断，会话结束或超时后自动移除
+global_conversation_registry = ConversationRegistry()
 
 
 class OpenAILLMInvoke:
-    def __init__(self, api_key:str, base_url:str):
+    def __init__(
+        self,
+        api_key: str | None = None,
+        base_url: str | None = None,
+        tool_executor: ToolExecutor | None = None,
+        retry_policy: RetryPolicy | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
+        endpoint_pool: EndpointPool | None = None,
+        response_cache: ResponseCache | None = None,
+        token_counter: TokenCounter | None = None,
+        history_budgeter: HistoryBudgeter | None = None,
+        hooks: list[InvokeHooks] | None = None,
+        include_stream_usage: bool = True,
+        stream_coalescer: StreamCoalescer | None = None,
+        stream_hub: StreamHub | None = None,
+        tool_memo: ToolMemoTable | None = None,
+        history_store: HistoryStore | None = None,
+        history_turns: int = 20,
+        client_registry: LLMClientRegistry | None = None,
+    ):
+        """
+        :param api_key: 单个服务端点的 api key
+        :param base_url: 单个服务端点的地址，传入 endpoint_pool 时可以为空
+        :param tool_executor: 工具函数执行器，默认使用进程内共享的 global_tool_executor，传入时由调用方负责 shutdown
+        :param retry_policy: 模型请求的重试策略
+        :param circuit_breaker: 单个服务端点的熔断器，默认按 base_url 在所有实例间共享
+        :param endpoint_pool: 多个服务端点组成的池，请求按延迟和负载路由，失败时切换到其他服务端点
+        :param response_cache: 模型回答缓存，为 None 时不缓存
+        :param token_counter: 估算 prompt token 数的计数器，默认为离线估算
+        :param history_budgeter: 按 token 预算裁剪历史消息，为 None 时发送完整的历史消息
+        :param hooks: invoke 各阶段的回调，如 MetricsCollector
+        :param include_stream_usage: 流式请求是否设置 stream_options.include_usage，让服务端在最后返回 token 用量
+        :param stream_coalescer: 合并流式输出中的小 chunk，并限制调用方读取慢时的缓冲大小，为 None 时逐个返回 chunk
+        :param stream_hub: 按会话 ID 共享流式输出，设置后客户端可以通过 subscribe_stream 重连或多处订阅同一个会话的输出
+            调用方提前关闭生成器时上游继续生成，需要通过 set_event_stop 停止
+        :param tool_memo: 幂等工具函数（tool_memo 装饰器声明）的结果备忘表，默认为进程内共享的 global_tool_memo
+        :param history_store: 按会话 ID 保存的历史消息，设置后传入 conversation_id 的调用自动读取最近的历史消息，
+            并在正常结束时写入本轮对话，为 None 时只使用调用方传入的 history_messages
+        :param history_turns: 从 history_store 读取的最近对话轮数
+        :param client_registry: 按 (base_url, api_key) 共享客户端和连接池，默认为进程内共享的 global_llm_clients
+        """
         self.api_key = api_key
         self.base_url = base_url
+        self.client_registry = client_registry if client_registry is not None else global_llm_clients
 
-        self.llm_client = self.get_llm_client()
+        # 同一轮中的多个工具调用通过执行器并发执行
+        self.tool_executor = tool_executor if tool_executor is not None else global_tool_executor
+        # 模型请求的重试，有多个服务端点时优先切换到其他服务端点
+        self.retry_policy = retry_policy or RetryPolicy()
+        if endpoint_pool is None:
+            if not base_url:
+                raise ValueError("base_url 和 endpoint_pool 不能同时为空")
+            endpoint = Endpoint(
+                base_url, api_key, circuit_breaker=circuit_breaker, client_registry=self.client_registry
+            )
+            endpoint_pool = EndpointPool([endpoint], is_failure=self.retry_policy.is_retryable)
+        self.endpoint_pool = endpoint_pool
+        # 第一个服务端点的熔断器
+        self.circuit_breaker = endpoint_pool.endpoints[0].circuit_breaker
+        # 只缓存没有发生工具调用的最终回答，命中时不请求模型
+        self.response_cache = response_cache
+        self.token_counter = token_counter or EstimateTokenCounter()
+        self.history_budgeter = history_budgeter
+        # 没有回调时不记录任何时间，流式输出的每个 chunk 只多一次判断
+        self.hooks = list(hooks or [])
+        self.include_stream_usage = include_stream_usage
+        self.stream_coalescer = stream_coalescer
+        self.stream_hub = stream_hub
+        # 只有声明为幂等的工具函数会被备忘，其他工具函数每次都执行
+        # 默认共享备忘表，按请求创建实例时 conversation 和 global 作用域的结果同样可以复用
+        self.tool_memo = tool_memo if tool_memo is not None else global_tool_memo
+        self.history_store = history_store
+        self.history_turns = history_turns
+        # NOTE: 实例上不保存任何单次调用的状态（均在 InvocationContext 中），同一个实例和连接池可以被并发调用共享
 
-        self.tools_history_message: HistoryMessages = HistoryMessages(messages=[])
-        self.tool_origin_res: dict = {}
+    @property
+    def llm_client(self) -> AsyncOpenAI:
+        # 第一个服务端点的客户端，共享的客户端和当前事件循环绑定
+        return self.endpoint_pool.endpoints[0].client
 
-    def get_llm_client(self):
-        return AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+    def get_llm_client(self) -> AsyncOpenAI:
+        # 相同服务端点的实例共用客户端和连接池，按租户或按请求创建实例时不会重复建立连接
+        return self.client_registry.get(self.base_url, self.api_key)
 
     async def invoke(
         self,
@@ -42,12 +143,18 @@ class OpenAILLMInvoke:
         model_id: str,
         system_prompt: str = COMMON_SYSTEM_PROMPT,
         history_messages: HistoryMessages = None,
-        tools: list[ToolParam] = None,
+        tools: list[ToolParam | str] | None = None,
         is_stream: bool = False,
         temperature: float = 0.3,
         is_dict: bool = False,
         max_completion_tokens: int = None,
         conversation_id: str = None,
+        max_tool_rounds: int = 3,
+        prompt_token_budget: int | None = None,
+        context: InvocationContext | None = None,
+        use_cache: bool = True,
+        coalesce_stream: bool = True,
+        event_stream: bool = False,
     ) -> dict | str | AsyncGenerator | None:
         """
         调用 LLM
@@ -55,166 +162,789 @@ class OpenAILLMInvoke:
         :param user_prompt: 用户提示词
         :param model_id: 模型 id，默认为 .env 中配置的 LLM_DEFAULT_MODEL_ID
         :param system_prompt: 系统提示词
-        :param history_messages: 历史消息列表，用于模型记忆，如果为 None，则不使用历史消息
-        :param tools: 工具列表，模型工具调用（原始工具调用方式）
+        :param history_messages: 历史消息列表，用于模型记忆，为 None 时使用 history_store 中该会话的历史消息（如果有）
+        :param tools: 工具列表，模型工具调用（原始工具调用方式），可以直接传入已注册的工具函数名
         :param is_stream: 是否流式调用，默认为 False
         :param temperature: 模型调用 temperature 参数
-        :param is_dict: 是否返回 dict 结果，如果是 False，返回原始结果，如果为 True 但是结果中不包含 dict，返回空 dict，如果 is_stream 为 True，该参数无效
+        :param is_dict: 是否返回 dict 结果，如果是 False，返回原始结果，如果为 True 但是结果中不包含 dict，返回空 dict
+            如果 is_stream 同时为 True，生成器返回 StreamJsonEvent：字段完整时立即返回，最后返回完整结果
         :param max_completion_tokens: 模型调用 max_completion_tokens 参数，返回结果的最大 token 数
         :param conversation_id: 会话 ID，用于流式调用时主动停止输出和历史记录写入
+        :param max_tool_rounds: 最多执行的工具调用轮数，超过后模型不再调用工具，直接给出最终回答
+        :param prompt_token_budget: 本次调用所有请求累计的 prompt token 预算，预算不足时同样直接给出最终回答
+        :param context: 本次调用的上下文，传入时调用结束后可以从中读取工具调用记录等信息，为 None 时自动创建
+        :param use_cache: 是否使用 response_cache，实例未设置 response_cache 时无效
+        :param coalesce_stream: 流式调用是否合并小 chunk，实例未设置 stream_coalescer 时无效
+        :param event_stream: 是否以事件流返回，为 True 时立即返回生成器，按调用过程依次返回 InvokeEvent
+            （工具调用开始和结果、每轮的开始和结束、文本片段、token 用量和结束），不支持 is_dict
         :return: 模型推理结果
         """
-        self.tools_history_message = HistoryMessages(messages=[])  # 每次调用都清空工具调用历史消息重新组装
-        method = self.llm_client.chat.completions.create
+        ctx = context or InvocationContext()
+        call_kwargs = {
+            "user_prompt": user_prompt,
+            "model_id": model_id,
+            "system_prompt": system_prompt,
+            "history_messages": history_messages,
+            "tools": tools,
+            "temperature": temperature,
+            "max_completion_tokens": max_completion_tokens,
+            "conversation_id": conversation_id,
+            "max_tool_rounds": max_tool_rounds,
+            "prompt_token_budget": prompt_token_budget,
+            "use_cache": use_cache,
+            "coalesce_stream": coalesce_stream,
+        }
+        if event_stream:
+            if is_dict:
+                raise ValueError("event_stream 不支持 is_dict")
+            # 调用方传入的上下文可能保存着之前调用注册的会话
+            ctx.conversation_entry = None
+            # 整个调用过程在生成器中执行，工具调用轮的进度也能立即返回给调用方
+            return self._event_generator(ctx, self._invoke(ctx, is_stream=True, is_dict=False, **call_kwargs))
+        return await self._invoke(ctx, is_stream=is_stream, is_dict=is_dict, **call_kwargs)
+
+    async def _invoke(
+        self,
+        ctx: InvocationContext,
+        *,
+        user_prompt: str,
+        model_id: str,
+        system_prompt: str,
+        history_messages: HistoryMessages,
+        tools: list[ToolParam | str] | None,
+        is_stream: bool,
+        temperature: float,
+        is_dict: bool,
+        max_completion_tokens: int | None,
+        conversation_id: str | None,
+        max_tool_rounds: int,
+        prompt_token_budget: int | None,
+        use_cache: bool,
+        coalesce_stream: bool,
+    ) -> dict | str | AsyncGenerator | None:
+        """
+        invoke 的实际执行过程，参数与 invoke 一致，事件流调用在生成器中直接执行，不再经过 invoke
+        """
         params = {
             "model": model_id,
             "messages": [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt},
             ],
-            "tools": [tool.model_dump() for tool in tools] if tools else NOT_GIVEN,
+            "tools": NOT_GIVEN,
             "temperature": temperature,
             "stream": is_stream,
             "max_completion_tokens": max_completion_tokens,
         }
-        conversation_id = conversation_id or get_uuid()
+        if is_stream and self.include_stream_usage:
+            params["stream_options"] = {"include_usage": True}
+        # 只有调用方指定的会话才读写历史记录，自动生成的会话 ID 不会再被使用
+        history_id = (conversation_id or ctx.conversation_id) if self.history_store is not None else None
+        conversation_id = conversation_id or ctx.conversation_id or get_uuid()
+        ctx.conversation_id = conversation_id
+        ctx.model_id = model_id
+        start_time = time.perf_counter()
+        if self.hooks:
+            emit_hooks(self.hooks, "on_invoke_start", ctx)
 
         # 添加历史对话到 system prompt 和最新的 user 消息之间，放在 messages 的第二个位置
         # NOTE: history_messages 不应该存在当前最新的 user 消息
         if history_messages:
             params["messages"][1:1] = history_messages.model_dump().get("messages")
+        elif history_id:
+            # 历史记录按轮保存为 json，读取时直接得到 dict，不经过 HistoryMessages 的校验和 model_dump
+            params["messages"][1:1] = await self.history_store.aload(history_id, self.history_turns)
+        if self.history_budgeter is not None and len(params["messages"]) > 2:
+            params["messages"], ctx.history_trim = self.history_budgeter.trim(params["messages"])
+        ctx.messages = params["messages"]
+        # 本轮对话从最新的 user 消息开始，之后的工具调用消息追加在 messages 末尾
+        turn_start = len(params["messages"]) - 1
 
-        retry_count = 0
-        while retry_count < 3:
-            retry_count += 1
-            try:
-                # 每次调用前都更新 messages 列表
-                if self.tools_history_message.messages:
-                    params["messages"].extend(self.tools_history_message.model_dump().get("messages"))
+        tools_enabled = bool(tools)
+        # 注册会话，用以在模型输出和工具调用的任意阶段主动停止
+        entry = ctx.conversation_entry = global_conversation_registry.register(conversation_id)
+        stream_handed_off = False
+        # 本次调用负责请求模型并写入缓存的 key，相同的并发请求等待本次结果
+        cache_key = None
+        cache_owner = None
+        cache_answer = None
+        try:
+            # 已注册的工具使用注册时序列化的结果，不在每次调用时重新序列化；工具函数不存在时与其他错误一样记录并返回
+            if tools:
+                params["tools"] = global_tool_registry.dump_tools(tools)
+            # 只有确定性的请求使用缓存，temperature 大于 0 时每次都请求模型
+            if self.response_cache is not None and use_cache and self.response_cache.is_cacheable(params):
+                key = self.response_cache.make_key(params)
+                answer = await self._run_until_stopped(entry, self.response_cache.get(key))
+                # 判断和 begin 之间不能让出事件循环，否则并发的相同请求都会请求模型
+                if answer is None and self.response_cache.is_inflight(key):
+                    answer = await self._run_until_stopped(entry, self.response_cache.wait_inflight(key))
+                if answer is not None:
+                    logger.info(f"LLM 命中回答缓存 [会话ID: {conversation_id}]")
+                    # 回答已经完整，流式调用同样直接写入历史记录
+                    if history_id:
+                        await self._record_turn(history_id, params["messages"][turn_start:], answer)
+                    if not is_stream:
+                        return get_dict(answer) if is_dict else answer
+                    stream_handed_off = True
+                    generator = self._replay_generator(answer, entry, self.response_cache.replay_chunk_size)
+                    return self._wrap_stream(generator, entry, is_dict, coalesce_stream)
+                cache_key = key
+                cache_owner = self.response_cache.begin(cache_key)
+
+            while True:
+                if entry.stopped:
+                    raise ConversationStoppedError(conversation_id)
+                if ctx.event_sink is not None:
+                    self._emit_event(ctx, "round_start")
+
+                prompt_tokens = self._estimate_prompt_tokens(params["messages"])
+                # 工具调用轮数或 prompt token 预算用尽时不再允许工具调用，让模型基于已有的工具结果直接给出最终回答
+                if tools_enabled and (
+                    ctx.tool_round >= max_tool_rounds
+                    or (
+                        prompt_token_budget is not None and ctx.prompt_tokens_used + prompt_tokens > prompt_token_budget
+                    )
+                ):
+                    logger.info(
+                        f"LLM 停止工具调用 [会话ID: {conversation_id}, 工具调用轮数: {ctx.tool_round}, "
+                        f"已使用 prompt tokens: {ctx.prompt_tokens_used}]"
+                    )
+                    tools_enabled = False
+                    params["tool_choice"] = "none"
 
-                llm_res = await method(**params)
+                llm_res, first_chunk = await self._run_until_stopped(
+                    entry, self._request_with_retry(ctx, entry, params)
+                )
                 # 处理流式执行
                 if is_stream:
-                    # 创建会话 ID 对应的事件，用以主动停止输出
-                    if conversation_id not in global_conversation_events:
-                        global_conversation_events[conversation_id] = asyncio.Event()
-                    async for chunk in llm_res:
-                        # 通过第一个 chunk 判断是否是工具调用响应
-                        tool_calls = chunk.choices[0].delta.tool_calls
-                        if tool_calls:
-                            await self._tool_call_process(tool_calls, True, llm_res)
-                        else:
-                            return self._stream_generator(chunk, llm_res, conversation_id)
+                    ctx.prompt_tokens_used += prompt_tokens
+                    if first_chunk is None:
+                        return None
+                    # 部分服务的第一个 chunk 只有 role，跳过没有内容、工具调用和结束原因的 chunk 再判断是否调用工具
+                    first_chunk = await self._run_until_stopped(entry, self._skip_empty_chunks(first_chunk, llm_res))
+                    tool_calls = first_chunk.choices[0].delta.tool_calls if first_chunk.choices else None
+                    if tool_calls and tools_enabled:
+                        new_messages = await self._tool_round(ctx, entry, tool_calls, True, llm_res)
+                    else:
+                        stream_handed_off = True
+                        on_complete = None
+                        if cache_key is not None:
+                            on_complete = self._cache_completer(cache_key, cache_owner, cacheable=ctx.tool_round == 0)
+                            cache_key = None
+                        if history_id:
+                            on_complete = self._history_completer(
+                                history_id, params["messages"][turn_start:], on_complete
+                            )
+                        observer = StreamObserver(self.hooks, ctx, ctx.endpoint) if self.hooks else None
+                        generator = self._stream_generator(
+                            first_chunk, llm_res, entry, on_complete, observer, ctx if ctx.event_sink else None
+                        )
+                        return self._wrap_stream(generator, entry, is_dict, coalesce_stream)
 
                 else:
+                    ctx.prompt_tokens_used += llm_res.usage.prompt_tokens if llm_res.usage else prompt_tokens
                     assistant_message = llm_res.choices[0].message
                     tool_calls = assistant_message.tool_calls
-                    if tool_calls:
-                        await self._tool_call_process(tool_calls, False)
+                    if tool_calls and tools_enabled:
+                        new_messages = await self._tool_round(ctx, entry, tool_calls, False)
                     else:
                         answer = assistant_message.content
+                        if ctx.tool_round == 0 and ResponseCache.is_complete(llm_res.choices[0].finish_reason):
+                            cache_answer = answer
+                        if history_id:
+                            await self._record_turn(history_id, params["messages"][turn_start:], answer)
                         return get_dict(answer) if is_dict else answer
 
-            except JSONDecodeError as e:
-                logger.exception(f"JSON 解码错误：{str(e)}")
-                return {}
+                # 只追加本轮新增的 assistant/tool 消息
+                params["messages"].extend(new_messages)
+                if ctx.event_sink is not None:
+                    self._emit_event(ctx, "round_end")
+                ctx.tool_round += 1
 
-            except Exception as e:
-                logger.exception(f"LLM 调用出错：{str(e)}")
+        except ConversationStoppedError:
+            logger.info(f"LLM 主动停止调用 [会话ID: {conversation_id}, 工具调用轮数: {ctx.tool_round}]")
+            if self.hooks:
+                emit_hooks(self.hooks, "on_stop", ctx)
+            if ctx.event_sink is not None:
+                self._emit_event(ctx, "stop")
+            return None
+
+        except JSONDecodeError as e:
+            logger.exception(f"JSON 解码错误：{str(e)}")
+            return {}
+
+        except CircuitOpenError as e:
+            logger.warning(f"LLM 调用失败 [会话ID: {conversation_id}]：{e}")
+            return None
+
+        except Exception as e:
+            # 停止会话时关闭上游流式响应，读取中的响应会抛出连接相关的异常
+            if entry.stopped:
+                logger.info(f"LLM 主动停止调用 [会话ID: {conversation_id}, 工具调用轮数: {ctx.tool_round}]")
+                if self.hooks:
+                    emit_hooks(self.hooks, "on_stop", ctx)
+                if ctx.event_sink is not None:
+                    self._emit_event(ctx, "stop")
                 return None
+            logger.exception(f"LLM 调用出错：{str(e)}")
+            if ctx.event_sink is not None:
+                self._emit_event(ctx, "error", error=f"LLM 调用出错：{e}")
+            return None
+
+        finally:
+            # 流式输出交给生成器后，由生成器在结束时移除会话
+            if not stream_handed_off:
+                global_conversation_registry.release(entry)
+            # 流式输出交给生成器后，由生成器在结束时写入缓存
+            if cache_key is not None:
+                await self.response_cache.finish(cache_key, cache_answer, cache_owner)
+            if self.hooks:
+                emit_hooks(self.hooks, "on_invoke_end", ctx, time.perf_counter() - start_time)
+
+    async def invoke_many(
+        self,
+        requests: list[BatchRequest | dict],
+        *,
+        max_concurrency: int = 8,
+        rpm: float | None = None,
+        tpm: float | None = None,
+    ) -> AsyncGenerator[BatchResult, None]:
+        """
+        批量调用 invoke，按完成顺序返回结果
+        需要与在线请求共用并发数和速率限制时，直接创建 BatchInvoker 并通过 submit 提交在线请求
 
-    async def exec_tool_func(self, func_name: str, func_args: dict, func_id: str):
+        :param requests: BatchRequest 或 invoke 的参数 dict
+        :param max_concurrency: 最大并发数
+        :param rpm: 每分钟最多请求数，None 表示不限制
+        :param tpm: 每分钟最多 token 数（prompt 估算值加上 max_completion_tokens），None 表示不限制
         """
-        原始方式执行工具函数，并把结果写入到 self.tools_history_message 里
+        batch_invoker = BatchInvoker(self, max_concurrency=max_concurrency, rpm=rpm, tpm=tpm)
+        try:
+            async for result in batch_invoker.invoke_many(requests):
+                yield result
+        finally:
+            await batch_invoker.aclose()
+
+    @staticmethod
+    async def _run_until_stopped(entry: ConversationEntry, coro):
+        """
+        执行 coro，会话被停止时取消执行并抛出 ConversationStoppedError
+        """
+        task = asyncio.ensure_future(coro)
+        stop_task = asyncio.ensure_future(entry.event.wait())
+        try:
+            await asyncio.wait({task, stop_task}, return_when=asyncio.FIRST_COMPLETED)
+        except BaseException:
+            task.cancel()
+            raise
+        finally:
+            stop_task.cancel()
+        if not task.done():
+            task.cancel()
+            raise ConversationStoppedError(entry.conversation_id)
+        return task.result()
+
+    async def _request_with_retry(
+        self, ctx: InvocationContext, entry: ConversationEntry, params: dict
+    ) -> tuple[ChatCompletion | AsyncStream, ChatCompletionChunk | None]:
+        """
+        发送模型请求，临时性错误按 retry_policy 重试，返回 (响应, 流式响应的第一个 chunk)
+        - 有其他可用的服务端点时立即切换重试，所有服务端点都已失败时退避后重试
+        - 流式请求只在读取到第一个 chunk 之前重试，之后出错不会重新发起请求，已经返回给调用方的内容不会重复
+        """
+        attempt = 0
+        tried: set[Endpoint] = set()
+        while True:
+            endpoint = self.endpoint_pool.select(exclude=tried) or self.endpoint_pool.select()
+            if endpoint is None:
+                raise CircuitOpenError("所有服务端点都处于熔断状态")
+            if self.hooks:
+                emit_hooks(self.hooks, "on_request_start", ctx, endpoint.name)
+            request_time = time.perf_counter()
+            try:
+                endpoint, llm_res, first_chunk = await self.endpoint_pool.send(endpoint, params)
+            except CircuitOpenError:
+                # 服务端点的探测请求名额已满，切换到其他服务端点
+                if endpoint in tried:
+                    raise
+                tried.add(endpoint)
+                continue
+            except Exception as e:
+                if self.hooks:
+                    emit_hooks(self.hooks, "on_request_end", ctx, endpoint.name, time.perf_counter() - request_time, e)
+                if not self.retry_policy.is_retryable(e) or attempt >= self.retry_policy.max_retries or entry.stopped:
+                    raise
+
+                attempt += 1
+                ctx.retry_count += 1
+                if self.hooks:
+                    emit_hooks(self.hooks, "on_retry", ctx, endpoint.name, attempt, e)
+                tried.add(endpoint)
+                if self.endpoint_pool.select(exclude=tried) is not None:
+                    logger.warning(
+                        f"LLM 请求失败，切换服务端点第 {attempt} 次重试 [会话ID: {ctx.conversation_id}, "
+                        f"服务端点: {endpoint.name}]：{e}"
+                    )
+                    continue
+
+                delay = self.retry_policy.get_delay(attempt - 1, e)
+                logger.warning(
+                    f"LLM 请求失败，{delay:.2f} 秒后第 {attempt} 次重试 [会话ID: {ctx.conversation_id}]：{e}"
+                )
+                await asyncio.sleep(delay)
+                continue
+
+            ctx.endpoint = endpoint.name
+            if self.hooks:
+                self._emit_request_end(ctx, params, time.perf_counter() - request_time, llm_res)
+            if params["stream"]:
+                # 记录上游流式响应，停止会话时直接关闭
+                entry.stream = llm_res
+            return llm_res, first_chunk
+
+    def _emit_request_end(self, ctx: InvocationContext, params: dict, elapsed: float, llm_res):
+        emit_hooks(self.hooks, "on_request_end", ctx, ctx.endpoint, elapsed, None)
+        if params["stream"]:
+            emit_hooks(self.hooks, "on_first_chunk", ctx, ctx.endpoint, elapsed)
+        elif llm_res.usage:
+            emit_hooks(self.hooks, "on_usage", ctx, ctx.endpoint, llm_res.usage)
+
+    async def _tool_round(
+        self, ctx: InvocationContext, entry: ConversationEntry, tool_calls, is_stream: bool, llm_res: AsyncStream = None
+    ) -> list[dict]:
+        """
+        执行一轮工具调用，返回本轮新增的 assistant/tool 消息，会话被停止时取消正在执行的工具函数
+        """
+        history_count = len(ctx.tools_history_message.messages)
+        await self._run_until_stopped(entry, self._tool_call_process(ctx, tool_calls, is_stream, llm_res))
+        return [message.model_dump() for message in ctx.tools_history_message.messages[history_count:]]
+
+    def _estimate_prompt_tokens(self, messages: list[dict]) -> int:
+        return self.token_counter.count_messages(messages)
+
+    async def exec_tool_func(self, ctx: InvocationContext, func_name: str, func_args: dict, func_id: str):
+        """
+        原始方式执行工具函数，并把结果写入到 ctx.tools_history_message 里
         该方法独立维护
         """
+        await self.exec_tool_funcs(ctx, [(func_name, func_args, func_id)])
+
+    async def exec_tool_funcs(self, ctx: InvocationContext, func_calls: list[tuple[str, dict, str]]):
+        """
+        并发执行同一轮中的多个工具函数，并按调用顺序把结果写入到 ctx.tools_history_message 里
+
+        :param ctx: 本次调用的上下文
+        :param func_calls: [(工具函数名, 工具函数参数, 工具调用 id), ...]
+        """
+        tasks = [
+            self._dispatch_tool_func(ctx, func_name, func_args, func_id) for func_name, func_args, func_id in func_calls
+        ]
+        await self._record_tool_results(ctx, [(func_name, func_id) for func_name, _, func_id in func_calls], tasks)
+
+    def _dispatch_tool_func(
+        self, ctx: InvocationContext, func_name: str, func_args: dict | str, func_id: str | None = None
+    ) -> asyncio.Task:
+        """
+        立即开始执行工具函数，返回执行任务，func_args 为 str 时按 json 解析
+
+        :param func_id: 工具调用 id，只用于事件流
+        """
+        # 从注册表中查找函数，函数不存在或参数校验失败时由执行器记录错误信息
+        func_obj = global_tool_registry.get_func(func_name) or self._raise_tool_error(f"工具函数不存在：{func_name}")
+        tool = global_tool_registry.get(func_name)
         try:
-            # 动态加载函数和执行
-            func_obj = getattr(tool_functions, func_name)
-            logger.info(f"执行工具函数：{func_name}, 参数：{func_args}")
-            to_llm_content, origin_res = func_obj(**func_args)
-            self.tool_origin_res[func_name] = origin_res
-            self.tools_history_message.messages.append(
-                ToolcallMessage(tool_call_id=func_id, name=func_name, content=to_llm_content)
+            if isinstance(func_args, str):
+                try:
+                    func_args = json.loads(func_args or "{}")
+                except JSONDecodeError as e:
+                    raise ValueError(f"工具函数参数不是合法的 json：{func_args}") from e
+            if tool is not None:
+                global_tool_registry.validate_arguments(tool, func_args)
+        except ValueError as e:
+            func_obj, func_args = self._raise_tool_error(str(e)), {}
+
+        logger.info(f"执行工具函数：{func_name}, 参数：{func_args}")
+        if ctx.event_sink is not None:
+            self._emit_event(ctx, "tool_call_started", tool_name=func_name, tool_call_id=func_id, arguments=func_args)
+        memo_policy = getattr(func_obj, "tool_memo_policy", None)
+        if memo_policy is None:
+            task = asyncio.ensure_future(self.tool_executor.execute(func_name, func_obj, func_args))
+        else:
+            task = self.tool_memo.dispatch(
+                func_name,
+                func_args,
+                memo_policy,
+                lambda: self.tool_executor.execute(func_name, func_obj, func_args),
+                ctx.conversation_id,
+                ctx.tool_memo,
             )
+        if self.hooks:
+            emit_hooks(self.hooks, "on_tool_start", ctx, func_name)
+            task.add_done_callback(lambda task: self._on_tool_done(ctx, task))
+        if ctx.event_sink is not None:
+            task.add_done_callback(lambda task: self._emit_tool_result(ctx, func_id, task))
+        return task
 
-        except Exception as e:
-            logger.exception(f"工具函数调用出错：{str(e)}")
+    def _on_tool_done(self, ctx: InvocationContext, task: asyncio.Task):
+        # 执行器会捕获工具函数的异常，任务只会在被取消时没有结果
+        if not task.cancelled() and task.exception() is None:
+            emit_hooks(self.hooks, "on_tool_end", ctx, task.result())
+
+    def _emit_tool_result(self, ctx: InvocationContext, func_id: str | None, task: asyncio.Task):
+        if task.cancelled() or task.exception() is not None or ctx.event_sink is None:
+            return
+        result = task.result()
+        self._emit_event(
+            ctx,
+            "tool_result",
+            tool_name=result.name,
+            tool_call_id=func_id,
+            content=result.content,
+            error=result.error,
+            elapsed=result.elapsed,
+            memoized=result.memoized,
+        )
 
-    async def _tool_call_process(self, tool_calls, is_stream: bool, llm_res: AsyncStream = None):
+    @staticmethod
+    async def _record_tool_results(
+        ctx: InvocationContext, func_calls: list[tuple[str, str]], tasks: list[asyncio.Task]
+    ):
+        """
+        等待工具函数执行完成，按调用顺序把结果写入到 ctx.tools_history_message 里
+
+        :param func_calls: [(工具函数名, 工具调用 id), ...]
+        :param tasks: 与 func_calls 顺序一致的执行任务
+        """
+        exec_results = await asyncio.gather(*tasks)
+        for (func_name, func_id), exec_res in zip(func_calls, exec_results, strict=True):
+            if exec_res.error is None:
+                ctx.tool_origin_res[func_name] = exec_res.origin_res
+            ctx.tools_history_message.messages.append(
+                ToolcallMessage(tool_call_id=func_id, name=func_name, content=exec_res.content)
+            )
+
+    @staticmethod
+    def _raise_tool_error(error: str):
+        def raise_error(**_):
+            raise ValueError(error)
+
+        return raise_error
+
+    async def _tool_call_process(
+        self, ctx: InvocationContext, tool_calls, is_stream: bool, llm_res: AsyncStream = None
+    ):
         if is_stream:
-            func_call_list = []
-            current_tool = None
-
-            def append_func_args(tool_part):
-                nonlocal current_tool
-                nonlocal func_call_list
-
-                if tool_part.id and tool_part.id not in [tc.get("id") for tc in func_call_list if isinstance(tc, dict)]:
-                    current_tool = {"id": tool_part.id, "function": {"name": "", "arguments": ""}}
-                    func_call_list.append(current_tool)
-                if tool_part.function.name:
-                    if current_tool:
-                        current_tool["function"]["name"] += tool_part.function.name
-                if tool_part.function.arguments:
-                    if current_tool:
-                        current_tool["function"]["arguments"] += tool_part.function.arguments
-
-            for first_tool_delta in tool_calls:
-                append_func_args(first_tool_delta)
+            # 某个工具调用的参数完整后立即开始执行，不等待模型输出完所有的工具调用
+            tasks: dict[int, asyncio.Task] = {}
 
-            async for chunk in llm_res:
-                tool_calls_later = chunk.choices[0].delta.tool_calls
-                if tool_calls_later:
-                    for tool_delta in tool_calls_later:
-                        append_func_args(tool_delta)
-
-            # 将 assistant 的 tool_calls 添加到历史记录中
-            self.tools_history_message.messages.append(
-                ChatMessage(
-                    role="assistant",
-                    content=None,
-                    tool_calls=func_call_list,
+            def dispatch(tool_call: AssembledToolCall):
+                logger.info(f"LLM 执行原始工具调用（流式）：{tool_call.name}，参数{tool_call.arguments}")
+                tasks[tool_call.index] = self._dispatch_tool_func(
+                    ctx, tool_call.name, tool_call.arguments, tool_call.id
                 )
-            )
-            # 执行工具函数
+
+            assembler = ToolCallAssembler(on_complete=dispatch)
+            try:
+                assembler.feed(tool_calls)
+                async for chunk in llm_res:
+                    if chunk.choices and chunk.choices[0].delta.tool_calls:
+                        assembler.feed(chunk.choices[0].delta.tool_calls)
+                    elif chunk.usage:
+                        if self.hooks:
+                            emit_hooks(self.hooks, "on_usage", ctx, ctx.endpoint, chunk.usage)
+                        if ctx.event_sink is not None:
+                            self._emit_event(ctx, "usage", usage=chunk.usage.model_dump())
+                assembled_calls = assembler.finish()
+            except BaseException:
+                # 流式响应异常中断时取消已经提前开始执行的工具函数
+                for task in tasks.values():
+                    task.cancel()
+                raise
+
+            func_call_list = [tool_call.to_dict() for tool_call in assembled_calls]
+            func_tasks = [tasks[tool_call.index] for tool_call in assembled_calls]
+        else:
+            func_call_list = [
+                {
+                    "id": tool.id,
+                    "type": "function",
+                    "function": {"name": tool.function.name, "arguments": tool.function.arguments},
+                }
+                for tool in tool_calls
+            ]
+            func_tasks = []
             for func_call in func_call_list:
                 func_name = func_call["function"]["name"]
                 func_args = func_call["function"]["arguments"]
-                logger.info(f"LLM 执行原始工具调用（流式）：{func_name}，参数{func_args}")
-                await self.exec_tool_func(func_name, json.loads(func_args), func_call["id"])
-        else:
-            for tool in tool_calls:
-                func_name = tool.function.name
-                func_args = tool.function.arguments
-                func_id = tool.id
-
                 logger.info(f"LLM 执行原始工具调用（非流式）：{func_name}，参数{func_args}")
+                func_tasks.append(self._dispatch_tool_func(ctx, func_name, func_args, func_call["id"]))
 
-                self.tools_history_message.messages.append(
-                    ChatMessage(
-                        role="assistant",
-                        content="",
-                        tool_calls=[{"id": func_id, "function": {"name": func_name, "arguments": func_args}}],
-                    )
-                )
-                await self.exec_tool_func(func_name, json.loads(func_args), func_id)
+        # 将 assistant 的 tool_calls 添加到历史记录中，同一轮的工具调用放在同一条 assistant 消息里
+        ctx.tools_history_message.messages.append(
+            ChatMessage(
+                role="assistant",
+                content=None,
+                tool_calls=func_call_list,
+            )
+        )
+        await self._record_tool_results(
+            ctx, [(func_call["function"]["name"], func_call["id"]) for func_call in func_call_list], func_tasks
+        )
+
+    def _cache_completer(
+        self, cache_key: str, cache_owner: asyncio.Future | None, cacheable: bool
+    ) -> Callable[[str | None, str | None], Awaitable[None]]:
+        """
+        流式输出结束时的回调，完整输出的回答写入缓存，发生过工具调用或被 max_completion_tokens 截断的回答不缓存
+        """
+
+        async def on_complete(answer: str | None, finish_reason: str | None):
+            if not (cacheable and ResponseCache.is_complete(finish_reason)):
+                answer = None
+            await self.response_cache.finish(cache_key, answer, cache_owner)
+
+        return on_complete
+
+    def _history_completer(
+        self,
+        conversation_id: str,
+        turn_messages: list[dict],
+        on_complete: Callable[[str | None, str | None], Awaitable[None]] | None,
+    ) -> Callable[[str | None, str | None], Awaitable[None]]:
+        """
+        流式输出结束时的回调，完整输出时写入本轮对话，停止或出错时不写入
+        """
+
+        async def complete(answer: str | None, finish_reason: str | None):
+            if on_complete is not None:
+                await on_complete(answer, finish_reason)
+            await self._record_turn(conversation_id, turn_messages, answer)
+
+        return complete
+
+    async def _record_turn(self, conversation_id: str, turn_messages: list[dict], answer: str | None):
+        if answer is None:
+            return
+        try:
+            await self.history_store.aappend_turn(
+                conversation_id, [*turn_messages, {"role": "assistant", "content": answer}]
+            )
+        except Exception as e:
+            logger.warning(f"写入历史记录出错 [会话ID: {conversation_id}]：{e}", exc_info=True)
 
     @staticmethod
-    async def _stream_generator(first_chunk: ChatCompletionChunk, llm_res: AsyncStream, conversation_id: str):
-        yield first_chunk.choices[0].delta.content
-        async for chunk in llm_res:
-            if global_conversation_events[conversation_id].is_set():
-                logger.info(f"LLM 主动停止流式输出 [会话ID: {conversation_id}]")
+    async def _skip_empty_chunks(first_chunk: ChatCompletionChunk, llm_res: AsyncStream) -> ChatCompletionChunk:
+        """
+        返回第一个有内容、工具调用或结束原因的 chunk，流式响应提前结束时返回最后一个 chunk
+        """
+        chunk = first_chunk
+        while not chunk.choices or not (
+            chunk.choices[0].delta.content or chunk.choices[0].delta.tool_calls or chunk.choices[0].finish_reason
+        ):
+            try:
+                chunk = await llm_res.__anext__()
+            except StopAsyncIteration:
                 break
-            content = chunk.choices[0].delta.content
-            if content:
-                yield content
+        return chunk
+
+    @staticmethod
+    def _emit_event(ctx: InvocationContext, event_type: str, **fields):
+        ctx.event_sink(InvokeEvent(type=event_type, round=ctx.tool_round, **fields))
+
+    async def _event_generator(
+        self, ctx: InvocationContext, invoke_coro
+    ) -> AsyncGenerator[InvokeEvent | InvokeTextEvent, None]:
+        """
+        在单独的任务中执行 invoke，工具调用轮期间的事件通过 ctx.event_sink 写入队列后立即返回；
+        invoke 返回文本生成器后直接在当前生成器中读取，文本片段不经过队列
+        调用方提前关闭生成器时停止会话
+        """
+        pending: deque[InvokeEvent] = deque()
+        wakeup = asyncio.Event()
+
+        def sink(event: InvokeEvent):
+            pending.append(event)
+            wakeup.set()
+
+        ctx.event_sink = sink
+        driver = asyncio.ensure_future(invoke_coro)
+        generator = None
+        finished = False  # 已经返回 stop 或 error 事件
+        try:
+            while not driver.done():
+                waiter = asyncio.ensure_future(wakeup.wait())
+                await asyncio.wait((driver, waiter), return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+                wakeup.clear()
+                while pending:
+                    event = pending.popleft()
+                    finished = finished or event.type in ("stop", "error")
+                    yield event
+
+            generator = driver.result()
+            contents = []
+            if generator is not None:
+                # 文本输出期间工具调用轮已经结束，轮数不再变化
+                round = ctx.tool_round
+                try:
+                    async for content in generator:
+                        contents.append(content)
+                        yield InvokeTextEvent(content, round)
+                        # 文本输出期间只有 token 用量和停止事件会写入队列，通常为空，只多一次判断
+                        while pending:
+                            event = pending.popleft()
+                            finished = finished or event.type in ("stop", "error")
+                            yield event
+                except Exception as e:
+                    logger.exception("LLM 流式输出出错")
+                    sink(InvokeEvent(type="error", round=ctx.tool_round, error=f"LLM 流式输出出错：{e}"))
+            elif not pending and not finished:
+                sink(InvokeEvent(type="error", round=ctx.tool_round, error="LLM 调用失败"))
+            while pending:
+                event = pending.popleft()
+                finished = finished or event.type in ("stop", "error")
+                yield event
+            if not finished:
+                yield InvokeEvent(type="finish", round=ctx.tool_round, content="".join(contents))
+        finally:
+            if not driver.done():
+                # 只停止本次调用注册的会话，相同会话 ID 后续注册的其他调用不受影响；还没有注册会话时直接取消任务
+                if ctx.conversation_entry is not None:
+                    await ctx.conversation_entry.stop()
+                else:
+                    driver.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    generator = await driver
+            if generator is not None:
+                await generator.aclose()
+            ctx.event_sink = None
+
+    @staticmethod
+    async def _stream_generator(
+        first_chunk: ChatCompletionChunk,
+        llm_res: AsyncStream,
+        entry: ConversationEntry,
+        on_complete: Callable[[str | None, str | None], Awaitable[None]] | None = None,
+        observer: StreamObserver | None = None,
+        event_ctx: InvocationContext | None = None,
+    ):
+        """
+        :param on_complete: 流式输出结束时的回调，传入回答和 finish_reason
+            正常结束时传入完整的回答，停止、出错或调用方提前关闭时回答为 None
+        :param observer: 记录 chunk 间隔和 token 用量，没有回调时为 None
+        :param event_ctx: 事件流调用的上下文，用于返回 token 用量和停止事件，其他调用为 None
+        """
+        contents = []
+        completed = False
+        finish_reason = first_chunk.choices[0].finish_reason if first_chunk.choices else None
+        try:
+            if first_chunk.choices and first_chunk.choices[0].delta.content:
+                if on_complete is not None:
+                    contents.append(first_chunk.choices[0].delta.content)
+                yield first_chunk.choices[0].delta.content
+            async for chunk in llm_res:
+                if entry.stopped:
+                    break
+                # 设置 include_usage 时最后一个 chunk 只有 usage，没有 choices
+                if not chunk.choices:
+                    if observer is not None and chunk.usage:
+                        observer.usage = chunk.usage
+                    if event_ctx is not None and chunk.usage:
+                        OpenAILLMInvoke._emit_event(event_ctx, "usage", usage=chunk.usage.model_dump())
+                    continue
+                if chunk.choices[0].finish_reason:
+                    finish_reason = chunk.choices[0].finish_reason
+                content = chunk.choices[0].delta.content
+                if content:
+                    if observer is not None:
+                        observer.observe_chunk()
+                    if on_complete is not None:
+                        contents.append(content)
+                    yield content
+            completed = not entry.stopped
+        except Exception:
+            # 停止会话时上游流式响应被关闭，读取会抛出连接相关的异常
+            if not entry.stopped:
+                raise
+        finally:
+            if entry.stopped:
+                logger.info(f"LLM 主动停止流式输出 [会话ID: {entry.conversation_id}]")
+                if event_ctx is not None:
+                    OpenAILLMInvoke._emit_event(event_ctx, "stop")
+            # 无论正常结束、出错、停止还是调用方提前关闭生成器，都关闭上游响应并移除会话
+            await llm_res.close()
+            global_conversation_registry.release(entry)
+            if on_complete is not None:
+                await on_complete("".join(contents) if completed else None, finish_reason)
+            if observer is not None:
+                observer.finish(stopped=entry.stopped)
+
+    @staticmethod
+    async def _replay_generator(answer: str, entry: ConversationEntry, chunk_size: int) -> AsyncGenerator[str, None]:
+        """
+        按流式输出的方式返回缓存的回答
+        """
+        try:
+            for start in range(0, len(answer), chunk_size):
+                if entry.stopped:
+                    logger.info(f"LLM 主动停止流式输出 [会话ID: {entry.conversation_id}]")
+                    break
+                yield answer[start : start + chunk_size]
+                # 让出事件循环，与上游流式输出一样允许其他任务在 chunk 之间执行
+                await asyncio.sleep(0)
+        finally:
+            global_conversation_registry.release(entry)
+
+    def _wrap_stream(
+        self, generator: AsyncGenerator[str, None], entry: ConversationEntry, is_dict: bool, coalesce: bool
+    ) -> AsyncGenerator:
+        # 上游只读取一次，调用方和之后重连的订阅者都从共享的缓冲区读取
+        if self.stream_hub is not None:
+            self.stream_hub.publish(entry.conversation_id, generator)
+            generator = self.stream_hub.subscribe(entry.conversation_id)
+        # 先合并 chunk 再增量解析 json，减少解析器的调用次数
+        if coalesce and self.stream_coalescer is not None:
+            generator = self.stream_coalescer.coalesce(generator)
+        return self._stream_dict_generator(generator, entry) if is_dict else generator
+
+    def subscribe_stream(
+        self, conversation_id: str, offset: int = 0, coalesce_stream: bool = True
+    ) -> AsyncGenerator[str, None] | None:
+        """
+        订阅进行中或最近完成的流式调用的输出，不重新请求模型；未设置 stream_hub、会话不存在或已过期时返回 None
+
+        :param conversation_id: 流式调用的会话 ID
+        :param offset: 开始读取的偏移量，重连时传入之前已经收到的字符数
+        :param coalesce_stream: 是否合并小 chunk，实例未设置 stream_coalescer 时无效
+        """
+        if self.stream_hub is None:
+            return None
+        generator = self.stream_hub.subscribe(conversation_id, offset)
+        if generator is not None and coalesce_stream and self.stream_coalescer is not None:
+            generator = self.stream_coalescer.coalesce(generator)
+        return generator
+
+    @staticmethod
+    async def _stream_dict_generator(
+        content_generator: AsyncGenerator, entry: ConversationEntry
+    ) -> AsyncGenerator[StreamJsonEvent, None]:
+        """
+        从流式输出中增量提取 json 对象，会话被停止时不返回 final 事件
+        """
+        extractor = StreamJsonExtractor()
+        try:
+            async for content in content_generator:
+                for event in extractor.feed(content):
+                    yield event
+        finally:
+            await content_generator.aclose()
+        if not entry.stopped:
+            yield extractor.finish()
 
     @staticmethod
     async def set_event_stop(conversation_id: str) -> bool:
-        if conversation_id in global_conversation_events:
-            global_conversation_events[conversation_id].set()
+        if await global_conversation_registry.stop(conversation_id):
             logger.info(f"LLM 已设置停止标志位 [会话ID: {conversation_id}]")
             return True
         else:
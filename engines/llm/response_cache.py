@@ -0,0 +1,232 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from engines.llm.llm_schema import ResponseCacheStats
+from utils.sqlite_store import SqliteKVStore
+from utils.ttl_lru_cache import TTLLRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCacheStore(ABC):
+    """
+    模型回答的缓存存储
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> str | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl: float):
+        raise NotImplementedError
+
+    @abstractmethod
+    def size(self) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear(self):
+        raise NotImplementedError
+
+    async def aget(self, key: str) -> str | None:
+        """
+        默认在事件循环中直接调用 get，SqliteResponseCacheStore 放到线程中执行
+        """
+        return self.get(key)
+
+    async def aset(self, key: str, value: str, ttl: float):
+        self.set(key, value, ttl)
+
+    def close(self):
+        """
+        释放存储持有的连接，默认没有需要释放的资源
+        """
+        return
+
+
+class InMemoryResponseCacheStore(ResponseCacheStore):
+    """
+    内存缓存，超过 max_size 时淘汰最久未使用的条目，过期的条目在读取时删除
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._items = TTLLRUCache(max_size)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            return self._items.get(key)
+
+    def set(self, key: str, value: str, ttl: float):
+        with self._lock:
+            self._items.set(key, value, ttl)
+
+    def size(self) -> int:
+        return len(self._items)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class SqliteResponseCacheStore(ResponseCacheStore):
+    """
+    sqlite 缓存，进程重启后仍可命中，多个进程可以共用同一个文件
+    """
+
+    def __init__(self, sqlite_path: str):
+        self._store = SqliteKVStore(sqlite_path, "response_cache")
+
+    def get(self, key: str) -> str | None:
+        row = self._store.get(key)
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl: float):
+        self._store.set(key, value, time.time() + ttl)
+
+    async def aget(self, key: str) -> str | None:
+        return await self._store.arun(self.get, key)
+
+    async def aset(self, key: str, value: str, ttl: float):
+        await self._store.arun(self.set, key, value, ttl)
+
+    def size(self) -> int:
+        return self._store.size()
+
+    def clear(self):
+        self._store.clear()
+
+    def close(self):
+        self._store.close()
+
+
+class ResponseCache:
+    """
+    模型回答缓存，用于确定性的调用（temperature 为 0 的分类和抽取等）
+    - 只缓存 temperature 为 0 或未指定的请求，以及完整结束（finish_reason 不为 "length"）的回答
+    - key 由 model、messages、tools、temperature、max_completion_tokens 等请求参数生成
+    - 合并并发的相同请求（singleflight）：同一时刻相同的 key 只有一个调用方请求模型，其他调用方等待其结果
+    """
+
+    # 参与生成 key 的请求参数
+    KEY_PARAMS = ("model", "messages", "tools", "tool_choice", "temperature", "max_completion_tokens")
+
+    def __init__(
+        self,
+        store: ResponseCacheStore | None = None,
+        ttl: float = 3600,
+        replay_chunk_size: int = 16,
+        inflight_timeout: float = 300,
+    ):
+        """
+        :param store: 缓存存储，默认为内存缓存
+        :param ttl: 缓存过期时间（秒）
+        :param replay_chunk_size: 流式调用命中缓存时每次返回的字符数
+        :param inflight_timeout: 等待进行中的相同请求的最长时间（秒），超时后自行请求模型
+            流式调用返回的生成器没有被读取时，进行中的请求不会结束
+        """
+        self.store = store or InMemoryResponseCacheStore()
+        self.ttl = ttl
+        self.replay_chunk_size = replay_chunk_size
+        self.inflight_timeout = inflight_timeout
+        self.stats = ResponseCacheStats()
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    @classmethod
+    def make_key(cls, params: dict) -> str:
+        key_params = {name: params.get(name) for name in cls.KEY_PARAMS if params.get(name) is not None}
+        if not isinstance(key_params.get("tools"), list):
+            # 没有工具时为 NOT_GIVEN
+            key_params.pop("tools", None)
+        raw_key = json.dumps(key_params, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def is_cacheable(params: dict) -> bool:
+        """
+        请求是否是确定性的，temperature 大于 0 时每次采样的结果不同，不使用缓存
+        """
+        return not params.get("temperature")
+
+    @staticmethod
+    def is_complete(finish_reason: str | None) -> bool:
+        """
+        回答是否完整，因 max_completion_tokens 截断的回答不写入缓存
+        """
+        return finish_reason != "length"
+
+    async def get(self, key: str) -> str | None:
+        try:
+            value = await self.store.aget(key)
+        except Exception as e:
+            logger.warning(f"读取模型回答缓存出错：{e}", exc_info=True)
+            value = None
+        if value is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return value
+
+    def is_inflight(self, key: str) -> bool:
+        return key in self._inflight
+
+    async def wait_inflight(self, key: str) -> str | None:
+        """
+        等待进行中的相同请求，没有进行中的请求或该请求没有得到可缓存的回答时返回 None
+        """
+        future = self._inflight.get(key)
+        if future is None:
+            return None
+        self.stats.coalesced += 1
+        logger.info("合并相同的模型请求，等待进行中的请求结果")
+        try:
+            # 等待方被取消时不影响进行中的请求
+            return await asyncio.wait_for(asyncio.shield(future), self.inflight_timeout)
+        except TimeoutError:
+            logger.warning("等待进行中的相同模型请求超时")
+            return None
+
+    def begin(self, key: str) -> asyncio.Future | None:
+        """
+        开始请求模型，之后相同 key 的请求等待本次结果，调用方必须在结束时调用 finish 并传入返回值
+        相同 key 已有进行中的请求（等待超时后自行请求模型）时返回 None，本次请求不唤醒也不移除其他调用方的请求
+
+        :return: 本次请求持有的 future，作为 finish 的 owner 参数
+        """
+        if key in self._inflight:
+            return None
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        return future
+
+    async def finish(self, key: str, answer: str | None, owner: asyncio.Future | None):
+        """
+        请求结束，先唤醒等待本次结果的相同请求，answer 不为 None 时再写入缓存
+
+        :param owner: begin 的返回值，只有持有者才能唤醒并移除进行中的请求
+        """
+        if owner is not None:
+            if self._inflight.get(key) is owner:
+                del self._inflight[key]
+            if not owner.done():
+                owner.set_result(answer)
+        if answer is not None:
+            try:
+                await self.store.aset(key, answer, self.ttl)
+            except Exception as e:
+                logger.warning(f"写入模型回答缓存出错：{e}", exc_info=True)
+
+    def get_stats(self) -> ResponseCacheStats:
+        return self.stats.model_copy(update={"size": self.store.size(), "inflight": len(self._inflight)})
+
+    def clear(self):
+        self.store.clear()
+
+    def close(self):
+        self.store.close()
@@ -0,0 +1,79 @@
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+import openai
+
+
+class RetryPolicy:
+    """
+    模型请求的重试策略
+    - 只重试连接错误、超时、429 和 5xx 等临时性错误，有多个服务端点时优先切换到其他服务端点重试，4xx 参数错误直接失败
+    - 指数退避加随机抖动（full jitter），避免大量请求同时重试
+    - 服务端返回 Retry-After / retry-after-ms 时按其等待
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 2,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        max_retry_after: float = 30.0,
+        retry_status_codes: frozenset[int] = frozenset({408, 409, 429, 500, 502, 503, 504}),
+    ):
+        """
+        :param max_retries: 最多重试次数，0 表示不重试
+        :param base_delay: 第一次重试的退避时间上限（秒），之后每次翻倍
+        :param max_delay: 退避时间上限（秒）
+        :param max_retry_after: Retry-After 的最大等待时间（秒），超过时按该值等待
+        :param retry_status_codes: 需要重试的 HTTP 状态码
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.retry_status_codes = retry_status_codes
+
+    def is_retryable(self, error: BaseException) -> bool:
+        # APITimeoutError 是 APIConnectionError 的子类，TimeoutError 为流式请求的首 token 超时
+        if isinstance(error, (openai.APIConnectionError, TimeoutError)):
+            return True
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code in self.retry_status_codes
+        return False
+
+    def get_delay(self, attempt: int, error: BaseException | None = None) -> float:
+        """
+        第 attempt 次重试（从 0 开始）前的等待时间（秒）
+        """
+        retry_after = self._get_retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_retry_after)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    @staticmethod
+    def _get_retry_after(error: BaseException | None) -> float | None:
+        response = getattr(error, "response", None)
+        if response is None:
+            return None
+        headers = response.headers
+
+        retry_after_ms = headers.get("retry-after-ms")
+        if retry_after_ms:
+            try:
+                return max(float(retry_after_ms) / 1000, 0.0)
+            except ValueError:
+                pass
+
+        retry_after = headers.get("retry-after")
+        if not retry_after:
+            return None
+        try:
+            return max(float(retry_after), 0.0)
+        except ValueError:
+            pass
+        # HTTP-date 格式
+        try:
+            return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
@@ -0,0 +1,209 @@
+"""
+会话停止信号后端，用于多进程部署时把停止信号推送到持有该会话的进程
+
+收到停止信号后由后端回调 on_stop 直接设置会话的停止标志位，流式输出时不需要逐 chunk 轮询外部状态
+"""
+
+import asyncio
+import logging
+import os
+import socket
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from collections.abc import AsyncIterator, Awaitable, Callable
+from pathlib import Path
+from typing import Any
+
+from utils.commons import get_uuid
+
+logger = logging.getLogger(__name__)
+
+StopCallback = Callable[[str], Awaitable[Any]]
+
+
+class StopSignalBackend(ABC):
+    @abstractmethod
+    async def start(self, on_stop: StopCallback):
+        """
+        开始接收其他进程发出的停止信号，收到后调用 on_stop(conversation_id)
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def publish(self, conversation_id: str) -> bool:
+        """
+        向其他进程广播停止信号，返回是否已经广播
+        """
+        raise NotImplementedError
+
+    async def close(self):
+        """
+        释放后端持有的连接和监听任务，默认没有需要释放的资源
+        """
+        return
+
+
+class InProcessStopSignalBackend(StopSignalBackend):
+    """
+    只在当前进程内生效，不广播停止信号
+    """
+
+    async def start(self, on_stop: StopCallback):
+        pass
+
+    async def publish(self, conversation_id: str) -> bool:
+        return False
+
+
+class UnixSocketStopSignalBackend(StopSignalBackend):
+    """
+    单机多进程：每个进程在 socket_dir 下监听一个 unix datagram socket，停止信号发送给目录下所有其他进程的 socket
+    """
+
+    def __init__(self, socket_dir: str):
+        self.socket_dir = Path(socket_dir)
+        self.socket_path = self.socket_dir / f"worker-{os.getpid()}-{get_uuid()[:8]}.sock"
+        self._sock: socket.socket | None = None
+        self._send_sock: socket.socket | None = None
+        self._on_stop: StopCallback | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def start(self, on_stop: StopCallback):
+        self.socket_dir.mkdir(parents=True, exist_ok=True)
+        self._on_stop = on_stop
+        self._loop = asyncio.get_running_loop()
+
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+        self._sock.bind(str(self.socket_path))
+        self._send_sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._send_sock.setblocking(False)
+        # 收到数据时由事件循环回调，不占用额外的任务
+        self._loop.add_reader(self._sock.fileno(), self._on_readable)
+
+    def _on_readable(self):
+        while True:
+            try:
+                data = self._sock.recv(1024)
+            except (BlockingIOError, InterruptedError):
+                return
+            conversation_id = data.decode("utf-8")
+            logger.info(f"收到其他进程的停止信号 [会话ID: {conversation_id}]")
+            task = self._loop.create_task(self._on_stop(conversation_id))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def publish(self, conversation_id: str) -> bool:
+        if self._send_sock is None:
+            return False
+
+        data = conversation_id.encode("utf-8")
+        published = False
+        for socket_path in self.socket_dir.glob("*.sock"):
+            if socket_path == self.socket_path:
+                continue
+            try:
+                self._send_sock.sendto(data, str(socket_path))
+                published = True
+            except (ConnectionRefusedError, FileNotFoundError):
+                # 进程已经退出，清理残留的 socket 文件
+                logger.warning(f"清理失效的停止信号 socket：{socket_path}")
+                socket_path.unlink(missing_ok=True)
+            except BlockingIOError:
+                logger.warning(f"停止信号 socket 缓冲区已满，发送失败：{socket_path}")
+        return published
+
+    async def close(self):
+        if self._sock is not None:
+            self._loop.remove_reader(self._sock.fileno())
+            self._sock.close()
+            self._send_sock.close()
+            self._sock = self._send_sock = None
+            self.socket_path.unlink(missing_ok=True)
+
+
+class PubSubStopSignalBackend(StopSignalBackend):
+    """
+    多机部署：通过 Redis 风格的发布订阅广播停止信号
+    client 需要实现 redis.asyncio.Redis 的 publish(channel, message) 和 pubsub() 接口
+    """
+
+    def __init__(self, client, channel: str = "llm:conversation:stop"):
+        self.client = client
+        self.channel = channel
+        self._pubsub = None
+        self._listen_task: asyncio.Task | None = None
+
+    async def start(self, on_stop: StopCallback):
+        self._pubsub = self.client.pubsub()
+        await self._pubsub.subscribe(self.channel)
+        self._listen_task = asyncio.create_task(self._listen(on_stop))
+
+    async def _listen(self, on_stop: StopCallback):
+        async for message in self._pubsub.listen():
+            if message.get("type") != "message":
+                continue
+            data = message["data"]
+            conversation_id = data.decode("utf-8") if isinstance(data, bytes) else str(data)
+            try:
+                await on_stop(conversation_id)
+            except Exception:
+                logger.exception(f"处理停止信号出错 [会话ID: {conversation_id}]")
+
+    async def publish(self, conversation_id: str) -> bool:
+        # 发布者自身也会收到消息，停止本地不存在的会话没有副作用
+        receivers = await self.client.publish(self.channel, conversation_id)
+        return bool(receivers)
+
+    async def close(self):
+        if self._listen_task is not None:
+            self._listen_task.cancel()
+            self._listen_task = None
+        if self._pubsub is not None:
+            await self._pubsub.unsubscribe(self.channel)
+            await self._pubsub.aclose()
+            self._pubsub = None
+
+
+class InMemoryPubSub:
+    """
+    redis.asyncio.Redis 发布订阅接口的进程内实现，用于测试和单进程部署
+    """
+
+    def __init__(self):
+        self._subscribers: dict[str, set[asyncio.Queue]] = defaultdict(set)
+
+    async def publish(self, channel: str, message: str) -> int:
+        subscribers = self._subscribers.get(channel, set())
+        for queue in subscribers:
+            queue.put_nowait({"type": "message", "channel": channel, "data": message.encode("utf-8")})
+        return len(subscribers)
+
+    def pubsub(self) -> "InMemoryPubSubSubscriber":
+        return InMemoryPubSubSubscriber(self)
+
+
+class InMemoryPubSubSubscriber:
+    def __init__(self, pubsub: InMemoryPubSub):
+        self._pubsub = pubsub
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._channels: set[str] = set()
+
+    async def subscribe(self, *channels: str):
+        for channel in channels:
+            self._channels.add(channel)
+            self._pubsub._subscribers[channel].add(self._queue)
+            self._queue.put_nowait({"type": "subscribe", "channel": channel, "data": len(self._channels)})
+
+    async def unsubscribe(self, *channels: str):
+        for channel in channels or tuple(self._channels):
+            self._channels.discard(channel)
+            self._pubsub._subscribers[channel].discard(self._queue)
+
+    async def listen(self) -> AsyncIterator[dict]:
+        while True:
+            yield await self._queue.get()
+
+    async def aclose(self):
+        await self.unsubscribe()
@@ -0,0 +1,161 @@
+import asyncio
+import contextlib
+import logging
+from collections.abc import AsyncGenerator
+from typing import Literal
+
+from engines.llm.llm_schema import StreamCoalesceStats
+
+logger = logging.getLogger(__name__)
+
+
+class StreamOverflowError(Exception):
+    """
+    调用方读取流式输出过慢，缓冲区已满，按 overflow="abort" 中止输出
+    """
+
+
+class StreamCoalescer:
+    """
+    合并流式输出中的小 chunk，减少转发到 SSE/WebSocket 时的消息数
+    - 第一个 chunk 立即返回，之后攒够 max_bytes 字节或距离本批第一个 chunk 超过 max_delay 秒时一次返回
+    - 上游由单独的任务读取到有界缓冲区，调用方读取慢时不阻塞上游读取；缓冲超过 max_buffer_bytes 时按 overflow 处理：
+      abort：关闭上游响应，返回已缓冲的内容后抛出 StreamOverflowError
+      block：暂停读取上游，直到调用方取走缓冲的内容（上游按 TCP 背压变慢），适用于内部的批处理调用方
+    同一个实例可以被并发的流式调用共享，每次 coalesce 的状态互相独立
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 256,
+        max_delay: float = 0.03,
+        max_buffer_bytes: int = 64 * 1024,
+        overflow: Literal["abort", "block"] = "abort",
+    ):
+        """
+        :param max_bytes: 缓冲达到该字节数（utf-8）时立即返回
+        :param max_delay: 一批内容的最长等待时间（秒）
+        :param max_buffer_bytes: 调用方未取走的内容的最大字节数
+        :param overflow: 缓冲区满时的处理方式，abort 或 block
+        """
+        if overflow not in ("abort", "block"):
+            raise ValueError(f"不支持的 overflow：{overflow}")
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self.max_buffer_bytes = max(max_buffer_bytes, max_bytes)
+        self.overflow = overflow
+        self._stats = StreamCoalesceStats()
+
+    def get_stats(self) -> StreamCoalesceStats:
+        return self._stats.model_copy()
+
+    async def coalesce(self, source: AsyncGenerator[str, None]) -> AsyncGenerator[str, None]:
+        """
+        :param source: 原始的流式输出，调用方关闭返回的生成器时同时关闭 source
+        """
+        buffer = _CoalesceBuffer(self.max_buffer_bytes)
+        reader = asyncio.create_task(self._read_source(source, buffer))
+        loop = asyncio.get_running_loop()
+        first = True
+        try:
+            while True:
+                if not buffer.parts and not buffer.done:
+                    await buffer.wait_data()
+                # 第一个 chunk、缓冲足够多或上游结束时立即返回，否则等到本批的截止时间
+                if not first:
+                    while not buffer.done and buffer.size < self.max_bytes:
+                        deadline = buffer.batch_start + self.max_delay
+                        if deadline <= loop.time() or not await buffer.wait_data(deadline):
+                            break
+                first = False
+                if buffer.parts:
+                    content = buffer.take()
+                    self._stats.flushes += 1
+                    yield content
+                if buffer.done and not buffer.parts:
+                    break
+            if buffer.error is not None:
+                raise buffer.error
+        finally:
+            if not reader.done():
+                reader.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await reader
+            await source.aclose()
+
+    async def _read_source(self, source: AsyncGenerator[str, None], buffer: "_CoalesceBuffer"):
+        try:
+            async for content in source:
+                self._stats.chunks += 1
+                buffer.put(content)
+                if buffer.size < self.max_buffer_bytes:
+                    continue
+                if self.overflow == "block":
+                    self._stats.blocked += 1
+                    await buffer.wait_space()
+                    continue
+                self._stats.overflows += 1
+                logger.warning(f"流式输出缓冲区已满（{buffer.size} 字节），调用方读取过慢，中止输出")
+                buffer.error = StreamOverflowError(f"流式输出缓冲超过 {self.max_buffer_bytes} 字节")
+                # 关闭 source，同时关闭上游响应
+                await source.aclose()
+                break
+        except Exception as e:  # noqa: BLE001
+            # 上游的任何异常都保存到缓冲区，由调用方读取时重新抛出
+            buffer.error = e
+        finally:
+            buffer.finish()
+
+
+class _CoalesceBuffer:
+    """
+    单次 coalesce 的缓冲区，读取任务写入，调用方取走
+    """
+
+    __slots__ = ("_data_event", "_space_event", "batch_start", "done", "error", "max_size", "parts", "size")
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.parts: list[str] = []
+        self.size = 0
+        self.batch_start = 0.0  # 本批第一个 chunk 的写入时间
+        self.done = False
+        self.error: BaseException | None = None
+        self._data_event = asyncio.Event()
+        self._space_event = asyncio.Event()
+
+    def put(self, content: str):
+        if not self.parts:
+            self.batch_start = asyncio.get_running_loop().time()
+        self.parts.append(content)
+        self.size += len(content.encode())
+        self._data_event.set()
+
+    def take(self) -> str:
+        content = "".join(self.parts)
+        self.parts = []
+        self.size = 0
+        self._space_event.set()
+        return content
+
+    def finish(self):
+        self.done = True
+        self._data_event.set()
+
+    async def wait_data(self, deadline: float | None = None) -> bool:
+        """
+        等待新的内容写入或上游结束，超过 deadline（事件循环时间）时返回 False
+        """
+        self._data_event.clear()
+        try:
+            async with asyncio.timeout_at(deadline):
+                await self._data_event.wait()
+        except TimeoutError:
+            return False
+        return True
+
+    async def wait_space(self):
+        self._space_event.clear()
+        while self.size >= self.max_size:
+            await self._space_event.wait()
+            self._space_event.clear()
@@ -0,0 +1,237 @@
+import asyncio
+import bisect
+import contextlib
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import AsyncGenerator, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class StreamOffsetExpiredError(Exception):
+    """
+    订阅的偏移量已经被移出环形缓冲区
+    """
+
+
+class SharedStream:
+    """
+    单个会话的流式输出，由一个任务读取上游并写入有界的环形缓冲区，多个订阅者从任意偏移量开始读取
+    偏移量为输出文本的字符数；缓冲超过 max_buffer_chars 时移除最早的 chunk，之后从更早的偏移量订阅会失败
+    上游的读取不依赖订阅者：订阅者全部断开时继续生成，重连后从缓冲区读取
+    """
+
+    def __init__(
+        self,
+        conversation_id: str,
+        source: AsyncGenerator[str, None],
+        max_buffer_chars: int,
+        on_finish: Callable[["SharedStream"], None] | None = None,
+    ):
+        """
+        :param source: 上游的流式输出，结束或出错后关闭
+        :param max_buffer_chars: 环形缓冲区大小（字符数）
+        :param on_finish: 上游结束时的回调
+        """
+        self.conversation_id = conversation_id
+        self.max_buffer_chars = max_buffer_chars
+        self.created_at = time.monotonic()
+        self.finished_at: float | None = None
+        self.error: BaseException | None = None
+        self.subscriber_count = 0
+        self.expire_handle: asyncio.TimerHandle | None = None  # 完成后到期移除的定时器
+        self._on_finish = on_finish
+
+        # 环形缓冲区：_chunks[i] 从偏移量 _starts[i] 开始，_head 之前的 chunk 已被移除
+        self._chunks: list[str] = []
+        self._starts: list[int] = []
+        self._head = 0
+        self.start_offset = 0  # 缓冲区中最早的偏移量
+        self.end_offset = 0  # 已生成的字符数
+
+        # 每次写入时唤醒所有等待的订阅者并替换为新的 Event
+        self._updated = asyncio.Event()
+        self._task = asyncio.create_task(self._pump(source))
+
+    @property
+    def done(self) -> bool:
+        return self.finished_at is not None
+
+    async def _pump(self, source: AsyncGenerator[str, None]):
+        try:
+            async for content in source:
+                self._append(content)
+        except Exception as e:
+            logger.warning(f"共享流式输出出错 [会话ID: {self.conversation_id}]：{e}", exc_info=True)
+            self.error = e
+        finally:
+            await source.aclose()
+            self.finished_at = time.monotonic()
+            self._notify()
+            if self._on_finish is not None:
+                self._on_finish(self)
+
+    def _append(self, content: str):
+        self._chunks.append(content)
+        self._starts.append(self.end_offset)
+        self.end_offset += len(content)
+        # 至少保留最新的一个 chunk
+        while self.end_offset - self._starts[self._head] > self.max_buffer_chars and self._head < len(self._chunks) - 1:
+            self._chunks[self._head] = ""
+            self._head += 1
+        self.start_offset = self._starts[self._head]
+        # 已移除的部分超过一半时压缩列表，摊还为 O(1)
+        if self._head > len(self._chunks) // 2:
+            del self._chunks[: self._head], self._starts[: self._head]
+            self._head = 0
+        self._notify()
+
+    def _notify(self):
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+    def read(self, offset: int) -> str:
+        """
+        返回从 offset 到当前已生成位置的内容
+        """
+        if offset < self.start_offset:
+            raise StreamOffsetExpiredError(
+                f"偏移量 {offset} 已被移出缓冲区，当前最早为 {self.start_offset} [会话ID: {self.conversation_id}]"
+            )
+        if offset >= self.end_offset:
+            return ""
+        index = bisect.bisect_right(self._starts, offset, lo=self._head) - 1
+        first = self._chunks[index][offset - self._starts[index] :]
+        return first + "".join(self._chunks[index + 1 :])
+
+    async def subscribe(self, offset: int = 0) -> AsyncGenerator[str, None]:
+        """
+        从 offset 开始读取，已生成的内容一次返回，之后按上游的 chunk 返回，上游结束时结束，上游出错时抛出同样的异常
+        订阅者提前关闭不影响上游和其他订阅者
+        """
+        self.subscriber_count += 1
+        try:
+            position = offset
+            while True:
+                # 先取出当前的 Event 再检查，避免错过检查之后的写入
+                updated = self._updated
+                content = self.read(position)
+                if content:
+                    position += len(content)
+                    yield content
+                    continue
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await updated.wait()
+        finally:
+            self.subscriber_count -= 1
+
+    def cancel(self):
+        """
+        停止读取上游，上游生成器随之关闭，已有的订阅者读完缓冲区后结束
+        """
+        if not self._task.done():
+            self._task.cancel()
+
+    async def aclose(self):
+        self.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+
+
+class StreamHub:
+    """
+    按会话 ID 保存进行中和最近完成的流式输出，客户端重连或多个页面打开同一个会话时直接订阅，不再重新请求模型
+    - 完成（正常结束、出错或被停止）超过 ttl 的流式输出由定时器清理，没有新的发布和订阅时同样会被移除
+    - 超过 max_streams 时优先移除最早完成的流式输出，进行中的流式输出不会被移除
+    """
+
+    def __init__(self, max_streams: int = 1000, ttl: float = 300, max_buffer_chars: int = 256 * 1024):
+        """
+        :param max_streams: 最多保存的流式输出数
+        :param ttl: 完成后保存的时间（秒）
+        :param max_buffer_chars: 每个流式输出的环形缓冲区大小（字符数）
+        """
+        self.max_streams = max_streams
+        self.ttl = ttl
+        self.max_buffer_chars = max_buffer_chars
+        self._streams: dict[str, SharedStream] = {}
+        # 已完成的流式输出，按完成顺序排列
+        self._finished: OrderedDict[str, SharedStream] = OrderedDict()
+
+    def __contains__(self, conversation_id: str) -> bool:
+        return conversation_id in self._streams
+
+    def __len__(self) -> int:
+        return len(self._streams)
+
+    def get(self, conversation_id: str) -> SharedStream | None:
+        stream = self._streams.get(conversation_id)
+        if stream is not None and stream.done and time.monotonic() - stream.finished_at > self.ttl:
+            self._remove(stream)
+            return None
+        return stream
+
+    def publish(self, conversation_id: str, source: AsyncGenerator[str, None]) -> SharedStream:
+        """
+        开始读取 source 并保存，同一个会话 ID 重新发布时停止读取之前的流式输出并覆盖其记录
+        （已有的订阅者读完之前的流式输出已生成的内容后结束）
+        需要在事件循环中调用
+        """
+        self._evict()
+        previous = self._streams.get(conversation_id)
+        if previous is not None:
+            self._remove(previous)
+            previous.cancel()
+        stream = SharedStream(conversation_id, source, self.max_buffer_chars, on_finish=self._on_stream_finish)
+        self._streams[conversation_id] = stream
+        return stream
+
+    def subscribe(self, conversation_id: str, offset: int = 0) -> AsyncGenerator[str, None] | None:
+        """
+        订阅会话的流式输出，会话不存在或已过期时返回 None
+
+        :param offset: 开始读取的偏移量（已收到的字符数），重连时传入之前收到的字符数
+        """
+        stream = self.get(conversation_id)
+        if stream is None:
+            return None
+        return stream.subscribe(offset)
+
+    async def aclose(self):
+        """
+        停止读取所有进行中的流式输出并清空
+        """
+        streams = list(self._streams.values())
+        for stream in self._finished.values():
+            stream.expire_handle.cancel()
+        self._streams.clear()
+        self._finished.clear()
+        await asyncio.gather(*[stream.aclose() for stream in streams])
+
+    def _on_stream_finish(self, stream: SharedStream):
+        if self._streams.get(stream.conversation_id) is stream:
+            self._finished[stream.conversation_id] = stream
+            stream.expire_handle = asyncio.get_running_loop().call_later(self.ttl, self._remove, stream)
+
+    def _remove(self, stream: SharedStream):
+        # 只移除同一个记录，不影响相同会话 ID 后续发布的流式输出
+        if self._streams.get(stream.conversation_id) is stream:
+            del self._streams[stream.conversation_id]
+            self._finished.pop(stream.conversation_id, None)
+            if stream.expire_handle is not None:
+                stream.expire_handle.cancel()
+
+    def _evict(self):
+        # 按完成顺序从最早完成的开始清理
+        expire_before = time.monotonic() - self.ttl
+        while self._finished:
+            stream = next(iter(self._finished.values()))
+            if stream.finished_at > expire_before and len(self._streams) < self.max_streams:
+                break
+            if stream.finished_at > expire_before:
+                logger.warning(f"共享流式输出超出数量上限，移除会话 [会话ID: {stream.conversation_id}]")
+            self._remove(stream)
@@ -0,0 +1,198 @@
+import json
+import logging
+from json import JSONDecodeError
+
+from engines.llm.llm_schema import StreamJsonEvent
+from utils.get_dict import get_dict
+
+logger = logging.getLogger(__name__)
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class StreamJsonExtractor:
+    """
+    从流式输出的文本片段中增量提取 json 对象
+    - 跳过第一个 { 之前的说明文字和 ```json 代码块标记，对象闭合后忽略后续内容
+    - 逐字符维护 json 的字符串/括号状态，只扫描新增的片段
+    - 顶层字段在遇到同层的 , 或 } 时即完整，每个字段只解析一次
+    - 正在输出的顶层字段通过补全引号和括号尝试解析，用于输出部分结果（如长文本字段的已输出部分）
+    """
+
+    def __init__(self):
+        self._text_parts: list[str] = []  # 全部文本，用于起始位置判断错误时重新扫描和最终兜底解析
+        self._object_parts: list[str] = []  # 当前 json 对象的文本
+        self._member_parts: list[str] = []  # 当前顶层字段的文本，不包含分隔的 , 和 }
+        self._started = False
+        self._completed = False
+        self._stack: list[str] = []  # 未闭合的 { 和 [
+        self._in_string = False
+        self._escape = False
+        self._start_offset = 0  # 当前 json 对象的 { 在全部文本中的位置
+        self._offset = 0  # 已扫描的文本长度
+        self._fields: dict = {}
+        self._last_partial: dict | None = None
+
+    @property
+    def completed(self) -> bool:
+        return self._completed
+
+    @property
+    def fields(self) -> dict:
+        """
+        已经完整的顶层字段
+        """
+        return dict(self._fields)
+
+    def feed(self, delta: str) -> list[StreamJsonEvent]:
+        """
+        追加一个文本片段，返回本次新完整的顶层字段事件，以及结果有变化时的部分结果事件
+        """
+        if not delta:
+            return []
+        self._text_parts.append(delta)
+        events = []
+        text, base, position = delta, self._offset, 0
+        # 起始位置判断错误时从失败的 { 之后继续查找，循环而不是递归，说明文字中有大量 {} 时也不会超过递归深度
+        while (restart_at := self._scan(text, base, position, events)) is not None:
+            self._reset()
+            if restart_at >= base:
+                # 重新查找的位置在本次片段中，不需要拼接之前的文本
+                position = restart_at - base
+            else:
+                text, base, position = self._full_text(), 0, restart_at
+        self._offset = base + len(text)
+        if self._completed or not self._started:
+            return events
+
+        partial = self._partial()
+        if partial != self._last_partial:
+            self._last_partial = partial
+            events.append(StreamJsonEvent(type="partial", data=partial))
+        return events
+
+    def finish(self) -> StreamJsonEvent:
+        """
+        流式输出结束，返回校验后的完整结果，无法得到完整的 json 对象时退回到 get_dict 解析全部文本，仍失败时返回空 dict
+        """
+        if self._completed:
+            try:
+                data = json.loads("".join(self._object_parts))
+                if isinstance(data, dict):
+                    return StreamJsonEvent(type="final", data=data)
+            except JSONDecodeError:
+                pass
+
+        text = "".join(self._text_parts)
+        try:
+            data = get_dict(text)
+        except ValueError:
+            logger.warning(f"流式输出中没有有效的 json 对象：{text[:200]}")
+            data = {}
+        return StreamJsonEvent(type="final", data=data if isinstance(data, dict) else {})
+
+    def _scan(self, text: str, base: int, position: int, events: list[StreamJsonEvent]) -> int | None:
+        """
+        从 text 的 position 开始扫描，text 在全部文本中的位置为 base
+        当前的 { 不是 json 对象的开始（如说明文字中的 {name}）时返回重新查找的位置（全部文本中的位置），否则返回 None
+        """
+        segment_start = position  # text 中还没有加入 _member_parts 的起始位置
+        i = position
+        while i < len(text) and not self._completed:
+            if not self._started:
+                i = text.find("{", i)
+                if i < 0:
+                    return None
+                self._started = True
+                self._stack.append("{")
+                self._start_offset = base + i
+                self._object_parts.append("{")
+                segment_start = i + 1
+                i += 1
+                continue
+
+            char = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._stack.append(char)
+            elif char in "}]":
+                self._stack.pop()
+                if not self._stack:
+                    # 对象闭合，最后一个字段完整
+                    self._member_parts.append(text[segment_start:i])
+                    self._object_parts.append(text[segment_start : i + 1])
+                    self._completed = True
+                    if not self._complete_member(events):
+                        return self._start_offset + 1
+                    break
+            elif char == "," and len(self._stack) == 1:
+                self._member_parts.append(text[segment_start:i])
+                self._object_parts.append(text[segment_start : i + 1])
+                segment_start = i + 1
+                if not self._complete_member(events):
+                    return self._start_offset + 1
+            i += 1
+
+        if self._started and not self._completed:
+            self._member_parts.append(text[segment_start:])
+            self._object_parts.append(text[segment_start:])
+        return None
+
+    def _complete_member(self, events: list[StreamJsonEvent]) -> bool:
+        """
+        解析一个完整的顶层字段，返回是否解析成功
+        """
+        member = "".join(self._member_parts)
+        self._member_parts = []
+        if not member.strip():
+            # 空对象 {}
+            return True
+        try:
+            parsed = json.loads("{" + member + "}")
+        except JSONDecodeError:
+            return False
+        for key, value in parsed.items():
+            self._fields[key] = value
+            events.append(StreamJsonEvent(type="field", key=key, value=value))
+        return True
+
+    def _reset(self):
+        self._object_parts, self._member_parts, self._stack = [], [], []
+        self._started = self._completed = self._in_string = self._escape = False
+        self._fields, self._last_partial = {}, None
+
+    def _full_text(self) -> str:
+        """
+        全部文本，拼接后只保留一份，之后只需要拼接新增的片段
+        """
+        if len(self._text_parts) > 1:
+            self._text_parts = ["".join(self._text_parts)]
+        return self._text_parts[0]
+
+    def _partial(self) -> dict:
+        """
+        已完整的顶层字段加上正在输出的顶层字段（能补全时）
+        """
+        partial = dict(self._fields)
+        member = "".join(self._member_parts)
+        if not member.strip():
+            return partial
+
+        closers = ('"' if self._in_string else "") + "".join(_CLOSERS[char] for char in reversed(self._stack[1:]))
+        # 依次尝试直接补全和去掉末尾未完成的分隔符后补全，仍失败（如键名或数字未输出完整）时本次不包含该字段
+        for candidate in (member, member.rstrip().rstrip(",:")):
+            try:
+                partial.update(json.loads("{" + candidate + closers + "}"))
+                break
+            except JSONDecodeError:
+                continue
+        return partial
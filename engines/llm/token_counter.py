@@ -0,0 +1,37 @@
+import json
+from abc import ABC, abstractmethod
+
+from utils.commons import estimate_tokens
+
+
+class TokenCounter(ABC):
+    """
+    token 计数接口，需要精确计数时可以基于模型对应的 tokenizer 实现
+    """
+
+    # 每条消息的 role 等格式开销
+    message_overhead: int = 4
+
+    @abstractmethod
+    def count_text(self, text: str) -> int:
+        raise NotImplementedError
+
+    def count_message(self, message: dict) -> int:
+        tokens = self.message_overhead + self.count_text(message.get("content") or "")
+        if message.get("tool_calls"):
+            tokens += self.count_text(json.dumps(message["tool_calls"], ensure_ascii=False, default=str))
+        if message.get("name"):
+            tokens += self.count_text(message["name"])
+        return tokens
+
+    def count_messages(self, messages: list[dict]) -> int:
+        return sum(self.count_message(message) for message in messages)
+
+
+class EstimateTokenCounter(TokenCounter):
+    """
+    离线快速估算，不依赖 tokenizer，见 utils.commons.estimate_tokens
+    """
+
+    def count_text(self, text: str) -> int:
+        return estimate_tokens(text)
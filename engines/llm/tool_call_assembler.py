@@ -0,0 +1,111 @@
+from collections.abc import Callable
+
+from openai.types.chat.chat_completion_chunk import ChoiceDeltaToolCall
+
+
+class AssembledToolCall:
+    """
+    流式响应中单个工具调用的拼接状态
+    参数片段先放到列表中，结束时只做一次 join；同时逐字符维护 json 的括号深度，用以判断参数是否已经完整
+    """
+
+    __slots__ = ("argument_parts", "completed", "depth", "escape", "id", "in_string", "index", "name", "started")
+
+    def __init__(self, index: int):
+        self.index = index
+        self.id: str | None = None
+        self.name = ""
+        self.argument_parts: list[str] = []
+        self.depth = 0  # 当前未闭合的 {}/[] 数量
+        self.in_string = False  # 是否处于 json 字符串中，字符串中的括号不计入深度
+        self.escape = False  # 上一个字符是否为字符串中的转义符
+        self.started = False  # 是否已经出现第一个 {
+        self.completed = False
+
+    @property
+    def arguments(self) -> str:
+        return "".join(self.argument_parts)
+
+    def append_arguments(self, fragment: str) -> bool:
+        """
+        追加参数片段，返回参数 json 是否已经闭合
+        """
+        self.argument_parts.append(fragment)
+        for char in fragment:
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+                self.started = True
+            elif char in "}]":
+                self.depth -= 1
+        return self.started and self.depth == 0
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "type": "function", "function": {"name": self.name, "arguments": self.arguments}}
+
+
+class ToolCallAssembler:
+    """
+    按 delta.index 拼接流式响应中的工具调用，支持多个工具调用的片段交错返回
+    某个工具调用的参数完整后立即回调 on_complete，调用方可以在模型继续输出后续工具调用时提前执行该工具
+    """
+
+    def __init__(self, on_complete: Callable[[AssembledToolCall], None] | None = None):
+        self.on_complete = on_complete
+        self._calls: dict[int, AssembledToolCall] = {}
+        self._id_to_index: dict[str, int] = {}
+        self._last_index: int | None = None
+
+    def _get_index(self, tool_delta: ChoiceDeltaToolCall) -> int:
+        if tool_delta.index is not None:
+            return tool_delta.index
+        # 兼容不返回 index 的服务：新的 id 表示新的工具调用，否则归属于上一个工具调用
+        if tool_delta.id:
+            if tool_delta.id not in self._id_to_index:
+                self._id_to_index[tool_delta.id] = len(self._calls)
+            return self._id_to_index[tool_delta.id]
+        return self._last_index if self._last_index is not None else 0
+
+    def feed(self, tool_deltas: list[ChoiceDeltaToolCall]):
+        for tool_delta in tool_deltas:
+            index = self._get_index(tool_delta)
+            self._last_index = index
+
+            tool_call = self._calls.get(index)
+            if tool_call is None:
+                tool_call = self._calls[index] = AssembledToolCall(index)
+
+            if tool_delta.id and not tool_call.id:
+                tool_call.id = tool_delta.id
+            function = tool_delta.function
+            if function is None:
+                continue
+            if function.name:
+                tool_call.name += function.name
+            if function.arguments and tool_call.append_arguments(function.arguments):
+                self._complete(tool_call)
+
+    def _complete(self, tool_call: AssembledToolCall, force: bool = False):
+        # 函数名还没有返回时先不回调，等到流式响应结束时再强制完成
+        if tool_call.completed or (not tool_call.name and not force):
+            return
+        tool_call.completed = True
+        if self.on_complete:
+            self.on_complete(tool_call)
+
+    def finish(self) -> list[AssembledToolCall]:
+        """
+        流式响应结束，剩余未完成的工具调用全部视为完成，返回按 index 排序的工具调用列表
+        """
+        tool_calls = [self._calls[index] for index in sorted(self._calls)]
+        for tool_call in tool_calls:
+            self._complete(tool_call, force=True)
+        return tool_calls
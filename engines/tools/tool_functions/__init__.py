@@ -1,5 +1,6 @@
 """
-所有可以被调用的工具函数都需要在此处声明导入
+工具函数包，本包模块中通过 global_tool_registry.register 注册的工具函数在第一次查找时自动发现
+此处的导入仅用于兼容 from engines.tools.tool_functions import xxx 的写法，新增工具函数无需在此处声明
 """
 
 from engines.tools.tool_functions.web_search import web_search, get_web_search
@@ -1,41 +1,27 @@
 from engines.tools.tool_services.web_search_factory import WebSearchFactory
-from engines.tools.tool_schema import ToolParam, ToolFunctionParam
+from engines.tools.tool_services.web_search.multi_search import render_search_context
+from engines.tools.tool_schema import ToolParam
 from engines.tools.tool_services.tool_wrapper import tool_return, get_tool_param
-
-search_instance = WebSearchFactory.get_search_instance("serper")
+from engines.tools.tool_services.tool_registry import global_tool_registry
 
 
+@global_tool_registry.register
 @tool_return
-def web_search(query: str) -> tuple[str, dict]:
+async def web_search(query: str) -> tuple[str, dict]:
     """
     调用搜索引擎执行网络搜索
     :param query: 调用搜索引擎进行网络搜索的查询语句
     :return: 直接给到模型的结果、原始搜索结果列表
     """
-    search_res = search_instance.search(query)
-    search_res_list = [
-        res.model_dump(include={"title", "content", "position", "date"}, exclude_none=True)
-        for res in search_res.results
-    ]
-    return str(search_res_list), search_res.model_dump()
+    # 每次调用时获取共享实例，便于通过 WebSearchFactory.set_search_instance / set_web_search_config 替换搜索引擎
+    search_instance = WebSearchFactory.get_web_search_instance()
+    search_res = await search_instance.asearch(query)
+    # 给模型紧凑的结果文本并按 token 预算截断，完整的搜索结果作为原始结果返回
+    context = render_search_context(search_res.results, WebSearchFactory.web_search_config.context_token_budget)
+    return context, search_res.model_dump()
 
 
 @get_tool_param
 def get_web_search() -> ToolParam:
-    web_search_tool = ToolParam(
-        function=ToolFunctionParam(
-            name="web_search",
-            description="调用搜索引擎执行网络搜索",
-            parameters={
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "调用搜索引擎进行网络搜索的查询语句",
-                    }
-                },
-                "required": ["query"],
-            },
-        )
-    )
-    return web_search_tool
+    # schema 在注册时根据类型注解和 docstring 生成
+    return global_tool_registry.get_tool_param("web_search")
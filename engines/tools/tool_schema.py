@@ -1,3 +1,5 @@
+from typing import Any, Literal
+
 from pydantic import BaseModel, Field
 
 
@@ -10,3 +12,39 @@ class ToolFunctionParam(BaseModel):
 class ToolParam(BaseModel):
     type: str = Field("function", choices=["function"])
     function: ToolFunctionParam = Field(...)
+
+
+class ToolExecResult(BaseModel):
+    name: str  # 工具函数名
+    content: str  # 直接给到模型的结果，执行出错时为错误信息
+    origin_res: Any = None  # 工具函数的原始结果
+    error: str | None = None  # 执行出错或超时时的错误信息
+    elapsed: float = 0.0  # 执行耗时（秒）
+    memoized: bool = False  # 结果来自工具结果备忘表，没有实际执行
+
+
+class ToolMemoPolicy(BaseModel):
+    """
+    幂等工具函数的结果备忘策略，相同函数名和参数的调用在作用域内直接复用之前的结果
+    - invocation：同一次 invoke 内
+    - conversation：同一个会话 ID 的多次 invoke 之间
+    - global：所有调用之间
+    """
+
+    ttl: float | None = 300  # 结果的有效时间（秒），None 表示不过期，invocation 作用域不使用
+    scope: Literal["invocation", "conversation", "global"] = "conversation"
+
+
+class ToolMemoStats(BaseModel):
+    hits: int = 0  # 直接复用备忘结果的次数
+    coalesced: int = 0  # 等待正在执行的相同调用结果的次数
+    misses: int = 0  # 实际执行的次数
+    saved_seconds: float = 0.0  # 复用的结果原本的执行耗时之和（秒）
+    size: int = 0  # conversation 和 global 作用域的条目数
+
+    @property
+    def saved(self) -> int:
+        """
+        节省的工具函数执行次数
+        """
+        return self.hits + self.coalesced
@@ -0,0 +1,71 @@
+import asyncio
+import inspect
+import logging
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from engines.tools.tool_schema import ToolExecResult
+
+logger = logging.getLogger(__name__)
+
+
+class ToolExecutor:
+    """
+    工具函数执行器，同一轮中的多个工具调用分别创建任务执行 execute，参数完整的工具调用可以立即开始：
+    - async 工具函数直接在事件循环中 await
+    - sync 工具函数放到有界线程池中执行，避免阻塞事件循环
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        default_timeout: float | None = 30,
+        tool_timeouts: dict[str, float] | None = None,
+    ):
+        """
+        :param max_workers: 执行 sync 工具函数的线程池大小
+        :param default_timeout: 单个工具调用的默认超时时间（秒），None 表示不限制
+        :param tool_timeouts: 按工具函数名单独配置的超时时间（秒），优先于 default_timeout
+        """
+        self.default_timeout = default_timeout
+        self.tool_timeouts = tool_timeouts or {}
+        self._thread_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool_executor")
+
+    def get_timeout(self, func_name: str) -> float | None:
+        return self.tool_timeouts.get(func_name, self.default_timeout)
+
+    async def execute(self, func_name: str, func_obj: Callable, func_args: dict) -> ToolExecResult:
+        """
+        执行单个工具函数，异常和超时不会抛出，而是记录在返回结果的 error 字段中
+        """
+        start_time = time.perf_counter()
+        try:
+            if inspect.iscoroutinefunction(func_obj):
+                coro = func_obj(**func_args)
+            else:
+                loop = asyncio.get_running_loop()
+                # NOTE: 超时只会停止等待，线程中已经开始执行的工具函数无法被强制中断
+                coro = loop.run_in_executor(self._thread_pool, partial(func_obj, **func_args))
+            content, origin_res = await asyncio.wait_for(coro, timeout=self.get_timeout(func_name))
+            return ToolExecResult(
+                name=func_name, content=content, origin_res=origin_res, elapsed=time.perf_counter() - start_time
+            )
+
+        except TimeoutError:
+            logger.error(f"工具函数执行超时：{func_name}，超时时间：{self.get_timeout(func_name)}s")
+            error = f"工具函数执行超时：{func_name}"
+
+        except Exception as e:
+            logger.exception(f"工具函数调用出错：{func_name}")
+            error = f"工具函数调用出错：{e}"
+
+        return ToolExecResult(name=func_name, content=error, error=error, elapsed=time.perf_counter() - start_time)
+
+    def shutdown(self, wait: bool = False):
+        self._thread_pool.shutdown(wait=wait)
+
+
+# 进程内共享的执行器，未传入 tool_executor 的 OpenAILLMInvoke 实例共用同一个线程池，不随实例创建新的线程池
+global_tool_executor = ToolExecutor()
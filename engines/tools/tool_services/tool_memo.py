@@ -0,0 +1,118 @@
+import asyncio
+import json
+import logging
+from collections.abc import Awaitable, Callable
+
+from engines.tools.tool_schema import ToolExecResult, ToolMemoPolicy, ToolMemoStats
+from utils.ttl_lru_cache import TTLLRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class ToolMemoTable:
+    """
+    幂等工具函数的结果备忘表，key 为工具函数名和规范化（按 key 排序）后的 json 参数
+    - conversation 和 global 作用域的结果保存在共享的 LRU 中，超过 max_size 时淘汰最久未使用的条目，过期后在读取时删除
+    - invocation 作用域的结果保存在调用方传入的 dict 中（InvocationContext.tool_memo），随调用结束释放
+    - 只保存成功执行的结果；正在执行的相同调用直接等待其结果，不重复执行
+    只在事件循环线程中使用，不加锁
+    """
+
+    def __init__(self, max_size: int = 1024):
+        """
+        :param max_size: conversation 和 global 作用域最多保存的条目数
+        """
+        self.max_size = max_size
+        self._stats = ToolMemoStats()
+        self._entries = TTLLRUCache(max_size)
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def make_key(func_name: str, func_args: dict) -> str:
+        canonical_args = json.dumps(func_args, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+        return f"{func_name}:{canonical_args}"
+
+    def get_stats(self) -> ToolMemoStats:
+        return self._stats.model_copy(update={"size": len(self._entries)})
+
+    def clear(self):
+        self._entries.clear()
+
+    def dispatch(
+        self,
+        func_name: str,
+        func_args: dict,
+        policy: ToolMemoPolicy,
+        execute: Callable[[], Awaitable[ToolExecResult]],
+        conversation_id: str | None,
+        invocation_memo: dict[str, ToolExecResult],
+    ) -> asyncio.Future:
+        """
+        命中时返回已完成的 Future，相同调用正在执行时等待其结果，否则开始执行
+
+        :param execute: 实际执行工具函数，返回 ToolExecResult
+        :param conversation_id: 会话 ID，conversation 作用域且为空时不备忘
+        :param invocation_memo: 本次调用的 invocation 作用域备忘
+        """
+        key = self.make_key(func_name, func_args)
+        if policy.scope == "conversation":
+            if not conversation_id:
+                return asyncio.ensure_future(execute())
+            key = f"conversation:{conversation_id}:{key}"
+        elif policy.scope == "global":
+            key = f"global:{key}"
+
+        store = invocation_memo if policy.scope == "invocation" else None
+        result = self._get(key, store)
+        if result is not None:
+            self._stats.hits += 1
+            self._stats.saved_seconds += result.elapsed
+            logger.info(f"复用工具函数的备忘结果：{func_name}，参数：{func_args}")
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(result.model_copy(update={"memoized": True, "elapsed": 0.0}))
+            return future
+
+        # invocation 作用域的 key 只在本次调用内唯一
+        inflight_key = f"invocation:{id(invocation_memo)}:{key}" if store is not None else key
+        task = self._inflight.get(inflight_key)
+        if task is not None:
+            self._stats.coalesced += 1
+            return asyncio.ensure_future(self._wait_inflight(task, execute))
+
+        self._stats.misses += 1
+        task = asyncio.ensure_future(execute())
+        self._inflight[inflight_key] = task
+        task.add_done_callback(lambda task: self._on_done(inflight_key, key, task, policy, store))
+        return task
+
+    def _get(self, key: str, store: dict | None) -> ToolExecResult | None:
+        if store is not None:
+            return store.get(key)
+        return self._entries.get(key)
+
+    def _on_done(self, inflight_key: str, key: str, task: asyncio.Task, policy: ToolMemoPolicy, store: dict | None):
+        if self._inflight.get(inflight_key) is task:
+            del self._inflight[inflight_key]
+        if task.cancelled() or task.exception() is not None or task.result().error is not None:
+            return
+        if store is not None:
+            store[key] = task.result()
+            return
+        self._entries.set(key, task.result(), ttl=policy.ttl)
+
+    async def _wait_inflight(
+        self, task: asyncio.Task, execute: Callable[[], Awaitable[ToolExecResult]]
+    ) -> ToolExecResult:
+        try:
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # 正在执行的调用所属的会话被停止时自己执行，本任务被取消时直接抛出
+            if not task.cancelled() or asyncio.current_task().cancelling():
+                raise
+            return await execute()
+        self._stats.saved_seconds += result.elapsed
+        return result.model_copy(update={"memoized": True})
+
+
+# 进程内共享的备忘表，conversation 和 global 作用域的结果在所有 OpenAILLMInvoke 实例间复用
+global_tool_memo = ToolMemoTable()
@@ -0,0 +1,252 @@
+import enum
+import importlib
+import inspect
+import logging
+import pkgutil
+import re
+import threading
+import types
+import typing
+from collections.abc import Callable
+from typing import Any, Literal
+
+from pydantic import BaseModel
+
+from engines.tools.tool_schema import ToolFunctionParam, ToolParam
+
+logger = logging.getLogger(__name__)
+
+_PARAM_DOC = re.compile(r"^\s*:param\s+(\w+)\s*:\s*(.*)$")
+_JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean", dict: "object", list: "array"}
+
+
+class RegisteredTool:
+    """
+    注册的工具函数，json schema 和序列化后的工具参数在注册时生成，之后每次调用直接复用
+    """
+
+    __slots__ = ("accepts_kwargs", "func", "name", "param", "param_dict", "properties", "required")
+
+    def __init__(self, name: str, func: Callable, param: ToolParam, accepts_kwargs: bool):
+        self.name = name
+        self.func = func
+        self.param = param
+        self.param_dict = param.model_dump()
+        parameters = param.function.parameters
+        self.properties = frozenset(parameters.get("properties", {}))
+        self.required = frozenset(parameters.get("required", []))
+        self.accepts_kwargs = accepts_kwargs
+
+
+class ToolRegistry:
+    """
+    工具函数注册表
+    - 工具函数通过 register 注册，json schema 根据类型注解和 docstring（:param x: 格式）生成
+    - 第一次查找时自动导入 packages 下的所有模块，新增工具函数只需要在这些包中新建模块并注册
+    - 按工具函数名查找为 O(1)，调用前校验参数
+    """
+
+    def __init__(self, packages: tuple[str, ...] = ("engines.tools.tool_functions",)):
+        """
+        :param packages: 自动发现工具函数的包
+        """
+        self.packages = packages
+        self._tools: dict[str, RegisteredTool] = {}
+        self._discovered = False
+        self._lock = threading.RLock()
+        self._dumped_tools: dict[tuple[str, ...], list[dict]] = {}
+
+    def register(self, func: Callable | None = None, *, name: str | None = None, description: str | None = None):
+        """
+        注册工具函数的装饰器，可以直接使用 @register，也可以使用 @register(name=..., description=...)
+
+        :param name: 工具函数名，默认为函数名
+        :param description: 工具描述，默认为 docstring 中 :param 之前的内容
+        """
+
+        def decorator(tool_func: Callable) -> Callable:
+            param, accepts_kwargs = build_tool_param(tool_func, name=name, description=description)
+            tool_name = param.function.name
+            with self._lock:
+                registered = self._tools.get(tool_name)
+                if registered is not None and registered.func is not tool_func:
+                    # 模块被重新导入时以最新的定义为准
+                    logger.warning(f"工具函数重复注册，使用新的定义：{tool_name}")
+                self._tools[tool_name] = RegisteredTool(tool_name, tool_func, param, accepts_kwargs)
+                self._dumped_tools.clear()
+            return tool_func
+
+        return decorator(func) if func is not None else decorator
+
+    def discover(self):
+        """
+        导入 packages 下的所有模块，模块中注册的工具函数加入注册表
+        """
+        if self._discovered:
+            return
+        with self._lock:
+            if self._discovered:
+                return
+            for package_name in self.packages:
+                package = importlib.import_module(package_name)
+                for module_info in pkgutil.iter_modules(getattr(package, "__path__", [])):
+                    importlib.import_module(f"{package_name}.{module_info.name}")
+            self._discovered = True
+
+    def get(self, name: str) -> RegisteredTool | None:
+        tool = self._tools.get(name)
+        if tool is None and not self._discovered:
+            self.discover()
+            tool = self._tools.get(name)
+        return tool
+
+    def get_func(self, name: str) -> Callable | None:
+        """
+        获取工具函数，未注册时查找 packages 命名空间中的同名函数（兼容直接声明在包中、没有注册的工具函数）
+        """
+        tool = self.get(name)
+        if tool is not None:
+            return tool.func
+        for package_name in self.packages:
+            func = getattr(importlib.import_module(package_name), name, None)
+            if callable(func) and not isinstance(func, types.ModuleType):
+                return func
+        return None
+
+    def get_tool_param(self, name: str) -> ToolParam:
+        tool = self.get(name)
+        if tool is None:
+            raise ValueError(f"工具函数不存在：{name}")
+        return tool.param
+
+    def list_tools(self) -> list[str]:
+        self.discover()
+        return list(self._tools)
+
+    def dump_tools(self, tools: list[ToolParam | str]) -> list[dict]:
+        """
+        返回请求参数中的 tools，已注册的工具直接使用注册时序列化的结果，相同的工具列表返回同一个缓存的 list
+
+        :param tools: 工具参数或已注册的工具函数名
+        """
+        registered_tools = []
+        for tool in tools:
+            registered = self.get(tool if isinstance(tool, str) else tool.function.name)
+            if registered is None and isinstance(tool, str):
+                raise ValueError(f"工具函数不存在：{tool}")
+            # 未注册或不是注册时生成的工具参数（如调用方自行构造的）每次重新序列化
+            if registered is not None and not isinstance(tool, str) and tool is not registered.param:
+                registered = None
+            registered_tools.append(registered)
+
+        if not all(registered_tools):
+            return [
+                registered.param_dict if registered else tool.model_dump()
+                for tool, registered in zip(tools, registered_tools, strict=True)
+            ]
+        key = tuple(registered.name for registered in registered_tools)
+        dumped = self._dumped_tools.get(key)
+        if dumped is None:
+            dumped = self._dumped_tools[key] = [registered.param_dict for registered in registered_tools]
+        return dumped
+
+    @staticmethod
+    def validate_arguments(tool: RegisteredTool, arguments: dict):
+        """
+        校验模型给出的参数，缺少必填参数或存在未定义的参数时抛出 ValueError
+        """
+        missing = tool.required.difference(arguments)
+        if missing:
+            raise ValueError(f"工具函数 {tool.name} 缺少参数：{', '.join(sorted(missing))}")
+        if not tool.accepts_kwargs:
+            unknown = set(arguments).difference(tool.properties)
+            if unknown:
+                raise ValueError(f"工具函数 {tool.name} 不支持参数：{', '.join(sorted(unknown))}")
+
+
+def build_tool_param(func: Callable, name: str | None = None, description: str | None = None) -> tuple[ToolParam, bool]:
+    """
+    根据函数签名、类型注解和 docstring 生成工具参数，返回 (工具参数, 是否接受 **kwargs)
+    """
+    doc_description, param_docs = _parse_docstring(inspect.getdoc(func) or "")
+    hints = typing.get_type_hints(func)
+    properties, required, accepts_kwargs = {}, [], False
+    for param in inspect.signature(func).parameters.values():
+        if param.kind == param.VAR_KEYWORD:
+            accepts_kwargs = True
+            continue
+        if param.kind == param.VAR_POSITIONAL:
+            continue
+        schema = _type_to_schema(hints.get(param.name, Any))
+        if param.name in param_docs:
+            schema["description"] = param_docs[param.name]
+        if param.default is param.empty:
+            required.append(param.name)
+        elif param.default is not None and isinstance(param.default, (str, int, float, bool)):
+            schema["default"] = param.default
+        properties[param.name] = schema
+
+    parameters = {"type": "object", "properties": properties}
+    if required:
+        parameters["required"] = required
+    tool_param = ToolParam(
+        function=ToolFunctionParam(
+            name=name or func.__name__,
+            description=description or doc_description or func.__name__,
+            parameters=parameters,
+        )
+    )
+    return tool_param, accepts_kwargs
+
+
+def _parse_docstring(doc: str) -> tuple[str, dict[str, str]]:
+    """
+    解析 docstring，返回 (:param 之前的描述, {参数名: 参数描述})
+    """
+    description_lines, param_docs = [], {}
+    current = None
+    for line in doc.splitlines():
+        match = _PARAM_DOC.match(line)
+        if match:
+            current = match.group(1)
+            param_docs[current] = match.group(2).strip()
+        elif line.strip().startswith(":"):
+            current = None
+        elif current is not None and line.strip():
+            # 参数描述换行
+            param_docs[current] = f"{param_docs[current]} {line.strip()}"
+        elif current is None and not param_docs and line.strip():
+            description_lines.append(line.strip())
+    return "\n".join(description_lines), param_docs
+
+
+def _type_to_schema(annotation: Any) -> dict:
+    if annotation is Any or annotation is inspect.Parameter.empty:
+        return {}
+    if annotation in _JSON_TYPES:
+        return {"type": _JSON_TYPES[annotation]}
+    if inspect.isclass(annotation):
+        if issubclass(annotation, enum.Enum):
+            return {"enum": [member.value for member in annotation]}
+        if issubclass(annotation, BaseModel):
+            return annotation.model_json_schema()
+
+    origin, args = typing.get_origin(annotation), typing.get_args(annotation)
+    if origin is Literal:
+        return {"enum": list(args)}
+    if origin in (typing.Union, types.UnionType):
+        # X | None 按 X 处理，是否必填由默认值决定
+        schemas = [_type_to_schema(arg) for arg in args if arg is not type(None)]
+        return schemas[0] if len(schemas) == 1 else {"anyOf": schemas}
+    if origin in (list, tuple, set, frozenset):
+        schema = {"type": "array"}
+        if args and args[0] is not Ellipsis:
+            schema["items"] = _type_to_schema(args[0])
+        return schema
+    if origin is dict:
+        return {"type": "object"}
+    return {}
+
+
+# 全局工具函数注册表
+global_tool_registry = ToolRegistry()
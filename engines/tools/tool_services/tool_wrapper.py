@@ -1,6 +1,8 @@
+import inspect
 from functools import wraps
+from typing import Literal
 
-from engines.tools.tool_schema import ToolParam
+from engines.tools.tool_schema import ToolMemoPolicy, ToolParam
 
 
 def tool_return(func):
@@ -13,11 +15,10 @@ def tool_return(func):
     def tool_func():
         return "result"
     被装饰后，tool_func() 返回的结果为 ("result", None)
+    async 工具函数同样适用，被装饰后 await tool_func() 返回 ("result", None)
     """
 
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        result = func(*args, **kwargs)
+    def format_result(result):
         if isinstance(result, str):
             return result, None
         elif isinstance(result, tuple):
@@ -30,9 +31,44 @@ def tool_return(func):
         else:
             raise ValueError("工具函数返回的的第一个参数类型必须是 str")
 
+    # async 工具函数被装饰后仍然是 async 函数，以便执行器直接在事件循环中 await
+    if inspect.iscoroutinefunction(func):
+
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            return format_result(await func(*args, **kwargs))
+
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return format_result(func(*args, **kwargs))
+
     return wrapper
 
 
+def tool_memo(ttl: float | None = 300, scope: Literal["invocation", "conversation", "global"] = "conversation"):
+    """
+    声明工具函数是幂等的，相同参数的调用在作用域内复用之前成功执行的结果，只有声明过的工具函数会被备忘
+
+    使用：
+    @tool_memo(ttl=600, scope="global")
+    @tool_return
+    async def tool_func(query: str):
+        ...
+
+    :param ttl: 结果的有效时间（秒），None 表示不过期
+    :param scope: 备忘的作用域，invocation、conversation 或 global
+    """
+    policy = ToolMemoPolicy(ttl=ttl, scope=scope)
+
+    def decorator(func):
+        func.tool_memo_policy = policy
+        return func
+
+    return decorator
+
+
 def get_tool_param(func):
     """
     对获取工具函数参数的方法的装饰器，要求方法名必须以 get_ 开头，返回必须是 ToolParam 类型
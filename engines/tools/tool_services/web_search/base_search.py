@@ -1,9 +1,89 @@
+import asyncio
 from abc import ABC, abstractmethod
 
-from engines.tools.tool_services.web_search.schemas import WebSearchResults
+import httpx
+
+from engines.tools.tool_services.web_search.schemas import SearchHttpConfig, WebSearchResults
 
 
 class BaseSearch(ABC):
+    engine_name: str = ""  # 搜索引擎名称，与 WebSearchEngineEnum 的值一致
+
+    @property
+    def cache_params(self) -> dict:
+        """
+        影响搜索结果的参数，和查询语句一起组成搜索结果缓存的 key
+        """
+        return {}
+
     @abstractmethod
     def search(self, query: str) -> WebSearchResults:
         raise NotImplementedError
+
+    async def asearch(self, query: str) -> WebSearchResults:
+        """
+        异步搜索，默认放到线程中执行 search，子类应尽量使用异步 HTTP 客户端重写该方法
+        """
+        return await asyncio.to_thread(self.search, query)
+
+    async def aclose(self):
+        """
+        关闭搜索引擎持有的连接池，默认没有需要关闭的资源
+        """
+        return
+
+
+class PooledHttpSearch(BaseSearch, ABC):
+    """
+    基于 httpx 连接池的搜索引擎基类，sync 和 async 客户端均在首次使用时创建，之后所有请求复用连接
+    """
+
+    def __init__(self, base_url: str, http_config: SearchHttpConfig | None = None):
+        self.base_url = base_url
+        self.http_config = http_config or SearchHttpConfig()
+
+        self._client: httpx.Client | None = None
+        self._async_client: httpx.AsyncClient | None = None
+        self._async_client_loop: asyncio.AbstractEventLoop | None = None
+
+    def _client_kwargs(self) -> dict:
+        config = self.http_config
+        return {
+            "base_url": self.base_url,
+            "timeout": httpx.Timeout(config.read_timeout, connect=config.connect_timeout),
+            "limits": httpx.Limits(
+                max_connections=config.pool_size,
+                max_keepalive_connections=config.max_keepalive_connections,
+                keepalive_expiry=config.keepalive_expiry,
+            ),
+        }
+
+    @property
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            kwargs = self._client_kwargs()
+            transport = httpx.HTTPTransport(limits=kwargs.pop("limits"), retries=self.http_config.retries)
+            self._client = httpx.Client(transport=transport, **kwargs)
+        return self._client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        # async 连接池和事件循环绑定，事件循环变化时（如不同测试用例）重新创建
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client_loop is not loop:
+            kwargs = self._client_kwargs()
+            transport = httpx.AsyncHTTPTransport(limits=kwargs.pop("limits"), retries=self.http_config.retries)
+            self._async_client = httpx.AsyncClient(transport=transport, **kwargs)
+            self._async_client_loop = loop
+        return self._async_client
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+            self._async_client_loop = None
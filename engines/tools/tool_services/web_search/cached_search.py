@@ -0,0 +1,200 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+import unicodedata
+
+from engines.tools.tool_services.web_search.base_search import BaseSearch
+from engines.tools.tool_services.web_search.schemas import SearchCacheStats, WebSearchResults
+from utils.sqlite_store import SqliteKVStore
+from utils.ttl_lru_cache import TTLLRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class SearchResultCache:
+    """
+    搜索结果缓存：
+    - 内存中使用 LRU 淘汰，超过 max_size 时淘汰最久未使用的条目
+    - 每个条目有 TTL，过期后在读取时删除
+    - 可选 sqlite 持久化，进程重启后仍可命中；异步调用方使用 aget/aset，sqlite 读写放到线程中执行
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 600, sqlite_path: str | None = None):
+        """
+        :param max_size: 内存中最多缓存的条目数
+        :param ttl: 缓存过期时间（秒）
+        :param sqlite_path: sqlite 文件路径，为 None 时不做持久化
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stats = SearchCacheStats()
+
+        # 过期时间与 sqlite 中保存的时间戳一致，使用 time.time
+        self._memory = TTLLRUCache(max_size, clock=time.time)
+        self._lock = threading.Lock()
+
+        self._store: SqliteKVStore | None = None
+        if sqlite_path:
+            self._store = SqliteKVStore(sqlite_path, "search_cache")
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """
+        规范化查询语句：全半角统一、去除首尾空白、合并连续空白、转小写
+        """
+        return " ".join(unicodedata.normalize("NFKC", query).split()).lower()
+
+    @classmethod
+    def make_key(cls, engine_name: str, query: str, search_params: dict | None = None) -> str:
+        raw_key = json.dumps(
+            [engine_name, cls.normalize_query(query), search_params or {}], sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> WebSearchResults | None:
+        value = self._get_memory(key)
+        if value is None and self._store is not None:
+            value = self._get_db(key)
+        return self._count_miss(value)
+
+    async def aget(self, key: str) -> WebSearchResults | None:
+        """
+        异步读取缓存，内存未命中时在线程中读取 sqlite
+        """
+        value = self._get_memory(key)
+        if value is None and self._store is not None:
+            value = await self._store.arun(self._get_db, key)
+        return self._count_miss(value)
+
+    def set(self, key: str, value: WebSearchResults):
+        expire_at = time.time() + self.ttl
+        self._set_memory(key, value, expire_at)
+        if self._store is not None:
+            self._set_db(key, value, expire_at)
+
+    async def aset(self, key: str, value: WebSearchResults):
+        """
+        异步写入缓存，内存立即可见，sqlite 在线程中写入
+        """
+        expire_at = time.time() + self.ttl
+        self._set_memory(key, value, expire_at)
+        if self._store is not None:
+            await self._store.arun(self._set_db, key, value, expire_at)
+
+    def _get_memory(self, key: str) -> WebSearchResults | None:
+        with self._lock:
+            value = self._memory.get(key)
+            self._sync_stats()
+            if value is None:
+                return None
+            self.stats.hits += 1
+        return value.model_copy(deep=True)
+
+    def _get_db(self, key: str) -> WebSearchResults | None:
+        store = self._store
+        row = store.get(key) if store is not None else None
+        if row is None:
+            return None
+        value = WebSearchResults.model_validate_json(row[0])
+        self._set_memory(key, value, row[1])
+        with self._lock:
+            self.stats.hits += 1
+        return value.model_copy(deep=True)
+
+    def _set_db(self, key: str, value: WebSearchResults, expire_at: float):
+        store = self._store
+        if store is not None:
+            store.set(key, value.model_dump_json(), expire_at)
+
+    def _count_miss(self, value: WebSearchResults | None) -> WebSearchResults | None:
+        if value is None:
+            with self._lock:
+                self.stats.misses += 1
+        return value
+
+    def _set_memory(self, key: str, value: WebSearchResults, expire_at: float):
+        with self._lock:
+            self._memory.set(key, value, expire_at=expire_at)
+            self._sync_stats()
+
+    def _sync_stats(self):
+        self.stats.evictions = self._memory.evictions
+        self.stats.expirations = self._memory.expirations
+
+    def get_stats(self) -> SearchCacheStats:
+        with self._lock:
+            return self.stats.model_copy(update={"size": len(self._memory)})
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self._store is not None:
+            self._store.clear()
+
+    def close(self):
+        store, self._store = self._store, None
+        if store is not None:
+            store.close()
+
+
+class CachedSearch(BaseSearch):
+    """
+    带缓存的搜索引擎包装，缓存 key 由搜索引擎名称、规范化后的查询语句和搜索参数组成
+    asearch 会合并并发的相同搜索（singleflight），同一时刻相同的 key 只会发起一次上游请求
+    """
+
+    def __init__(self, search: BaseSearch, cache: SearchResultCache):
+        self.search_instance = search
+        self.cache = cache
+        self.engine_name = search.engine_name
+
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    @property
+    def cache_params(self) -> dict:
+        return self.search_instance.cache_params
+
+    def _make_key(self, query: str) -> str:
+        return self.cache.make_key(self.engine_name, query, self.cache_params)
+
+    def search(self, query: str) -> WebSearchResults:
+        key = self._make_key(query)
+        result = self.cache.get(key)
+        if result is None:
+            result = self.search_instance.search(query)
+            self.cache.set(key, result)
+            result = result.model_copy(deep=True)
+        return result
+
+    async def asearch(self, query: str) -> WebSearchResults:
+        key = self._make_key(query)
+        task = self._inflight.get(key)
+        if task is not None:
+            self.cache.stats.coalesced += 1
+            logger.info(f"合并相同的搜索请求：{query}")
+        else:
+            # 读取缓存和上游请求放在同一个独立的 task 中：读取 sqlite 时让出事件循环，期间相同的搜索同样合并
+            # 某个调用方被取消时不影响其他等待者
+            task = asyncio.ensure_future(self._fetch(key, query))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        result = await asyncio.shield(task)
+        return result.model_copy(deep=True)
+
+    async def _fetch(self, key: str, query: str) -> WebSearchResults:
+        result = await self.cache.aget(key)
+        if result is None:
+            result = await self.search_instance.asearch(query)
+            await self.cache.aset(key, result)
+        return result
+
+    async def aclose(self):
+        await self.search_instance.aclose()
+
+    def close(self):
+        if hasattr(self.search_instance, "close"):
+            self.search_instance.close()
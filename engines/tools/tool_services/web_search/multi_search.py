@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import re
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from engines.tools.tool_services.web_search.base_search import BaseSearch
+from engines.tools.tool_services.web_search.schemas import SearchResult, WebSearchResults
+from utils.commons import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# 规范化链接时去掉的跟踪参数
+TRACKING_PARAMS = frozenset({"spm", "from", "ref", "source", "fbclid", "gclid"})
+
+
+class MultiSearch(BaseSearch):
+    """
+    同时请求多个搜索引擎，用倒数排名融合（RRF）合并结果，并按规范化的链接和相似的摘要去重
+    超过 deadline 仍未返回的搜索引擎被忽略，只使用已经返回的结果；全部失败时抛出第一个异常
+    """
+
+    def __init__(
+        self,
+        engines: list[BaseSearch],
+        deadline: float = 5.0,
+        rrf_k: int = 60,
+        max_results: int = 10,
+        dedup_threshold: float = 0.8,
+        max_workers: int | None = None,
+    ):
+        """
+        :param engines: 搜索引擎实例，通常为 WebSearchFactory 中带缓存的共享实例
+        :param deadline: 等待搜索结果的最长时间（秒）
+        :param rrf_k: RRF 的平滑参数，越大各引擎排名靠后的结果权重下降越慢
+        :param max_results: 融合后最多保留的结果数
+        :param dedup_threshold: 两条摘要共同的字符 3-gram 占较短摘要的比例不低于该值时视为重复（兼容被截断的摘要）
+        :param max_workers: sync 搜索使用的线程池大小，默认为搜索引擎数的 4 倍，超过 deadline 的请求结束前仍占用线程
+        """
+        if not engines:
+            raise ValueError("engines 不能为空")
+        self.engines = engines
+        self.deadline = deadline
+        self.rrf_k = rrf_k
+        self.max_results = max_results
+        self.dedup_threshold = dedup_threshold
+        self.engine_name = "+".join(engine.engine_name for engine in engines)
+        self.max_workers = max_workers or len(engines) * 4
+        # sync 搜索的线程池，首次调用 search 时创建，所有调用共用
+        self._thread_pool: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def cache_params(self) -> dict:
+        return {engine.engine_name: engine.cache_params for engine in self.engines}
+
+    async def asearch(self, query: str) -> WebSearchResults:
+        tasks = [asyncio.create_task(engine.asearch(query)) for engine in self.engines]
+        done, pending = await asyncio.wait(tasks, timeout=self.deadline)
+        for task in pending:
+            task.cancel()
+        results = []
+        for engine, task in zip(self.engines, tasks, strict=True):
+            if task in pending:
+                logger.warning(f"搜索引擎 {engine.engine_name} 超过 {self.deadline} 秒未返回，忽略其结果")
+            elif task.exception() is not None:
+                logger.warning(f"搜索引擎 {engine.engine_name} 搜索出错：{task.exception()}")
+            else:
+                results.append(task.result())
+        return self._merge(results, [task.exception() for task in done if task.exception() is not None])
+
+    @property
+    def thread_pool(self) -> ThreadPoolExecutor:
+        if self._thread_pool is None:
+            with self._lock:
+                if self._thread_pool is None:
+                    self._thread_pool = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="multi_search"
+                    )
+        return self._thread_pool
+
+    def search(self, query: str) -> WebSearchResults:
+        futures = [self.thread_pool.submit(engine.search, query) for engine in self.engines]
+        done, pending = wait(futures, timeout=self.deadline)
+        # 不等待超时的请求结束，还没有开始执行的直接取消
+        for future in pending:
+            future.cancel()
+        results = []
+        for engine, future in zip(self.engines, futures, strict=True):
+            if future in pending:
+                logger.warning(f"搜索引擎 {engine.engine_name} 超过 {self.deadline} 秒未返回，忽略其结果")
+            elif future.exception() is not None:
+                logger.warning(f"搜索引擎 {engine.engine_name} 搜索出错：{future.exception()}")
+            else:
+                results.append(future.result())
+        return self._merge(results, [future.exception() for future in done if future.exception() is not None])
+
+    def _merge(self, results: list[WebSearchResults], errors: list[BaseException]) -> WebSearchResults:
+        if not results and errors:
+            raise errors[0]
+        return WebSearchResults(
+            search_engine="+".join(result.search_engine for result in results) or self.engine_name,
+            results=fuse_results(
+                [result.results for result in results], self.rrf_k, self.max_results, self.dedup_threshold
+            ),
+        )
+
+    def close(self):
+        """
+        关闭 sync 搜索的线程池，不等待进行中的请求，之后调用 search 时重新创建
+        """
+        with self._lock:
+            thread_pool, self._thread_pool = self._thread_pool, None
+        if thread_pool is not None:
+            thread_pool.shutdown(wait=False, cancel_futures=True)
+
+    async def aclose(self):
+        # 搜索引擎实例由 WebSearchFactory 共享，不在这里关闭，只关闭自己的线程池
+        self.close()
+
+
+def normalize_url(url: str) -> str:
+    """
+    规范化链接用于去重：忽略协议、www.、锚点、末尾的 / 和跟踪参数，域名转小写
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().removeprefix("www.")
+    query = urlencode(
+        sorted(
+            (key, value)
+            for key, value in parse_qsl(parts.query, keep_blank_values=True)
+            if not key.startswith("utm_") and key not in TRACKING_PARAMS
+        )
+    )
+    return urlunsplit(("", host, parts.path.rstrip("/"), query, ""))
+
+
+def _shingles(text: str) -> set[str]:
+    text = re.sub(r"\s+", "", text.lower())
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def fuse_results(
+    result_lists: list[list[SearchResult]], rrf_k: int = 60, max_results: int = 10, dedup_threshold: float = 0.8
+) -> list[SearchResult]:
+    """
+    倒数排名融合：每条结果的得分为其在各搜索引擎结果中 1 / (rrf_k + 排名) 之和，链接相同的结果合并得分
+    按得分排序后去掉摘要相似的结果，position 重新从 1 开始编号
+    """
+    scores: dict[str, float] = {}
+    merged: dict[str, SearchResult] = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, start=1):
+            key = normalize_url(result.link) or result.title
+            scores[key] = scores.get(key, 0.0) + 1 / (rrf_k + rank)
+            existing = merged.get(key)
+            if existing is None:
+                merged[key] = result.model_copy()
+            else:
+                # 保留先出现的结果，缺失的字段用其他搜索引擎的结果补全，摘要取较长的一个
+                if len(result.content) > len(existing.content):
+                    existing.content = result.content
+                existing.date = existing.date or result.date
+                existing.media = existing.media or result.media
+
+    fused = []
+    kept_shingles: list[set[str]] = []
+    for key in sorted(scores, key=scores.get, reverse=True):
+        result = merged[key]
+        # 过短的摘要不参与相似度判断
+        shingles = _shingles(result.content)
+        if shingles:
+            if any(len(shingles & kept) / min(len(shingles), len(kept)) >= dedup_threshold for kept in kept_shingles):
+                continue
+            kept_shingles.append(shingles)
+        result.position = len(fused) + 1
+        fused.append(result)
+        if len(fused) >= max_results:
+            break
+    return fused
+
+
+def render_search_context(
+    results: list[SearchResult], token_budget: int, count_tokens: Callable[[str], int] = estimate_tokens
+) -> str:
+    """
+    将搜索结果渲染为给模型的紧凑文本，按顺序加入直到用完 token 预算，放不下的摘要截断
+
+    :param token_budget: 最多使用的 token 数
+    :param count_tokens: 文本的 token 计数函数，默认为离线估算
+    """
+    blocks = []
+    used = 0
+    for index, result in enumerate(results, start=1):
+        header = f"[{result.position or index}] {result.title}" + (f" ({result.date})" if result.date else "")
+        block = f"{header}\n{result.content}\n{result.link}"
+        tokens = count_tokens(block) + 1
+        if used + tokens > token_budget:
+            # 剩余预算还能放下标题和链接时截断摘要，否则结束
+            remaining = token_budget - used - count_tokens(f"{header}\n\n{result.link}") - 1
+            if remaining > 16:
+                content = result.content
+                while content and count_tokens(content) > remaining:
+                    content = content[: len(content) * remaining // count_tokens(content) - 1]
+                blocks.append(f"{header}\n{content}…\n{result.link}")
+            break
+        blocks.append(block)
+        used += tokens
+    return "\n\n".join(blocks)
@@ -22,3 +22,40 @@ class SearchResult(BaseModel):
 class WebSearchResults(BaseModel):
     search_engine: str  # 搜索引擎
     results: list[SearchResult]
+
+
+class SearchHttpConfig(BaseModel):
+    """
+    搜索引擎 HTTP 连接池配置
+    """
+
+    pool_size: int = 20  # 连接池最大连接数
+    max_keepalive_connections: int = 10  # 最多保持的空闲 keep-alive 连接数
+    keepalive_expiry: float = 30.0  # 空闲 keep-alive 连接的过期时间（秒）
+    connect_timeout: float = 5.0  # 建立连接超时时间（秒）
+    read_timeout: float = 15.0  # 读取响应超时时间（秒）
+    retries: int = 1  # 建立连接失败时的重试次数，用于从已断开的 keep-alive 连接中恢复
+
+
+class WebSearchConfig(BaseModel):
+    """
+    web_search 工具函数的配置，配置多个搜索引擎时并发请求并融合结果
+    """
+
+    engines: list[str] = ["serper"]  # 使用的搜索引擎，WebSearchEngineEnum 的值
+    deadline: float = 5.0  # 多个搜索引擎时等待结果的最长时间（秒），超时的搜索引擎被忽略
+    max_results: int = 10  # 多个搜索引擎时融合后最多保留的结果数
+    context_token_budget: int = 1500  # 给模型的搜索结果文本最多使用的 token 数
+
+
+class SearchCacheStats(BaseModel):
+    """
+    搜索结果缓存统计
+    """
+
+    hits: int = 0  # 命中次数（内存或 sqlite）
+    misses: int = 0  # 未命中次数，每次未命中都会发起一次上游搜索
+    coalesced: int = 0  # 与正在进行的相同搜索合并、未发起上游请求的次数
+    evictions: int = 0  # 因超出容量被淘汰的条目数
+    expirations: int = 0  # 因过期被删除的条目数
+    size: int = 0  # 当前内存中的条目数
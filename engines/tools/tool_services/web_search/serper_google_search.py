@@ -1,16 +1,15 @@
-import http.client
-import json
-
-from engines.tools.tool_services.web_search.schemas import WebSearchResults, SearchResult
+from engines.tools.tool_services.web_search.schemas import WebSearchResults, SearchResult, SearchHttpConfig
 from engines.tools.tool_services.web_search.schemas import WebSearchEngineEnum
-from engines.tools.tool_services.web_search.base_search import BaseSearch
+from engines.tools.tool_services.web_search.base_search import PooledHttpSearch
 
 
-class SerperGoogleSearch(BaseSearch):
+class SerperGoogleSearch(PooledHttpSearch):
     """
     doc: https://serper.dev/
     """
 
+    engine_name = WebSearchEngineEnum.SERPER.value
+
     default_extra_search_params = {
         "gl": "cn",
         "hl": "zh-cn",
@@ -22,25 +21,42 @@ class SerperGoogleSearch(BaseSearch):
         api_key: str,
         base_url="google.serper.dev",
         search_params: dict | None = None,
+        http_config: SearchHttpConfig | None = None,
     ):
+        # 兼容只传入域名的写法，同时允许传入完整地址（如本地测试服务 http://127.0.0.1:8000）
+        if "://" not in base_url:
+            base_url = f"https://{base_url}"
+        super().__init__(base_url=base_url, http_config=http_config)
         self._api_key = api_key
-        self.client = http.client.HTTPSConnection(base_url)
 
-        self.search_params = search_params
-        if self.search_params is None:
-            self.search_params = {}
+        # 传入的 search_params 优先于默认参数
+        self.search_params = {**self.default_extra_search_params, **(search_params or {})}
 
-        self.search_params.update(self.default_extra_search_params)
+    @property
+    def cache_params(self) -> dict:
+        return self.search_params
 
-    def search(self, query: str) -> WebSearchResults:
+    def _build_request(self, query: str) -> tuple[dict, dict]:
         payload = {"q": query}
         payload.update(self.search_params)
 
         headers = {"X-API-KEY": self._api_key, "Content-Type": "application/json"}
+        return payload, headers
+
+    def search(self, query: str) -> WebSearchResults:
+        payload, headers = self._build_request(query)
+        response = self.client.post("/search", json=payload, headers=headers)
+        response.raise_for_status()
+        return self._parse_response(response.json())
+
+    async def asearch(self, query: str) -> WebSearchResults:
+        payload, headers = self._build_request(query)
+        response = await self.async_client.post("/search", json=payload, headers=headers)
+        response.raise_for_status()
+        return self._parse_response(response.json())
 
-        self.client.request("POST", "/search", json.dumps(payload), headers)
-        response = self.client.getresponse()
-        search_result = json.loads(response.read().decode("utf-8"))
+    @staticmethod
+    def _parse_response(search_result: dict) -> WebSearchResults:
         return WebSearchResults(
             search_engine=WebSearchEngineEnum.SERPER.value,
             results=[
@@ -51,6 +67,6 @@ class SerperGoogleSearch(BaseSearch):
                     position=res.get("position"),
                     date=res.get("date"),
                 )
-                for res in search_result["organic"]
+                for res in search_result.get("organic", [])
             ],
         )
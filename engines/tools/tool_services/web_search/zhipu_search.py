@@ -1,30 +1,53 @@
-from typing import Literal
+from typing import TYPE_CHECKING, Literal
 
-from zhipuai import ZhipuAI
-from zhipuai.types.web_search.web_search_resp import SearchResultResp
-
-from engines.tools.tool_services.web_search.schemas import WebSearchResults, SearchResult
+from engines.tools.tool_services.web_search.schemas import WebSearchResults, SearchResult, SearchHttpConfig
 from engines.tools.tool_services.web_search.schemas import WebSearchEngineEnum
-from engines.tools.tool_services.web_search.base_search import BaseSearch
+from engines.tools.tool_services.web_search.base_search import PooledHttpSearch
+
+if TYPE_CHECKING:
+    from zhipuai import ZhipuAI
 
 
-class ZhipuSearch(BaseSearch):
+class ZhipuSearch(PooledHttpSearch):
     """
     doc: https://bigmodel.cn/dev/api/search-tool/web-search
     """
 
+    engine_name = WebSearchEngineEnum.ZHIPU.value
+
     def __init__(
         self,
         api_key: str,
         search_engine: Literal[
             "search_std", "search_pro", "search_pro_sogou", "search_pro_quark", "search_pro_jina"
         ] = "search_std",
+        base_url: str = "https://open.bigmodel.cn/api/paas/v4",
+        http_config: SearchHttpConfig | None = None,
     ):
+        super().__init__(base_url=base_url, http_config=http_config)
+        self._api_key = api_key
         self.search_engine = search_engine
-        self.client = ZhipuAI(api_key=api_key)
+        self._zhipu_client: ZhipuAI | None = None
+
+    @property
+    def cache_params(self) -> dict:
+        return {"search_engine": self.search_engine}
+
+    @property
+    def zhipu_client(self) -> "ZhipuAI":
+        # sync 调用仍使用官方 SDK，在首次使用时导入和创建，异步调用和只导入模块时不加载 SDK
+        if self._zhipu_client is None:
+            from zhipuai import ZhipuAI
+
+            self._zhipu_client = ZhipuAI(
+                api_key=self._api_key, base_url=self.base_url, timeout=self.http_config.read_timeout
+            )
+        return self._zhipu_client
 
     def search(self, query: str) -> WebSearchResults:
-        response = self.client.web_search.web_search(search_query=query, search_engine=self.search_engine)
+        from zhipuai.types.web_search.web_search_resp import SearchResultResp
+
+        response = self.zhipu_client.web_search.web_search(search_query=query, search_engine=self.search_engine)
         return WebSearchResults(
             search_engine=WebSearchEngineEnum.ZHIPU.value,
             results=[
@@ -40,3 +63,26 @@ class ZhipuSearch(BaseSearch):
                 if isinstance(search_result, SearchResultResp)
             ],
         )
+
+    async def asearch(self, query: str) -> WebSearchResults:
+        # 官方 SDK 没有异步客户端，直接请求 web_search 接口
+        response = await self.async_client.post(
+            "/web_search",
+            json={"search_query": query, "search_engine": self.search_engine},
+            headers={"Authorization": f"Bearer {self._api_key}"},
+        )
+        response.raise_for_status()
+        return WebSearchResults(
+            search_engine=WebSearchEngineEnum.ZHIPU.value,
+            results=[
+                SearchResult(
+                    title=search_result.get("title"),
+                    link=search_result.get("link"),
+                    content=search_result.get("content"),
+                    icon=search_result.get("icon"),
+                    media=search_result.get("media"),
+                    position=int(search_result["refer"].split("_")[-1]) if search_result.get("refer") else None,
+                )
+                for search_result in response.json().get("search_result") or []
+            ],
+        )
@@ -1,11 +1,32 @@
+import threading
+from typing import ClassVar
+
+from engines.tools.tool_services.web_search.base_search import BaseSearch
+from engines.tools.tool_services.web_search.cached_search import CachedSearch, SearchResultCache
 from engines.tools.tool_services.web_search.zhipu_search import ZhipuSearch
 from engines.tools.tool_services.web_search.serper_google_search import SerperGoogleSearch
-from engines.tools.tool_services.web_search.schemas import WebSearchEngineEnum
+from engines.tools.tool_services.web_search.multi_search import MultiSearch
+from engines.tools.tool_services.web_search.schemas import WebSearchEngineEnum, WebSearchConfig
 
 
 class WebSearchFactory:
+    # 每个搜索引擎一个共享实例，实例内部的连接池被所有调用方复用
+    _instances: ClassVar[dict[str, BaseSearch]] = {}
+    _cached_instances: ClassVar[dict[str, CachedSearch]] = {}
+    _lock = threading.Lock()
+
+    # 所有带缓存的共享实例使用同一个缓存，可以通过 set_search_cache 替换（如开启 sqlite 持久化）
+    search_cache: SearchResultCache = SearchResultCache()
+    # web_search 工具函数使用的搜索引擎和结果文本的 token 预算，可以通过 set_web_search_config 替换
+    web_search_config: WebSearchConfig = WebSearchConfig()
+    # 多个搜索引擎时 web_search 共用的 MultiSearch 实例，配置或共享实例被替换时重新创建
+    _multi_search: MultiSearch | None = None
+
     @staticmethod
-    def get_search_instance(engine_name: str) -> ZhipuSearch | SerperGoogleSearch:
+    def create_search_instance(engine_name: str) -> ZhipuSearch | SerperGoogleSearch:
+        """
+        创建新的搜索引擎实例，一般情况下应使用 get_search_instance 获取共享实例
+        """
         engine_name = engine_name.lower()
         if engine_name == WebSearchEngineEnum.ZHIPU.value:
             return ZhipuSearch(api_key="xxx")
@@ -13,3 +34,102 @@ class WebSearchFactory:
             return SerperGoogleSearch(api_key="xxx")
         else:
             raise ValueError(f"未知的搜索引擎: {engine_name}, 仅支持: {WebSearchEngineEnum.list()}")
+
+    @classmethod
+    def get_search_instance(cls, engine_name: str, cached: bool = False) -> BaseSearch:
+        """
+        获取搜索引擎的共享实例
+
+        :param engine_name: 搜索引擎名称
+        :param cached: 是否返回带结果缓存和相同请求合并的实例
+        """
+        engine_name = engine_name.lower()
+        instances = cls._cached_instances if cached else cls._instances
+        instance = instances.get(engine_name)
+        if instance is None:
+            with cls._lock:
+                instance = cls._instances.get(engine_name)
+                if instance is None:
+                    instance = cls.create_search_instance(engine_name)
+                    cls._instances[engine_name] = instance
+                if cached:
+                    instance = cls._cached_instances.get(engine_name) or CachedSearch(instance, cls.search_cache)
+                    cls._cached_instances[engine_name] = instance
+        return instance
+
+    @classmethod
+    def set_search_instance(cls, engine_name: str, instance: BaseSearch):
+        """
+        替换搜索引擎的共享实例，例如使用自定义的 api_key、连接池配置或本地测试服务
+        """
+        engine_name = engine_name.lower()
+        with cls._lock:
+            cls._instances[engine_name] = instance
+            cls._cached_instances[engine_name] = CachedSearch(instance, cls.search_cache)
+            cls._reset_multi_search()
+
+    @classmethod
+    def set_web_search_config(cls, config: WebSearchConfig):
+        for engine_name in config.engines:
+            if engine_name.lower() not in WebSearchEngineEnum.list():
+                raise ValueError(f"未知的搜索引擎: {engine_name}, 仅支持: {WebSearchEngineEnum.list()}")
+        with cls._lock:
+            cls.web_search_config = config
+            cls._reset_multi_search()
+
+    @classmethod
+    def get_web_search_instance(cls) -> BaseSearch:
+        """
+        按 web_search_config 获取 web_search 使用的搜索实例：单个搜索引擎时为带缓存的共享实例，
+        多个搜索引擎时为基于各自带缓存的共享实例的 MultiSearch，同一个配置共用一个实例
+        """
+        config = cls.web_search_config
+        if len(config.engines) == 1:
+            return cls.get_search_instance(config.engines[0], cached=True)
+        multi_search = cls._multi_search
+        if multi_search is None:
+            engines = [cls.get_search_instance(engine_name, cached=True) for engine_name in config.engines]
+            with cls._lock:
+                if cls._multi_search is None:
+                    multi_search = MultiSearch(engines, deadline=config.deadline, max_results=config.max_results)
+                    # 等待锁期间配置被替换时只用于本次调用
+                    if cls.web_search_config is config:
+                        cls._multi_search = multi_search
+                else:
+                    multi_search = cls._multi_search
+        return multi_search
+
+    @classmethod
+    def _reset_multi_search(cls):
+        # 调用方持有 _lock，之前返回的实例可能仍在使用，只关闭其线程池，之后调用 search 时重新创建
+        if cls._multi_search is not None:
+            cls._multi_search.close()
+            cls._multi_search = None
+
+    @classmethod
+    def set_search_cache(cls, cache: SearchResultCache):
+        """
+        替换共享的搜索结果缓存
+        """
+        with cls._lock:
+            cls.search_cache = cache
+            cls._cached_instances = {
+                engine_name: CachedSearch(instance.search_instance, cache)
+                for engine_name, instance in cls._cached_instances.items()
+            }
+            cls._reset_multi_search()
+
+    @classmethod
+    async def aclose_all(cls):
+        """
+        关闭所有共享实例的连接池
+        """
+        with cls._lock:
+            instances = list(cls._instances.values())
+            cls._instances.clear()
+            cls._cached_instances.clear()
+            cls._reset_multi_search()
+        for instance in instances:
+            await instance.aclose()
+            if hasattr(instance, "close"):
+                instance.close()
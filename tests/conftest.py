@@ -0,0 +1,93 @@
+"""
+模型调用测试共用的 fixture：mock 服务、OpenAILLMInvoke 实例和工具函数 echo_tool
+
+- mock_server 的参数通过 @pytest.mark.mock_server(**options) 指定，即 MockOpenAIServer 的参数
+- llm_invoke 连接 mock_server，OpenAILLMInvoke 的其他参数通过 @pytest.mark.llm_invoke(**kwargs) 指定
+- echo_tool 通过 @pytest.mark.echo_tool(delay=..., memo=...) 指定执行耗时（秒，默认 0）和 tool_memo 参数（默认不备忘）
+标记可以加在测试函数上，也可以通过 pytestmark 加在整个模块上，测试函数上的标记优先
+需要多个 mock 服务（如服务端点池）的测试通过 start_mock_server(**options) 启动
+"""
+
+import asyncio
+from contextlib import AsyncExitStack
+
+import pytest
+
+from engines.llm.openai_llm_invoke import OpenAILLMInvoke
+from engines.tools import tool_functions
+from engines.tools.tool_schema import ToolFunctionParam, ToolParam
+from engines.tools.tool_services.tool_wrapper import tool_memo, tool_return
+from tests.mock_openai_server import MockOpenAIServer
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "mock_server(**options): mock_server fixture 使用的 MockOpenAIServer 参数")
+    config.addinivalue_line("markers", "llm_invoke(**kwargs): llm_invoke fixture 使用的 OpenAILLMInvoke 参数")
+    config.addinivalue_line("markers", "echo_tool(delay, memo): echo_tool fixture 的执行耗时（秒）和 tool_memo 参数")
+
+
+def _marker_kwargs(request, name: str) -> dict:
+    marker = request.node.get_closest_marker(name)
+    return dict(marker.kwargs) if marker is not None else {}
+
+
+@pytest.fixture
+def echo_tool(request, monkeypatch):
+    """
+    注册为 tool_functions.echo_tool 的工具函数，等待 delay 秒后返回 echo(<text>)，原始结果为 {"text": text}
+    - 每次实际执行的参数记录在 echo_tool.calls 中，执行期间被取消时设置 echo_tool.cancelled
+    - text 为 error 时抛出 ValueError
+    """
+    options = _marker_kwargs(request, "echo_tool")
+    delay = options.get("delay", 0)
+    calls = []
+    cancelled = asyncio.Event()
+
+    @tool_return
+    async def echo_tool(text: str) -> tuple[str, dict]:
+        calls.append(text)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        if text == "error":
+            raise ValueError("error")
+        return f"echo({text})", {"text": text}
+
+    if "memo" in options:
+        echo_tool = tool_memo(**options["memo"])(echo_tool)
+    echo_tool.calls = calls
+    echo_tool.cancelled = cancelled
+    monkeypatch.setattr(tool_functions, "echo_tool", echo_tool, raising=False)
+    return echo_tool
+
+
+@pytest.fixture
+def echo_tool_param(echo_tool) -> ToolParam:
+    return ToolParam(function=ToolFunctionParam(name="echo_tool", description="echo", parameters={"type": "object"}))
+
+
+@pytest.fixture
+async def start_mock_server():
+    """
+    启动 MockOpenAIServer，参数为 MockOpenAIServer 的参数，测试结束时关闭所有启动的服务
+    """
+    async with AsyncExitStack() as stack:
+
+        async def start(**options) -> MockOpenAIServer:
+            return await stack.enter_async_context(MockOpenAIServer(**options))
+
+        yield start
+
+
+@pytest.fixture
+async def mock_server(request, start_mock_server):
+    return await start_mock_server(**_marker_kwargs(request, "mock_server"))
+
+
+@pytest.fixture
+async def llm_invoke(request, mock_server):
+    llm_invoke = OpenAILLMInvoke(api_key="xxx", base_url=mock_server.base_url, **_marker_kwargs(request, "llm_invoke"))
+    yield llm_invoke
+    await llm_invoke.llm_client.close()
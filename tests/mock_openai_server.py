@@ -0,0 +1,341 @@
+"""
+本地 OpenAI 兼容接口和 Serper 搜索接口的 mock 服务，用于离线测试和性能基准，不依赖真实的 API key 和网络
+
+回答规则：
+- 最新的 user 消息以 "tool:" 开头，且本轮还没有工具结果时，返回一次工具调用（默认为 echo_tool），参数为 user 消息内容
+- 最新的 user 消息以 "tools:<n>:" 开头时，同样返回 n 个并行的工具调用，参数为 "<user 消息>#<序号>"
+- 否则返回文本回答 "answer:<user 消息>|tools:<tool 消息内容，用 , 连接>"
+  回答超过请求的 max_completion_tokens（按字符计）时截断，finish_reason 为 "length"
+流式工具调用的参数按 chunk_size 拆分到多个 chunk 中
+
+Serper 搜索接口：POST /search，返回 search_result_count 条以查询语句为标题的结果
+"""
+
+import asyncio
+import json
+import random
+import time
+from typing import Self
+
+
+class MockOpenAIServer:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        response_delay: float = 0.0,
+        chunk_size: int = 4,
+        token_interval: float = 0.0,
+        first_token_delay: float = 0.0,
+        tokens_per_second: float | None = None,
+        tool_name: str = "echo_tool",
+        tool_argument: str = "text",
+        error_statuses: list[int] | None = None,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        retry_after: float | None = None,
+        search_delay: float = 0.0,
+        search_result_count: int = 3,
+        leading_empty_chunk: bool = False,
+    ):
+        """
+        :param response_delay: 每个请求返回前的等待时间（秒），用于模拟模型推理耗时
+        :param chunk_size: 流式响应中每个 chunk 的字符数
+        :param token_interval: 流式响应中相邻 chunk 的间隔时间（秒）
+        :param first_token_delay: 流式响应返回响应头之后、第一个 chunk 之前的等待时间（秒）
+        :param tokens_per_second: 流式响应的输出速率（每个 chunk 按一个 token 计算），设置时覆盖 token_interval
+        :param tool_name: 返回的工具调用的工具函数名
+        :param tool_argument: 返回的工具调用的参数名
+        :param error_statuses: 前几个模型请求依次返回的错误状态码，如 [429, 503]
+        :param error_rate: 之后的模型请求按该概率返回 error_status
+        :param error_status: 随机错误的状态码
+        :param retry_after: 错误响应的 Retry-After 响应头（秒）
+        :param search_delay: Serper 搜索接口返回前的等待时间（秒）
+        :param search_result_count: Serper 搜索接口返回的结果数
+        :param leading_empty_chunk: 流式响应是否先返回一个只有 role、没有 content 和 tool_calls 的 chunk
+        """
+        self.host = host
+        self.port = port
+        self.response_delay = response_delay
+        self.chunk_size = chunk_size
+        self.token_interval = 1 / tokens_per_second if tokens_per_second else token_interval
+        self.first_token_delay = first_token_delay
+        self.tool_name = tool_name
+        self.tool_argument = tool_argument
+        self.error_statuses = list(error_statuses or [])
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.search_delay = search_delay
+        self.search_result_count = search_result_count
+        self.leading_empty_chunk = leading_empty_chunk
+
+        self.requests: list[dict] = []
+        self.connection_count = 0
+        self.active_requests = 0
+        self.max_active_requests = 0
+        self.aborted_streams = 0  # 客户端在流式响应结束前断开连接的次数
+        self.error_responses = 0
+        self.search_requests: list[dict] = []
+
+        self._server: asyncio.Server | None = None
+        self._connections: dict[asyncio.StreamWriter, asyncio.Task] = {}
+        self._active_changed: asyncio.Condition | None = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    @property
+    def search_base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def wait_for_active_requests(self, count: int):
+        """
+        等待正在处理的模型请求数达到 count
+        """
+        async with self._active_changed:
+            await self._active_changed.wait_for(lambda: self.active_requests >= count)
+
+    async def start(self) -> str:
+        self._active_changed = asyncio.Condition()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.base_url
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            # 客户端连接池中的 keep-alive 连接不会主动断开，需要主动关闭
+            connections = dict(self._connections)
+            for writer in connections:
+                writer.close()
+            await asyncio.gather(*connections.values(), return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> Self:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connection_count += 1
+        self._connections[writer] = asyncio.current_task()
+        try:
+            # keep-alive：同一个连接上循环处理请求
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode().split(" ", 2)
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    key, value = line.decode().split(":", 1)
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                await self._handle_request(method, path, headers, json.loads(body) if body else {}, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.pop(writer, None)
+            writer.close()
+
+    async def _handle_request(self, method: str, path: str, headers: dict, body: dict, writer: asyncio.StreamWriter):
+        if method == "POST" and path == "/search":
+            await self._handle_search(body, writer)
+            return
+        if method != "POST" or not path.endswith("/chat/completions"):
+            await self._write_json(writer, 404, {"error": {"message": f"not found: {path}"}})
+            return
+
+        self.requests.append(body)
+        self.active_requests += 1
+        async with self._active_changed:
+            self._active_changed.notify_all()
+        self.max_active_requests = max(self.max_active_requests, self.active_requests)
+        try:
+            if self.response_delay:
+                await asyncio.sleep(self.response_delay)
+            error_status = self._next_error_status()
+            if error_status is not None:
+                self.error_responses += 1
+                headers = {"retry-after": str(self.retry_after)} if self.retry_after is not None else None
+                error = {"error": {"message": f"mock error {error_status}", "type": "mock_error"}}
+                await self._write_json(writer, error_status, error, headers)
+                return
+            reply = self.build_reply(body)
+            if body.get("stream"):
+                try:
+                    await self._write_stream(writer, body, reply)
+                except ConnectionError:
+                    self.aborted_streams += 1
+                    raise
+            else:
+                await self._write_json(writer, 200, self._completion(body, reply))
+        finally:
+            self.active_requests -= 1
+
+    def _next_error_status(self) -> int | None:
+        if self.error_statuses:
+            return self.error_statuses.pop(0)
+        if self.error_rate and random.random() < self.error_rate:
+            return self.error_status
+        return None
+
+    async def _handle_search(self, body: dict, writer: asyncio.StreamWriter):
+        self.search_requests.append(body)
+        if self.search_delay:
+            await asyncio.sleep(self.search_delay)
+        query = body.get("q", "")
+        organic = [
+            {
+                "title": f"{query}-{i}",
+                "link": f"https://example.com/{i}",
+                "snippet": f"{query} 的搜索结果 {i}",
+                "position": i,
+            }
+            for i in range(1, self.search_result_count + 1)
+        ]
+        await self._write_json(writer, 200, {"organic": organic})
+
+    def build_reply(self, body: dict) -> dict:
+        """
+        根据请求 messages 构造回答，返回 {"content": str} 或 {"tool_calls": list}，截断的回答带有 finish_reason
+        """
+        messages = body["messages"]
+        last_user_index = max(i for i, message in enumerate(messages) if message["role"] == "user")
+        user_content = messages[last_user_index]["content"]
+        tool_contents = [message["content"] for message in messages[last_user_index:] if message["role"] == "tool"]
+
+        tools_enabled = body.get("tools") and body.get("tool_choice") != "none"
+        if tools_enabled and not tool_contents:
+            if user_content.startswith("tool:"):
+                arguments_list = [user_content]
+            elif user_content.startswith("tools:"):
+                count = int(user_content.split(":", 2)[1])
+                arguments_list = [f"{user_content}#{i}" for i in range(count)]
+            else:
+                arguments_list = []
+            if arguments_list:
+                return {
+                    "tool_calls": [
+                        {
+                            "index": index,
+                            "id": f"call_{len(messages)}_{index}",
+                            "type": "function",
+                            "function": {
+                                "name": self.tool_name,
+                                "arguments": json.dumps({self.tool_argument: argument}, ensure_ascii=False),
+                            },
+                        }
+                        for index, argument in enumerate(arguments_list)
+                    ]
+                }
+        content = f"answer:{user_content}|tools:{','.join(tool_contents)}"
+        max_tokens = body.get("max_completion_tokens")
+        if max_tokens is not None and len(content) > max_tokens:
+            return {"content": content[:max_tokens], "finish_reason": "length"}
+        return {"content": content}
+
+    @staticmethod
+    def _usage(body: dict) -> dict:
+        prompt_tokens = len(json.dumps(body["messages"], ensure_ascii=False)) // 4
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": 10, "total_tokens": prompt_tokens + 10}
+
+    @staticmethod
+    def _finish_reason(reply: dict) -> str:
+        return "tool_calls" if reply.get("tool_calls") else reply.get("finish_reason", "stop")
+
+    def _completion(self, body: dict, reply: dict) -> dict:
+        message = {"role": "assistant", "content": reply.get("content")}
+        if reply.get("tool_calls"):
+            message["tool_calls"] = [
+                {key: value for key, value in tool_call.items() if key != "index"} for tool_call in reply["tool_calls"]
+            ]
+        return {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{"index": 0, "message": message, "finish_reason": self._finish_reason(reply)}],
+            "usage": self._usage(body),
+        }
+
+    def _stream_deltas(self, reply: dict) -> list[dict]:
+        if reply.get("tool_calls"):
+            deltas = []
+            for tool_call in reply["tool_calls"]:
+                arguments = tool_call["function"]["arguments"]
+                deltas.append(
+                    {
+                        "role": "assistant",
+                        "tool_calls": [
+                            {**tool_call, "function": {"name": tool_call["function"]["name"], "arguments": ""}}
+                        ],
+                    }
+                )
+                for i in range(0, len(arguments), self.chunk_size):
+                    fragment = arguments[i : i + self.chunk_size]
+                    deltas.append({"tool_calls": [{"index": tool_call["index"], "function": {"arguments": fragment}}]})
+            return deltas
+
+        content = reply["content"]
+        return [
+            {"role": "assistant", "content": content[i : i + self.chunk_size]}
+            for i in range(0, len(content), self.chunk_size)
+        ]
+
+    async def _write_stream(self, writer: asyncio.StreamWriter, body: dict, reply: dict):
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n"
+            b"Connection: keep-alive\r\n\r\n"
+        )
+        finish_reason = self._finish_reason(reply)
+        deltas = self._stream_deltas(reply)
+        if self.leading_empty_chunk:
+            deltas.insert(0, {"role": "assistant", "content": ""})
+        if self.first_token_delay:
+            await asyncio.sleep(self.first_token_delay)
+        for i, delta in enumerate(deltas):
+            if self.token_interval and i:
+                await asyncio.sleep(self.token_interval)
+            chunk = {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "mock"),
+                "choices": [
+                    {"index": 0, "delta": delta, "finish_reason": finish_reason if i == len(deltas) - 1 else None}
+                ],
+            }
+            await self._write_chunk(writer, f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode())
+        if (body.get("stream_options") or {}).get("include_usage"):
+            # 与 OpenAI 一致，最后一个 chunk 的 choices 为空，只有 usage
+            chunk = {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "mock"),
+                "choices": [],
+                "usage": self._usage(body),
+            }
+            await self._write_chunk(writer, f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode())
+        await self._write_chunk(writer, b"data: [DONE]\n\n")
+        await self._write_chunk(writer, b"")
+
+    @staticmethod
+    async def _write_chunk(writer: asyncio.StreamWriter, data: bytes):
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        await writer.drain()
+
+    @staticmethod
+    async def _write_json(writer: asyncio.StreamWriter, status: int, data: dict, headers: dict | None = None):
+        body = json.dumps(data, ensure_ascii=False).encode()
+        reason = {200: "OK", 404: "Not Found", 429: "Too Many Requests"}.get(status, "Error")
+        header = f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+        header += "".join(f"{key}: {value}\r\n" for key, value in (headers or {}).items()) + "\r\n"
+        writer.write(header.encode() + body)
+        await writer.drain()
@@ -0,0 +1,74 @@
+import copy
+
+from openai.types.chat import ChatCompletion
+
+from engines.llm.openai_llm_invoke import OpenAILLMInvoke
+
+
+def make_completion(round_index: int, tool_call: bool, prompt_tokens: int = 100) -> ChatCompletion:
+    message = {"role": "assistant", "content": None if tool_call else "final answer"}
+    if tool_call:
+        message["tool_calls"] = [
+            {
+                "id": f"call_{round_index}",
+                "type": "function",
+                "function": {"name": "echo_tool", "arguments": f'{{"text": "{round_index}"}}'},
+            }
+        ]
+    return ChatCompletion.model_validate(
+        {
+            "id": "completion",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "mock",
+            "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tool_call else "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 10, "total_tokens": prompt_tokens + 10},
+        }
+    )
+
+
+def mock_llm(monkeypatch, tool_call_rounds: int, prompt_tokens: int = 100) -> tuple[OpenAILLMInvoke, list[dict]]:
+    llm_invoke = OpenAILLMInvoke(api_key="xxx", base_url="http://127.0.0.1:1")
+    requests = []
+
+    async def create(**params):
+        requests.append(copy.deepcopy(params))
+        round_index = len(requests) - 1
+        tool_call = round_index < tool_call_rounds and params.get("tool_choice") != "none"
+        return make_completion(round_index, tool_call, prompt_tokens)
+
+    monkeypatch.setattr(llm_invoke.llm_client.chat.completions, "create", create)
+    return llm_invoke, requests
+
+
+async def test_messages_grow_incrementally(monkeypatch, echo_tool_param):
+    llm_invoke, requests = mock_llm(monkeypatch, tool_call_rounds=3)
+    answer = await llm_invoke.invoke(user_prompt="hi", model_id="mock", tools=[echo_tool_param])
+
+    assert answer == "final answer"
+    assert [len(request["messages"]) for request in requests] == [2, 4, 6, 8]
+    tool_call_ids = [message["tool_call_id"] for message in requests[-1]["messages"] if message["role"] == "tool"]
+    assert tool_call_ids == ["call_0", "call_1", "call_2"]
+    assert requests[-1]["messages"][-1]["content"] == "echo(2)"
+
+
+async def test_max_tool_rounds_forces_final_answer(monkeypatch, echo_tool_param):
+    llm_invoke, requests = mock_llm(monkeypatch, tool_call_rounds=10)
+    answer = await llm_invoke.invoke(user_prompt="hi", model_id="mock", tools=[echo_tool_param], max_tool_rounds=2)
+
+    assert answer == "final answer"
+    assert len(requests) == 3
+    assert "tool_choice" not in requests[1]
+    assert requests[2]["tool_choice"] == "none"
+
+
+async def test_prompt_token_budget(monkeypatch, echo_tool_param):
+    llm_invoke, requests = mock_llm(monkeypatch, tool_call_rounds=10, prompt_tokens=400)
+    answer = await llm_invoke.invoke(
+        user_prompt="hi", model_id="mock", tools=[echo_tool_param], prompt_token_budget=1000
+    )
+
+    # 前两次请求累计 800 tokens，加上第三次请求估算的 prompt tokens 会超出预算，改为直接回答
+    assert answer == "final answer"
+    assert len(requests) == 3
+    assert requests[2]["tool_choice"] == "none"
@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+import pytest
+
+from engines.llm.batch_invoker import BatchInvoker, TokenBucket
+from engines.llm.llm_schema import BatchRequest, PriorityEnum
+
+pytestmark = pytest.mark.mock_server(response_delay=0.05)
+
+
+async def test_invoke_many_concurrency(mock_server, llm_invoke):
+    requests = [{"user_prompt": f"q{i}", "model_id": "mock"} for i in range(20)]
+    results = [result async for result in llm_invoke.invoke_many(requests, max_concurrency=4)]
+
+    assert sorted(result.result for result in results) == sorted(f"answer:q{i}|tools:" for i in range(20))
+    assert mock_server.max_active_requests == 4
+
+
+async def test_rate_limit_and_stats(mock_server, llm_invoke):
+    batch_invoker = BatchInvoker(llm_invoke, max_concurrency=10)
+    # 每秒 10 个请求，不允许突发
+    batch_invoker.request_bucket = TokenBucket(600, capacity=1)
+
+    start_time = time.monotonic()
+    requests = [BatchRequest(request_id=str(i), params={"user_prompt": "q", "model_id": "mock"}) for i in range(5)]
+    results = [result async for result in batch_invoker.invoke_many(requests)]
+    assert time.monotonic() - start_time >= 0.4
+    assert {result.request_id for result in results} == {str(i) for i in range(5)}
+
+    stats = batch_invoker.get_stats()
+    assert stats.submitted == stats.completed == 5
+    assert stats.failed == 0
+    assert stats.max_queue_wait >= 0.35
+    assert stats.requests_per_second > 0 and stats.estimated_tokens > 5 * 512
+    await batch_invoker.aclose()
+
+
+async def test_interactive_priority(mock_server, llm_invoke):
+    batch_invoker = BatchInvoker(llm_invoke, max_concurrency=1)
+    requests = [
+        BatchRequest(request_id=f"batch{i}", params={"user_prompt": f"batch{i}", "model_id": "mock"}) for i in range(5)
+    ]
+
+    async def run_batch():
+        return [result async for result in batch_invoker.invoke_many(requests)]
+
+    batch_task = asyncio.create_task(run_batch())
+    await asyncio.sleep(0.01)
+    interactive = batch_invoker.submit(
+        BatchRequest(
+            request_id="interactive",
+            priority=PriorityEnum.INTERACTIVE,
+            params={"user_prompt": "interactive", "model_id": "mock"},
+        )
+    )
+    await interactive
+    await batch_task
+
+    # 只有第一个批量请求在在线请求提交前已经开始执行，并发数为 1 时请求按执行顺序到达 mock 服务
+    prompts = [body["messages"][-1]["content"] for body in mock_server.requests]
+    assert prompts.index("interactive") == 1
+    await batch_invoker.aclose()
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from engines.llm.client_pool import LLMClientRegistry
+from engines.llm.llm_schema import LLMClientConfig
+from engines.llm.openai_llm_invoke import OpenAILLMInvoke
+
+
+async def test_clients_shared_by_base_url_and_api_key():
+    registry = LLMClientRegistry()
+    first = OpenAILLMInvoke(api_key="a", base_url="http://127.0.0.1:1/v1", client_registry=registry)
+    second = OpenAILLMInvoke(api_key="a", base_url="http://127.0.0.1:1/v1/", client_registry=registry)
+    other_tenant = OpenAILLMInvoke(api_key="b", base_url="http://127.0.0.1:1/v1", client_registry=registry)
+    assert first.llm_client is second.llm_client and first.llm_client is not other_tenant.llm_client
+    assert len(registry) == 2
+
+    # 被调用方关闭的客户端在下次获取时重新创建
+    closed_client = first.llm_client
+    await closed_client.close()
+    assert registry.get("http://127.0.0.1:1/v1", "a") is not closed_client and not first.llm_client.is_closed()
+    closed_client = other_tenant.llm_client
+    await registry.aclose_all()
+    assert closed_client.is_closed() and len(registry) == 0
+
+
+async def test_endpoint_pool_keeps_shared_clients_open():
+    registry = LLMClientRegistry()
+    first = OpenAILLMInvoke(api_key="a", base_url="http://127.0.0.1:1/v1", client_registry=registry)
+    second = OpenAILLMInvoke(api_key="a", base_url="http://127.0.0.1:1/v1", client_registry=registry)
+    shared_client = second.llm_client
+    # 关闭一个实例的服务端点池不影响共用同一个客户端的其他实例
+    await first.endpoint_pool.aclose()
+    assert not shared_client.is_closed() and second.llm_client is shared_client
+    await registry.aclose_all()
+
+
+def test_clients_bound_to_event_loop():
+    registry = LLMClientRegistry()
+    llm_invoke = OpenAILLMInvoke(api_key="a", base_url="http://127.0.0.1:1/v1", client_registry=registry)
+
+    async def get_client():
+        return llm_invoke.llm_client
+
+    # 不同的事件循环使用各自的连接池，同一个事件循环中共用
+    first_loop_client = asyncio.run(get_client())
+    second_loop_client = asyncio.run(get_client())
+    assert first_loop_client is not second_loop_client and first_loop_client is not llm_invoke.llm_client
+    asyncio.run(registry.aclose_all())
+
+
+@pytest.mark.mock_server(response_delay=0.3)
+@pytest.mark.llm_invoke(client_registry=LLMClientRegistry(LLMClientConfig(max_connections=2, warmup_connections=2)))
+async def test_warmup_and_pool_stats(mock_server, llm_invoke):
+    registry = llm_invoke.client_registry
+
+    assert await registry.warmup() == 2
+    [stats] = registry.get_stats()
+    assert mock_server.connection_count == 2 and stats.idle_connections == 2 and stats.active_connections == 0
+
+    # 预先建立的连接被复用，超过 max_connections 的请求排队等待
+    tasks = [asyncio.create_task(llm_invoke.invoke(user_prompt=f"q{i}", model_id="mock")) for i in range(3)]
+    await asyncio.wait_for(mock_server.wait_for_active_requests(2), 5)
+    [stats] = registry.get_stats()
+    assert stats.active_connections == 2 and stats.in_flight_requests == 3 and stats.waiting_requests == 1
+    assert await asyncio.gather(*tasks) == [f"answer:q{i}|tools:" for i in range(3)]
+
+    [stats] = registry.get_stats()
+    assert mock_server.connection_count == 2 and stats.connections == 2
+    assert stats.requests == 5 and stats.peak_waiting_requests == 1 and stats.in_flight_requests == 0
+    await registry.aclose_all()
+    assert registry.get_stats() == []
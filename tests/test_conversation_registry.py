@@ -0,0 +1,103 @@
+import asyncio
+import time
+
+import pytest
+
+from engines.llm.conversation_registry import ConversationRegistry
+from engines.llm.openai_llm_invoke import global_conversation_registry
+
+pytestmark = [pytest.mark.mock_server(token_interval=0.01), pytest.mark.echo_tool(delay=5)]
+
+
+def test_registry_ttl_and_size():
+    registry = ConversationRegistry(max_size=3, ttl=0.05)
+    entries = [registry.register(f"c{i}") for i in range(4)]
+    # 超出数量上限时移除最早注册的会话
+    assert registry.keys() == ["c1", "c2", "c3"]
+
+    registry.release(entries[2])
+    assert "c2" not in registry
+
+    # 相同会话 ID 重新注册时停止旧记录，旧记录的 release 不影响新记录
+    new_entry = registry.register("c3")
+    assert entries[3].stopped and not new_entry.stopped
+    registry.release(entries[3])
+    assert registry.get("c3") is new_entry
+
+    time.sleep(0.06)
+    registry.register("c4")
+    assert registry.keys() == ["c4"]
+
+
+async def test_registry_evicts_stopped_first_and_expires_idle():
+    registry = ConversationRegistry(max_size=3, ttl=0.05)
+    entries = [registry.register(f"c{i}") for i in range(3)]
+    await entries[1].stop()
+    # 超出数量上限时优先移除已经停止的会话，进行中的会话不受影响
+    registry.register("c3")
+    assert registry.keys() == ["c0", "c2", "c3"] and not entries[0].stopped
+
+    # 因数量上限被移除的进行中会话先被停止
+    registry.register("c4")
+    assert registry.keys() == ["c2", "c3", "c4"] and entries[0].stopped
+
+    # 没有新的注册时，超时的会话同样被停止并移除
+    await asyncio.sleep(0.1)
+    assert len(registry) == 0 and entries[2].stopped
+
+
+async def test_stop_closes_upstream_stream(mock_server, llm_invoke):
+    res = await llm_invoke.invoke(
+        user_prompt="x" * 2000, model_id="mock", is_stream=True, conversation_id="stop-stream"
+    )
+
+    full_res = ""
+    async for content in res:
+        full_res += content
+        if len(full_res) >= 20:
+            assert await llm_invoke.set_event_stop("stop-stream")
+
+    assert len(full_res) < 100
+    assert "stop-stream" not in global_conversation_registry
+    await asyncio.sleep(0.1)
+    assert mock_server.aborted_streams == 1
+
+
+async def test_stop_during_tool_round(llm_invoke, echo_tool, echo_tool_param):
+    async def stop_later():
+        await asyncio.sleep(0.3)
+        return await llm_invoke.set_event_stop("stop-tool")
+
+    start_time = time.perf_counter()
+    res, stopped = await asyncio.gather(
+        llm_invoke.invoke(user_prompt="tool:x", model_id="mock", tools=[echo_tool_param], conversation_id="stop-tool"),
+        stop_later(),
+    )
+
+    assert stopped
+    assert res is None
+    assert time.perf_counter() - start_time < 1
+    assert echo_tool.cancelled.is_set()
+    assert "stop-tool" not in global_conversation_registry
+
+
+async def test_reregister_stops_previous_invoke(llm_invoke):
+    first = await llm_invoke.invoke(user_prompt="x" * 2000, model_id="mock", is_stream=True, conversation_id="dup")
+    assert await first.__anext__()
+    # 相同会话 ID 的新调用停止之前仍在输出的调用，停止请求只作用于新调用
+    second = await llm_invoke.invoke(user_prompt="hi", model_id="mock", is_stream=True, conversation_id="dup")
+    assert len("".join([content async for content in first])) < 100
+    assert await llm_invoke.set_event_stop("dup")
+    assert "".join([content async for content in second]) != "answer:hi|tools:"
+    assert "dup" not in global_conversation_registry
+
+
+async def test_conversation_released_after_finish(mock_server, llm_invoke):
+    assert await llm_invoke.invoke(user_prompt="hi", model_id="mock", conversation_id="finish-1") == "answer:hi|tools:"
+    assert "finish-1" not in global_conversation_registry
+
+    res = await llm_invoke.invoke(user_prompt="hi", model_id="mock", is_stream=True, conversation_id="finish-2")
+    assert "finish-2" in global_conversation_registry
+    assert "".join([content async for content in res]) == "answer:hi|tools:"
+    assert "finish-2" not in global_conversation_registry
+    assert not await llm_invoke.set_event_stop("finish-2")
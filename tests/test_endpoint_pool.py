@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+from engines.llm.endpoint_pool import Endpoint, EndpointPool
+from engines.llm.llm_schema import InvocationContext
+from engines.llm.openai_llm_invoke import OpenAILLMInvoke
+from engines.llm.retry_policy import RetryPolicy
+
+
+async def test_latency_aware_routing(start_mock_server):
+    slow = await start_mock_server(response_delay=0.2)
+    fast = await start_mock_server(response_delay=0.01)
+    pool = EndpointPool([Endpoint(slow.base_url, "xxx"), Endpoint(fast.base_url, "xxx")])
+    llm_invoke = OpenAILLMInvoke(endpoint_pool=pool)
+    for _ in range(6):
+        await asyncio.gather(*[llm_invoke.invoke(user_prompt="q", model_id="mock") for _ in range(4)])
+    await pool.aclose()
+
+    # 慢的服务端点延迟更高，后续请求大部分路由到快的服务端点，并发请求按正在处理的请求数分散
+    assert len(fast.requests) > 2 * len(slow.requests)
+    assert len(slow.requests) >= 1
+    assert {stats.requests for stats in pool.get_stats()} == {len(slow.requests), len(fast.requests)}
+
+
+async def test_failover_without_backoff(mock_server):
+    # 第一个服务端点无法连接，权重更高使其先被选中
+    dead = Endpoint("http://127.0.0.1:1/v1", "xxx", weight=100)
+    pool = EndpointPool([dead, Endpoint(mock_server.base_url, "xxx")])
+    llm_invoke = OpenAILLMInvoke(endpoint_pool=pool, retry_policy=RetryPolicy(base_delay=10))
+    ctx = InvocationContext()
+
+    start_time = time.monotonic()
+    assert await llm_invoke.invoke(user_prompt="q", model_id="mock", context=ctx) == "answer:q|tools:"
+    assert time.monotonic() - start_time < 1
+    assert ctx.retry_count == 1
+    assert pool.get_stats()[0].failures == 1
+    await pool.aclose()
+
+
+async def test_hedged_request(start_mock_server):
+    slow = await start_mock_server(response_delay=2)
+    fast = await start_mock_server()
+    pool = EndpointPool(
+        [Endpoint(slow.base_url, "xxx", weight=100), Endpoint(fast.base_url, "xxx")],
+        hedge=True,
+        hedge_initial_delay=0.1,
+    )
+    llm_invoke = OpenAILLMInvoke(endpoint_pool=pool)
+
+    start_time = time.monotonic()
+    assert await llm_invoke.invoke(user_prompt="q", model_id="mock") == "answer:q|tools:"
+    assert time.monotonic() - start_time < 1
+    assert len(slow.requests) == len(fast.requests) == 1
+    # 较慢的请求被取消
+    await asyncio.sleep(0.05)
+    assert pool.get_stats()[0].outstanding == 0
+    await pool.aclose()
+
+
+async def test_first_token_timeout_failover(start_mock_server):
+    slow = await start_mock_server(response_delay=2)
+    fast = await start_mock_server()
+    pool = EndpointPool(
+        [Endpoint(slow.base_url, "xxx", weight=100), Endpoint(fast.base_url, "xxx")], first_token_timeout=0.2
+    )
+    llm_invoke = OpenAILLMInvoke(endpoint_pool=pool)
+
+    start_time = time.monotonic()
+    res = await llm_invoke.invoke(user_prompt="q", model_id="mock", is_stream=True)
+    assert "".join([chunk async for chunk in res]) == "answer:q|tools:"
+    assert time.monotonic() - start_time < 1
+    assert len(fast.requests) == 1
+    await pool.aclose()
@@ -0,0 +1,44 @@
+import pytest
+
+from benchmarks.get_dict_benchmark import build_corpus, legacy_get_dict
+from utils.get_dict import get_dict
+
+
+def test_get_dict_cases():
+    assert get_dict('结果：{"a": 1, "b": {"c": [1, 2]}} 完成') == {"a": 1, "b": {"c": [1, 2]}}
+    # 字符串中的括号和说明文字中的括号
+    assert get_dict('用 {name} 表示占位符：{"code": "if (a) { b(); "} 其中 {x} 需要替换') == {"code": "if (a) { b(); "}
+    # 多个对象时返回第一个或最长的
+    text = '{"a": 1} 以及 {"b": 2, "c": 3}'
+    assert get_dict(text) == {"a": 1}
+    assert get_dict(text, select="largest") == {"b": 2, "c": 3}
+    # 优先使用 ```json 代码块，其他语言的代码块忽略
+    text = '示例 {"x": 0}\n```python\nd = {"y": 1}\n```\n```json\n{"z": 2}\n```'
+    assert get_dict(text) == {"z": 2}
+    assert get_dict(text, prefer_fenced=False) == {"x": 0}
+    # 数组
+    assert get_dict("结果：[1, 2, 3]", allow_array=True) == [1, 2, 3]
+    with pytest.raises(ValueError):
+        get_dict("结果：[1, 2, 3]")
+    # 被截断的 json 不返回其中的子对象
+    with pytest.raises(ValueError):
+        get_dict('{"items": [{"v": 1}, {"v": 2}, {"v"')
+
+
+def test_get_dict_benchmark_corpus():
+    for name, text in build_corpus().items():
+        try:
+            expected = legacy_get_dict(text)
+        except ValueError:
+            expected = None
+        if name == "truncated":
+            with pytest.raises(ValueError):
+                get_dict(text)
+            continue
+
+        result = get_dict(text)
+        assert isinstance(result, dict)
+        # 之前的实现能提取到结果时两者一致
+        if expected is not None:
+            assert result == expected, name
+    assert get_dict(build_corpus()["braces_in_strings"])["ok"] is True
@@ -0,0 +1,63 @@
+import pytest
+
+from engines.llm.history_budgeter import HistoryBudgeter
+from engines.llm.llm_schema import ChatMessage, HistoryMessages, InvocationContext, ToolcallMessage
+
+
+def build_history(turns: int, tool_content: str) -> list[dict]:
+    messages = []
+    for turn in range(turns):
+        tool_call = {"id": f"call_{turn}", "type": "function", "function": {"name": "web_search", "arguments": "{}"}}
+        messages.extend(
+            [
+                {"role": "user", "content": f"问题 {turn}"},
+                {"role": "assistant", "content": None, "tool_calls": [tool_call]},
+                {"role": "tool", "tool_call_id": f"call_{turn}", "name": "web_search", "content": tool_content},
+                {"role": "assistant", "content": f"回答 {turn}"},
+            ]
+        )
+    return messages
+
+
+def test_trim_keeps_tool_pairs_and_recent_turns():
+    messages = [
+        {"role": "system", "content": "system"},
+        *build_history(5, "搜索结果" * 500),
+        {"role": "user", "content": "最新的问题"},
+    ]
+    budgeter = HistoryBudgeter(max_prompt_tokens=800, keep_recent_turns=2, max_tool_content_tokens=100)
+    trimmed, stats = budgeter.trim(messages)
+
+    assert stats.tokens_before > stats.budget >= stats.tokens_after
+    assert stats.tokens_after == budgeter.token_counter.count_messages(trimmed)
+    assert stats.removed_messages % 4 == 0 and stats.removed_messages > 0
+    assert trimmed[0] == messages[0] and trimmed[-1] == messages[-1]
+    # 最近两轮始终保留，每个工具调用都有对应的工具结果
+    assert [message["content"] for message in trimmed if message["role"] == "user"][-3:] == [
+        "问题 3",
+        "问题 4",
+        "最新的问题",
+    ]
+    tool_call_ids = [message["tool_calls"][0]["id"] for message in trimmed if message.get("tool_calls")]
+    assert tool_call_ids == [message["tool_call_id"] for message in trimmed if message["role"] == "tool"]
+    assert all(len(message["content"]) < 1000 for message in trimmed if message["role"] == "tool")
+    # 不修改传入的 messages
+    assert messages[3]["content"] == "搜索结果" * 500
+
+    _, stats = budgeter.trim(messages[:1] + messages[-1:])
+    assert stats.tokens_before == stats.tokens_after and stats.removed_messages == 0
+
+
+@pytest.mark.llm_invoke(history_budgeter=HistoryBudgeter(max_prompt_tokens=600, max_tool_content_tokens=50))
+async def test_invoke_with_history_budget(mock_server, llm_invoke):
+    history = HistoryMessages(
+        messages=[
+            ToolcallMessage(**message) if message["role"] == "tool" else ChatMessage(**message)
+            for message in build_history(6, "结果" * 200)
+        ]
+    )
+    ctx = InvocationContext()
+    assert await llm_invoke.invoke(user_prompt="q", model_id="mock", history_messages=history, context=ctx)
+
+    assert ctx.history_trim.tokens_before > 600 >= ctx.history_trim.tokens_after
+    assert len(mock_server.requests[0]["messages"]) == len(ctx.messages) < 6 * 4 + 2
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from engines.llm.history_store import InMemoryHistoryStore, SqliteHistoryStore
+from engines.llm.openai_llm_invoke import OpenAILLMInvoke
+
+
+def turn(index: int) -> list[dict]:
+    return [{"role": "user", "content": f"q{index}"}, {"role": "assistant", "content": f"中文回答{index}"}]
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_store_window_and_limits(backend, tmp_path):
+    if backend == "memory":
+        store = InMemoryHistoryStore(max_conversations=2, max_turns=3)
+    else:
+        store = SqliteHistoryStore(str(tmp_path / "history.db"), max_turns=3)
+
+    for i in range(5):
+        store.append_turn("c1", turn(i))
+    # 每个会话最多保留 max_turns 轮，读取时按时间顺序返回最近的几轮
+    assert store.load("c1", 10) == turn(2) + turn(3) + turn(4)
+    assert store.load("c1", 2) == turn(3) + turn(4)
+    assert store.load("c1", 0) == [] and store.load("missing", 5) == []
+    assert store.load_raw("c1", 1) == ['[{"role":"user","content":"q4"},{"role":"assistant","content":"中文回答4"}]']
+
+    store.append_turn("c2", turn(0))
+    store.append_turn("c3", turn(0))
+    if backend == "memory":
+        # 超过会话数上限时淘汰最久未使用的会话
+        assert store.size() == 2 and store.load("c1", 10) == []
+    else:
+        assert store.size() == 3
+    store.delete("c3")
+    assert store.load("c3", 10) == []
+    store.clear()
+    assert store.size() == 0
+    store.close()
+
+
+@pytest.mark.mock_server(chunk_size=2)
+async def test_invoke_reads_and_writes_history(mock_server, echo_tool_param, tmp_path):
+    store = SqliteHistoryStore(str(tmp_path / "history.db"))
+    llm_invoke = OpenAILLMInvoke(api_key="xxx", base_url=mock_server.base_url, history_store=store, history_turns=2)
+
+    answer = await llm_invoke.invoke(
+        user_prompt="tool:a", model_id="mock", tools=[echo_tool_param], conversation_id="h1"
+    )
+    assert answer == "answer:tool:a|tools:echo(tool:a)"
+    # 工具调用的 assistant/tool 消息和最终回答作为同一轮保存
+    assert [message["role"] for message in store.load("h1", 10)] == ["user", "assistant", "tool", "assistant"]
+
+    generator = await llm_invoke.invoke(user_prompt="b", model_id="mock", is_stream=True, conversation_id="h1")
+    assert "".join([content async for content in generator]) == "answer:b|tools:"
+    assert await llm_invoke.invoke(user_prompt="c", model_id="mock", conversation_id="h1") == "answer:c|tools:"
+    # 只读取最近 history_turns 轮，放在 system prompt 和最新的 user 消息之间
+    sent = [(message["role"], message["content"]) for message in mock_server.requests[-1]["messages"]]
+    assert sent[1:] == [
+        ("user", "tool:a"),
+        ("assistant", None),
+        ("tool", "echo(tool:a)"),
+        ("assistant", "answer:tool:a|tools:echo(tool:a)"),
+        ("user", "b"),
+        ("assistant", "answer:b|tools:"),
+        ("user", "c"),
+    ]
+    await llm_invoke.invoke(user_prompt="d", model_id="mock", conversation_id="h1")
+    assert [message["content"] for message in mock_server.requests[-1]["messages"]][1:] == [
+        "b",
+        "answer:b|tools:",
+        "c",
+        "answer:c|tools:",
+        "d",
+    ]
+
+    # 提前关闭的流式输出和没有指定会话 ID 的调用不写入历史记录
+    generator = await llm_invoke.invoke(user_prompt="e", model_id="mock", is_stream=True, conversation_id="h1")
+    await anext(generator)
+    await generator.aclose()
+    await llm_invoke.invoke(user_prompt="f", model_id="mock")
+    assert [message["content"] for message in store.load("h1", 10) if message["role"] == "user"] == [
+        "tool:a",
+        "b",
+        "c",
+        "d",
+    ]
+    assert store.size() == 1
+    await llm_invoke.llm_client.close()
+    store.close()
+
+
+async def test_sqlite_history_off_event_loop(monkeypatch, mock_server, tmp_path):
+    threads = []
+    to_thread = asyncio.to_thread
+
+    async def record_to_thread(func, *args):
+        threads.append(func.__name__)
+        return await to_thread(func, *args)
+
+    monkeypatch.setattr(asyncio, "to_thread", record_to_thread)
+    store = SqliteHistoryStore(str(tmp_path / "history.db"))
+    llm_invoke = OpenAILLMInvoke(api_key="xxx", base_url=mock_server.base_url, history_store=store)
+    assert await llm_invoke.invoke(user_prompt="a", model_id="mock", conversation_id="h1") == "answer:a|tools:"
+    generator = await llm_invoke.invoke(user_prompt="b", model_id="mock", is_stream=True, conversation_id="h1")
+    assert "".join([content async for content in generator]) == "answer:b|tools:"
+    # 非流式和流式调用读写 sqlite 历史记录都在线程中执行
+    assert threads == ["load", "append_turn", "load", "append_turn"]
+    assert len(store.load("h1", 10)) == 4
+    await llm_invoke.llm_client.close()
+    store.close()
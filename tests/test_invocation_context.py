@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from engines.llm.llm_schema import InvocationContext
+
+pytestmark = [pytest.mark.mock_server(response_delay=0.02), pytest.mark.echo_tool(delay=0.01)]
+
+
+async def collect(res) -> str:
+    if isinstance(res, str):
+        return res
+    return "".join([content async for content in res])
+
+
+async def test_shared_instance_concurrent_invoke(mock_server, llm_invoke, echo_tool_param):
+
+    async def run(i: int) -> tuple[str, str, InvocationContext]:
+        prompt = f"tool:{i}" if i % 2 else f"plain:{i}"
+        ctx = InvocationContext()
+        res = await llm_invoke.invoke(
+            user_prompt=prompt, model_id="mock", tools=[echo_tool_param], is_stream=i % 3 == 0, context=ctx
+        )
+        return prompt, await collect(res), ctx
+
+    results = await asyncio.gather(*[run(i) for i in range(60)])
+
+    for prompt, answer, ctx in results:
+        if prompt.startswith("tool:"):
+            # 每个调用只能看到自己的工具调用结果
+            assert answer == f"answer:{prompt}|tools:echo({prompt})"
+            assert ctx.tool_round == 1
+            assert ctx.tool_origin_res == {"echo_tool": {"text": prompt}}
+            assert [message.role for message in ctx.tools_history_message.messages] == ["assistant", "tool"]
+        else:
+            assert answer == f"answer:{prompt}|tools:"
+            assert ctx.tool_round == 0
+            assert ctx.tools_history_message.messages == []
+
+    assert mock_server.max_active_requests > 1
+    # 所有调用共享同一个客户端连接池
+    assert mock_server.connection_count < len(mock_server.requests)
+
+
+async def test_context_conversation_id(mock_server, llm_invoke):
+    ctx = InvocationContext(conversation_id="conversation-1")
+    await llm_invoke.invoke(user_prompt="hi", model_id="mock", context=ctx)
+
+    assert ctx.conversation_id == "conversation-1"
+    assert ctx.messages[-1] == {"role": "user", "content": "hi"}
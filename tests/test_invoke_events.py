@@ -0,0 +1,98 @@
+import asyncio
+import time
+
+import pytest
+
+from engines.llm.llm_schema import InvokeEvent
+from engines.llm.openai_llm_invoke import global_conversation_registry
+
+pytestmark = pytest.mark.echo_tool(delay=0.2)
+
+
+@pytest.mark.mock_server(leading_empty_chunk=True)
+async def test_event_order_with_parallel_tools(llm_invoke, echo_tool_param):
+    with pytest.raises(ValueError):
+        await llm_invoke.invoke(user_prompt="q", model_id="mock", is_dict=True, event_stream=True)
+
+    start_time = time.perf_counter()
+    generator = await llm_invoke.invoke(
+        user_prompt="tools:2:q", model_id="mock", tools=[echo_tool_param], event_stream=True
+    )
+    events = [(event, time.perf_counter() - start_time) async for event in generator]
+
+    types = [event.type for event, _ in events if event.type != "usage"]
+    assert types[:6] == [
+        "round_start",
+        "tool_call_started",
+        "tool_call_started",
+        "tool_result",
+        "tool_result",
+        "round_end",
+    ]
+    assert types[6] == "round_start" and types[-1] == "finish" and set(types[7:-1]) == {"text"}
+
+    started = [event for event, _ in events if event.type == "tool_call_started"]
+    assert [event.arguments for event in started] == [{"text": "tools:2:q#0"}, {"text": "tools:2:q#1"}]
+    # 工具调用开始的事件在工具执行期间就已返回
+    started_at = max(elapsed for event, elapsed in events if event.type == "tool_call_started")
+    assert min(elapsed for event, elapsed in events if event.type == "tool_result") - started_at > 0.15
+    results = [event for event, _ in events if event.type == "tool_result"]
+    assert {event.tool_call_id for event in results} == {event.tool_call_id for event in started}
+    assert all(event.round == 0 and event.elapsed >= 0.2 and event.error is None for event in results)
+
+    text = "".join(event.content for event, _ in events if event.type == "text")
+    assert text == "answer:tools:2:q|tools:echo(tools:2:q#0),echo(tools:2:q#1)"
+    # 文本事件不是 pydantic 模型，但字段和序列化结果与其他事件一致
+    text_event = next(event for event, _ in events if event.type == "text")
+    assert text_event.model_dump() == InvokeEvent(type="text", round=1, content=text_event.content).model_dump()
+    assert text_event.error is None and text_event.tool_name is None
+    assert events[-1][0].content == text and events[-1][0].round == 1
+
+
+@pytest.mark.mock_server(chunk_size=1, token_interval=0.01)
+async def test_event_stream_stop_and_early_close(llm_invoke, echo_tool_param):
+    generator = await llm_invoke.invoke(
+        user_prompt="q" * 100, model_id="mock", conversation_id="events-stop", event_stream=True
+    )
+    types = []
+    async for event in generator:
+        types.append(event.type)
+        if event.type == "text" and types.count("text") == 3:
+            assert await llm_invoke.set_event_stop("events-stop")
+    assert types[-1] == "stop" and "finish" not in types
+
+    # 调用方在工具执行期间关闭生成器时停止会话
+    generator = await llm_invoke.invoke(
+        user_prompt="tool:q",
+        model_id="mock",
+        tools=[echo_tool_param],
+        conversation_id="events-close",
+        event_stream=True,
+    )
+    async for event in generator:
+        if event.type == "tool_call_started":
+            break
+    await generator.aclose()
+    assert "events-close" not in global_conversation_registry
+
+
+@pytest.mark.mock_server(response_delay=0.1)
+async def test_early_close_only_stops_own_conversation(llm_invoke, echo_tool_param):
+    generator = await llm_invoke.invoke(
+        user_prompt="tool:q", model_id="mock", tools=[echo_tool_param], conversation_id="shared", event_stream=True
+    )
+    async for event in generator:
+        if event.type == "tool_call_started":
+            break
+    # 相同会话 ID 的另一次调用覆盖了注册表中的记录，关闭事件流不能停止它
+    other = asyncio.create_task(llm_invoke.invoke(user_prompt="q", model_id="mock", conversation_id="shared"))
+    await asyncio.sleep(0.05)
+    await generator.aclose()
+    assert await other == "answer:q|tools:"
+
+
+@pytest.mark.mock_server(leading_empty_chunk=True)
+async def test_leading_empty_chunk_is_skipped(llm_invoke):
+    generator = await llm_invoke.invoke(user_prompt="q", model_id="mock", is_stream=True)
+    assert await anext(generator) == "answ"
+    await generator.aclose()
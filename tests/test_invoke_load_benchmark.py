@@ -0,0 +1,33 @@
+import asyncio
+
+import pytest
+
+from benchmarks.invoke_load_benchmark import run_benchmark
+from engines.llm.retry_policy import RetryPolicy
+
+
+@pytest.mark.echo_tool(delay=0.05)
+@pytest.mark.mock_server(error_statuses=[429], retry_after=0.2, first_token_delay=0.05)
+@pytest.mark.llm_invoke(retry_policy=RetryPolicy(max_retries=1, base_delay=10))
+async def test_mock_server_errors_and_parallel_tool_calls(mock_server, llm_invoke, echo_tool_param):
+    loop = asyncio.get_running_loop()
+    start_time = loop.time()
+    generator = await llm_invoke.invoke(
+        user_prompt="tools:3:q", model_id="mock", tools=[echo_tool_param], is_stream=True
+    )
+    answer = "".join([content async for content in generator])
+    elapsed = loop.time() - start_time
+
+    assert answer == "answer:tools:3:q|tools:" + ",".join(f"echo(tools:3:q#{i})" for i in range(3))
+    # 按 Retry-After 等待而不是 base_delay；三个工具调用并发执行
+    assert mock_server.error_responses == 1 and len(mock_server.requests) == 3
+    assert 0.2 <= elapsed < 0.2 + 0.05 * 3 + 0.5
+
+
+async def test_load_benchmark_smoke():
+    results = await run_benchmark(requests=8, concurrency=4, token_interval=0.001, search_delay=0.01)
+
+    assert [stats.mode for stats in results] == ["stream", "non_stream", "tool"]
+    for stats in results:
+        assert stats.errors == 0 and stats.throughput > 0
+        assert stats.ttft["p50"] <= stats.latency["p50"] <= stats.latency["p99"]
@@ -0,0 +1,34 @@
+import pytest
+
+from engines.llm.invoke_metrics import MetricsCollector
+
+pytestmark = pytest.mark.echo_tool(delay=0.01)
+
+
+@pytest.mark.mock_server(chunk_size=2, token_interval=0.01)
+@pytest.mark.llm_invoke(hooks=[MetricsCollector()])
+async def test_metrics_collector(mock_server, llm_invoke, echo_tool_param):
+    [metrics] = llm_invoke.hooks
+    endpoint = llm_invoke.endpoint_pool.endpoints[0].name
+
+    generator = await llm_invoke.invoke(user_prompt="tool:q", model_id="mock", tools=[echo_tool_param], is_stream=True)
+    answer = "".join([content async for content in generator])
+    assert answer == "answer:tool:q|tools:echo(tool:q)"
+    assert mock_server.requests[0]["stream_options"] == {"include_usage": True}
+
+    assert metrics.get_counter("requests_total", model="mock", endpoint=endpoint, status="ok") == 2
+    assert metrics.get_histogram("time_to_first_token_seconds", model="mock", endpoint=endpoint).count == 2
+    # 每个有内容的 chunk 记录一次间隔，第一个 chunk 除外
+    gaps = metrics.get_histogram("inter_token_gap_seconds", model="mock", endpoint=endpoint)
+    assert gaps.count == len(answer) // 2 - 1
+    assert 0.005 <= gaps.quantile(0.5) <= 0.05
+    assert metrics.get_histogram("tool_duration_seconds", tool="echo_tool").count == 1
+    assert metrics.get_counter("tool_calls_total", tool="echo_tool", status="ok") == 1
+    assert metrics.get_histogram("invoke_tool_rounds", model="mock").sum == 1
+    # 工具调用和最终回答的流式请求都返回了 usage
+    assert metrics.get_counter("tokens_total", model="mock", endpoint=endpoint, type="completion") == 20
+
+    text = metrics.to_prometheus()
+    assert "# TYPE llm_invoke_time_to_first_token_seconds histogram" in text
+    assert f'llm_invoke_requests_total{{model="mock",endpoint="{endpoint}",status="ok"}} 2' in text
+    assert 'llm_invoke_tool_duration_seconds_bucket{tool="echo_tool",le="+Inf"} 1' in text
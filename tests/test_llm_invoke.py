@@ -34,7 +34,7 @@ async def test_llm_no_tool():
 
 async def test_llm_stop():
     import asyncio
-    from engines.llm.openai_llm_invoke import global_conversation_events
+    from engines.llm.openai_llm_invoke import global_conversation_registry
 
     full_res = ""
 
@@ -49,8 +49,8 @@ async def test_llm_stop():
     async def sopt_stream():
         await asyncio.sleep(2)
         while True:
-            if global_conversation_events:
-                conversation_id = list(global_conversation_events.keys())[0]
+            if global_conversation_registry:
+                conversation_id = next(iter(global_conversation_registry.keys()))
                 await llm_invoke.set_event_stop(conversation_id)
                 break
             else:
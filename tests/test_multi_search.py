@@ -0,0 +1,112 @@
+import asyncio
+import time
+
+import pytest
+
+from engines.tools.tool_functions.web_search import web_search
+from engines.tools.tool_services.web_search.base_search import BaseSearch
+from engines.tools.tool_services.web_search.multi_search import (
+    MultiSearch,
+    fuse_results,
+    normalize_url,
+    render_search_context,
+)
+from engines.tools.tool_services.web_search.schemas import SearchResult, WebSearchConfig, WebSearchResults
+from engines.tools.tool_services.web_search_factory import WebSearchFactory
+from utils.commons import estimate_tokens
+
+
+def make_result(link: str, content: str, title: str = "t") -> SearchResult:
+    return SearchResult(title=title, link=link, content=content)
+
+
+class StubSearch(BaseSearch):
+    def __init__(self, engine_name: str, results: list[SearchResult], delay: float = 0.0, error: bool = False):
+        self.engine_name = engine_name
+        self.results = results
+        self.delay = delay
+        self.error = error
+
+    def search(self, query: str) -> WebSearchResults:
+        time.sleep(self.delay)
+        if self.error:
+            raise RuntimeError(f"{self.engine_name} error")
+        return WebSearchResults(search_engine=self.engine_name, results=self.results)
+
+    async def asearch(self, query: str) -> WebSearchResults:
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise RuntimeError(f"{self.engine_name} error")
+        return WebSearchResults(search_engine=self.engine_name, results=self.results)
+
+
+serper_results = [
+    make_result("https://www.a.com/x/?utm_source=s#top", "北京今天晴，最高气温 25 度，空气质量良", "a"),
+    make_result("https://b.com/y", "上海今天多云转小雨，傍晚有阵风", "b"),
+    make_result("https://c.com/z", "北京今天晴，最高气温 25 度，空气质量良。", "c"),
+]
+zhipu_results = [
+    make_result("http://a.com/x", "北京今天晴，最高气温 25 度，空气质量良好，适合户外活动", "a2"),
+    make_result("https://d.com/w", "广州今天有雷阵雨，注意出行安全", "d"),
+]
+
+
+def test_fuse_results():
+    assert normalize_url("https://www.A.com/x/?b=2&utm_source=s&a=1#top") == normalize_url("http://a.com/x?a=1&b=2")
+
+    fused = fuse_results([serper_results, zhipu_results])
+    # a.com 被两个搜索引擎返回，得分最高，摘要取较长的一个；c.com 与 a.com 的摘要相似被去重
+    assert [result.title for result in fused] == ["a", "b", "d"]
+    assert fused[0].content == zhipu_results[0].content
+    assert [result.position for result in fused] == [1, 2, 3]
+    # 不修改传入的结果
+    assert serper_results[0].position is None
+
+
+async def test_multi_search_deadline_and_errors():
+    engines = [
+        StubSearch("serper", serper_results, delay=0.01),
+        StubSearch("zhipu", zhipu_results, delay=1),
+        StubSearch("broken", [], error=True),
+    ]
+    start_time = time.perf_counter()
+    result = await MultiSearch(engines, deadline=0.2).asearch("q")
+    assert time.perf_counter() - start_time < 0.5
+    assert result.search_engine == "serper" and [item.title for item in result.results] == ["a", "b"]
+    multi_search = MultiSearch(engines[:2], deadline=2)
+    assert multi_search.search("q").search_engine == "serper+zhipu"
+    # sync 搜索复用实例的线程池
+    thread_pool = multi_search.thread_pool
+    assert multi_search.search("q").search_engine == "serper+zhipu" and multi_search.thread_pool is thread_pool
+    multi_search.close()
+
+    with pytest.raises(RuntimeError):
+        await MultiSearch([engines[2]]).asearch("q")
+
+
+def test_render_search_context():
+    results = fuse_results([[make_result(f"https://a.com/{i}", f"第 {i} 条结果" * 50) for i in range(10)]])
+    context = render_search_context(results, token_budget=400)
+
+    assert context.startswith("[1] t\n第 0 条结果")
+    assert estimate_tokens(context) <= 400 + 10
+    assert "…" in context and "[9]" not in context
+    assert "'title'" not in context
+
+
+async def test_web_search_fan_out(monkeypatch):
+    monkeypatch.setattr(WebSearchFactory, "web_search_config", WebSearchFactory.web_search_config)
+    WebSearchFactory.set_search_instance("serper", StubSearch("serper", serper_results))
+    WebSearchFactory.set_search_instance("zhipu", StubSearch("zhipu", zhipu_results))
+    WebSearchFactory.set_web_search_config(WebSearchConfig(engines=["serper", "zhipu"], context_token_budget=200))
+    with pytest.raises(ValueError):
+        WebSearchFactory.set_web_search_config(WebSearchConfig(engines=["bing"]))
+
+    try:
+        content, origin_res = await web_search(query="天气")
+        assert content.startswith("[1] a\n北京今天晴") and "广州" in content
+        assert origin_res["search_engine"] == "serper+zhipu" and len(origin_res["results"]) == 3
+        # 同一个配置共用一个 MultiSearch 实例
+        assert WebSearchFactory.get_web_search_instance() is WebSearchFactory.get_web_search_instance()
+    finally:
+        await WebSearchFactory.aclose_all()
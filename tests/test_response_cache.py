@@ -0,0 +1,129 @@
+import asyncio
+import time
+
+import pytest
+
+from engines.llm.openai_llm_invoke import OpenAILLMInvoke
+from engines.llm.response_cache import InMemoryResponseCacheStore, ResponseCache, SqliteResponseCacheStore
+
+
+async def collect(generator) -> str:
+    return "".join([content async for content in generator])
+
+
+@pytest.mark.llm_invoke(response_cache=ResponseCache())
+async def test_cache_hit_and_stream_replay(mock_server, llm_invoke):
+    assert await llm_invoke.invoke(user_prompt="q", model_id="mock", temperature=0) == "answer:q|tools:"
+    assert await llm_invoke.invoke(user_prompt="q", model_id="mock", temperature=0) == "answer:q|tools:"
+    # 流式调用命中非流式调用写入的缓存
+    assert await collect(await llm_invoke.invoke(user_prompt="q", model_id="mock", temperature=0, is_stream=True)) == (
+        "answer:q|tools:"
+    )
+    assert len(mock_server.requests) == 1
+
+    # 参数不同、temperature 大于 0 或不使用缓存时请求模型，流式输出完整结束后写入缓存
+    assert await collect(await llm_invoke.invoke(user_prompt="q2", model_id="mock", temperature=0, is_stream=True)) == (
+        "answer:q2|tools:"
+    )
+    assert await llm_invoke.invoke(user_prompt="q2", model_id="mock", temperature=0) == "answer:q2|tools:"
+    await llm_invoke.invoke(user_prompt="q", model_id="mock", temperature=0.9)
+    await llm_invoke.invoke(user_prompt="q", model_id="mock", temperature=0, use_cache=False)
+    assert len(mock_server.requests) == 4
+
+    stats = llm_invoke.response_cache.get_stats()
+    assert stats.hits == 3 and stats.size == 2 and stats.inflight == 0
+
+
+@pytest.mark.mock_server(response_delay=0.2)
+@pytest.mark.llm_invoke(response_cache=ResponseCache())
+async def test_concurrent_identical_requests_coalesced(mock_server, llm_invoke):
+    results = await asyncio.gather(
+        *[llm_invoke.invoke(user_prompt="q", model_id="mock", temperature=0) for _ in range(5)]
+    )
+    assert results == ["answer:q|tools:"] * 5
+    assert len(mock_server.requests) == 1
+    assert llm_invoke.response_cache.get_stats().coalesced == 4
+
+
+@pytest.mark.llm_invoke(response_cache=ResponseCache())
+async def test_stopped_stream_not_cached(mock_server, llm_invoke):
+    generator = await llm_invoke.invoke(user_prompt="q", model_id="mock", temperature=0, is_stream=True)
+    await anext(generator)
+    await generator.aclose()
+    stats = llm_invoke.response_cache.get_stats()
+    assert stats.size == 0 and stats.inflight == 0
+
+    assert await llm_invoke.invoke(user_prompt="q", model_id="mock", temperature=0) == "answer:q|tools:"
+    assert len(mock_server.requests) == 2
+
+
+def test_cache_stores(tmp_path):
+    sqlite_path = str(tmp_path / "response_cache.db")
+    store = SqliteResponseCacheStore(sqlite_path)
+    store.set("a", "answer", ttl=60)
+    store.set("b", "expired", ttl=0.01)
+    store.close()
+
+    time.sleep(0.02)
+    # 重新打开后仍然可以命中
+    store = SqliteResponseCacheStore(sqlite_path)
+    assert store.get("a") == "answer"
+    assert store.get("b") is None
+    store.close()
+
+    store = InMemoryResponseCacheStore(max_size=2)
+    store.set("a", "1", ttl=60)
+    store.set("b", "2", ttl=60)
+    store.get("a")
+    store.set("c", "3", ttl=60)
+    # 淘汰最久未使用的 b
+    assert store.get("b") is None and store.get("a") == "1" and store.get("c") == "3"
+
+    params = {"model": "m", "messages": [{"role": "user", "content": "q"}], "temperature": 0, "stream": True}
+    assert ResponseCache.make_key(params) == ResponseCache.make_key({**params, "stream": False})
+    assert ResponseCache.make_key(params) != ResponseCache.make_key({**params, "temperature": 0.5})
+
+
+@pytest.mark.llm_invoke(response_cache=ResponseCache())
+async def test_truncated_answer_not_cached(mock_server, llm_invoke):
+    # 被 max_completion_tokens 截断（finish_reason 为 length）的回答不写入缓存
+    for is_stream in (False, True, False):
+        answer = await llm_invoke.invoke(
+            user_prompt="q", model_id="mock", temperature=0, max_completion_tokens=5, is_stream=is_stream
+        )
+        assert (await collect(answer) if is_stream else answer) == "answe"
+    assert len(mock_server.requests) == 3 and llm_invoke.response_cache.get_stats().size == 0
+
+
+async def test_finish_only_resolves_owned_request():
+    cache = ResponseCache(inflight_timeout=0.05)
+    owner = cache.begin("k")
+    # 等待超时后自行请求模型的调用方不持有进行中的请求，结束时不能唤醒或移除其他调用方的请求
+    assert await cache.wait_inflight("k") is None and cache.begin("k") is None
+    await cache.finish("k", "late", None)
+    assert cache.is_inflight("k") and not owner.done()
+
+    waiter = asyncio.create_task(cache.wait_inflight("k"))
+    await asyncio.sleep(0)
+    await cache.finish("k", "answer", owner)
+    assert await waiter == "answer" and not cache.is_inflight("k")
+
+
+async def test_sqlite_store_off_event_loop(tmp_path, monkeypatch, mock_server):
+    threads = []
+    to_thread = asyncio.to_thread
+
+    async def record_to_thread(func, *args):
+        threads.append(func.__name__)
+        return await to_thread(func, *args)
+
+    monkeypatch.setattr(asyncio, "to_thread", record_to_thread)
+    # 存储依赖 tmp_path，不通过 llm_invoke 标记传入
+    cache = ResponseCache(SqliteResponseCacheStore(str(tmp_path / "response_cache.db")))
+    llm_invoke = OpenAILLMInvoke(api_key="xxx", base_url=mock_server.base_url, response_cache=cache)
+    for _ in range(2):
+        assert await llm_invoke.invoke(user_prompt="q", model_id="mock", temperature=0) == "answer:q|tools:"
+    # sqlite 的读写都在线程中执行
+    assert threads == ["get", "set", "get"] and len(mock_server.requests) == 1
+    await llm_invoke.llm_client.close()
+    cache.close()
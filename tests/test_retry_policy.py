@@ -0,0 +1,137 @@
+import asyncio
+import time
+
+import httpx
+import openai
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+from engines.llm.circuit_breaker import CircuitBreaker
+from engines.llm.llm_schema import InvocationContext
+from engines.llm.openai_llm_invoke import OpenAILLMInvoke
+from engines.llm.retry_policy import RetryPolicy
+from utils.commons import get_uuid
+
+REQUEST = httpx.Request("POST", "http://mock/v1/chat/completions")
+
+COMPLETION = ChatCompletion.model_validate(
+    {
+        "id": "completion",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "mock",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+    }
+)
+
+
+def status_error(status_code: int, headers: dict | None = None) -> openai.APIStatusError:
+    response = httpx.Response(status_code, headers=headers, request=REQUEST)
+    error_class = {400: openai.BadRequestError, 429: openai.RateLimitError}.get(status_code, openai.InternalServerError)
+    return error_class(f"status {status_code}", response=response, body=None)
+
+
+def mock_llm(monkeypatch, responses: list, **kwargs) -> tuple[OpenAILLMInvoke, list[dict]]:
+    # 每个测试使用不同的 base_url，避免共享熔断器的状态
+    llm_invoke = OpenAILLMInvoke(api_key="xxx", base_url=f"http://mock-{get_uuid()}/v1", **kwargs)
+    requests = []
+
+    async def create(**params):
+        requests.append(params)
+        response = responses[min(len(requests), len(responses)) - 1]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(llm_invoke.llm_client.chat.completions, "create", create)
+    return llm_invoke, requests
+
+
+def test_retry_delay():
+    policy = RetryPolicy(base_delay=1, max_delay=4, max_retry_after=10)
+    assert policy.get_delay(0, status_error(429, {"retry-after": "3"})) == 3
+    assert policy.get_delay(0, status_error(503, {"retry-after-ms": "250"})) == 0.25
+    assert policy.get_delay(0, status_error(429, {"retry-after": "100"})) == 10
+    assert all(0 <= policy.get_delay(5) <= 4 for _ in range(100))
+
+    assert policy.is_retryable(status_error(429))
+    assert policy.is_retryable(openai.APIConnectionError(request=REQUEST))
+    assert not policy.is_retryable(status_error(400))
+    assert not policy.is_retryable(ValueError())
+
+
+async def test_invoke_retries_transient_errors(monkeypatch):
+    responses = [status_error(429, {"retry-after": "0.1"}), status_error(502), COMPLETION]
+    llm_invoke, requests = mock_llm(monkeypatch, responses, retry_policy=RetryPolicy(base_delay=0.01))
+    ctx = InvocationContext()
+
+    start_time = time.monotonic()
+    assert await llm_invoke.invoke(user_prompt="hi", model_id="mock", context=ctx) == "ok"
+    assert time.monotonic() - start_time >= 0.1
+    assert len(requests) == 3
+    assert ctx.retry_count == 2 and ctx.tool_round == 0
+
+    # 参数错误不重试
+    llm_invoke, requests = mock_llm(monkeypatch, [status_error(400), COMPLETION])
+    assert await llm_invoke.invoke(user_prompt="hi", model_id="mock") is None
+    assert len(requests) == 1
+
+
+async def test_stream_not_restarted_after_first_chunk(monkeypatch):
+    class FailingStream:
+        def __init__(self):
+            self.chunks = 0
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            self.chunks += 1
+            if self.chunks > 2:
+                raise openai.APIConnectionError(request=REQUEST)
+            return ChatCompletionChunk.model_validate(
+                {
+                    "id": "chunk",
+                    "object": "chat.completion.chunk",
+                    "created": 0,
+                    "model": "mock",
+                    "choices": [{"index": 0, "delta": {"content": "a"}, "finish_reason": None}],
+                }
+            )
+
+        async def close(self):
+            pass
+
+    # 第一个 chunk 之前的错误重试，之后的错误不重新发起请求
+    responses = [openai.APIConnectionError(request=REQUEST), FailingStream()]
+    llm_invoke, requests = mock_llm(monkeypatch, responses, retry_policy=RetryPolicy(base_delay=0.01))
+    res = await llm_invoke.invoke(user_prompt="hi", model_id="mock", is_stream=True)
+    content = ""
+    try:
+        async for chunk in res:
+            content += chunk
+    except openai.APIConnectionError:
+        pass
+    assert content == "aa"
+    assert len(requests) == 2
+
+
+async def test_circuit_breaker(monkeypatch):
+    breaker = CircuitBreaker("mock", failure_threshold=2, recovery_timeout=0.1)
+    llm_invoke, requests = mock_llm(
+        monkeypatch,
+        [status_error(503)] * 2 + [COMPLETION],
+        retry_policy=RetryPolicy(max_retries=0),
+        circuit_breaker=breaker,
+    )
+
+    assert await llm_invoke.invoke(user_prompt="hi", model_id="mock") is None
+    assert await llm_invoke.invoke(user_prompt="hi", model_id="mock") is None
+    assert breaker.state == "open"
+    # 熔断中直接失败，不发送请求
+    assert await llm_invoke.invoke(user_prompt="hi", model_id="mock") is None
+    assert len(requests) == 2
+
+    await asyncio.sleep(0.1)
+    assert breaker.state == "half_open"
+    assert await llm_invoke.invoke(user_prompt="hi", model_id="mock") == "ok"
+    assert breaker.state == "closed"
@@ -0,0 +1,101 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import ClassVar
+
+import pytest
+
+from engines.tools.tool_services.web_search.schemas import SearchHttpConfig
+from engines.tools.tool_services.web_search.serper_google_search import SerperGoogleSearch
+from engines.tools.tool_services.web_search.zhipu_search import ZhipuSearch
+from engines.tools.tool_services.web_search_factory import WebSearchFactory
+
+
+class StubSearchHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 支持 keep-alive
+    connection_count = 0
+    requests: ClassVar[list[dict]] = []
+
+    def setup(self):
+        super().setup()
+        StubSearchHandler.connection_count += 1
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        StubSearchHandler.requests.append({"path": self.path, "headers": dict(self.headers), "body": body})
+        if self.path == "/search":
+            query = body["q"]
+            result = {
+                "organic": [
+                    {"title": f"{query}-{i}", "link": f"https://a.com/{i}", "snippet": "s", "position": i}
+                    for i in range(1, 4)
+                ]
+            }
+        else:
+            query = body["search_query"]
+            result = {
+                "search_result": [{"title": f"{query}-1", "link": "https://b.com", "content": "c", "refer": "ref_1"}]
+            }
+        data = json.dumps(result).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    StubSearchHandler.connection_count = 0
+    StubSearchHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubSearchHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+async def test_serper_asearch_reuses_connection(stub_server):
+    search = SerperGoogleSearch(api_key="test", base_url=stub_server, search_params={"num": 3})
+    for i in range(5):
+        result = await search.asearch(f"q{i}")
+        assert result.search_engine == "serper"
+        assert [res.title for res in result.results] == [f"q{i}-1", f"q{i}-2", f"q{i}-3"]
+    await search.aclose()
+
+    # 5 次请求复用同一个 keep-alive 连接
+    assert StubSearchHandler.connection_count == 1
+    body = StubSearchHandler.requests[0]["body"]
+    assert body == {"q": "q0", "gl": "cn", "hl": "zh-cn", "num": 3}
+    assert StubSearchHandler.requests[0]["headers"]["X-API-KEY"] == "test"
+
+
+def test_serper_sync_search(stub_server):
+    search = SerperGoogleSearch(api_key="test", base_url=stub_server, http_config=SearchHttpConfig(pool_size=2))
+    assert len(search.search("a").results) == 3
+    assert len(search.search("b").results) == 3
+    search.close()
+    assert StubSearchHandler.connection_count == 1
+
+
+async def test_zhipu_asearch(stub_server):
+    search = ZhipuSearch(api_key="test", base_url=stub_server)
+    result = await search.asearch("q")
+    await search.aclose()
+
+    assert result.search_engine == "zhipu"
+    assert result.results[0].title == "q-1"
+    assert result.results[0].position == 1
+    assert StubSearchHandler.requests[0]["path"] == "/web_search"
+    assert StubSearchHandler.requests[0]["headers"]["Authorization"] == "Bearer test"
+
+
+def test_factory_shared_instance():
+    assert WebSearchFactory.get_search_instance("serper") is WebSearchFactory.get_search_instance("SERPER")
+    assert WebSearchFactory.get_search_instance("zhipu") is not WebSearchFactory.create_search_instance("zhipu")
+    with pytest.raises(ValueError):
+        WebSearchFactory.get_search_instance("bing")
@@ -0,0 +1,109 @@
+import asyncio
+
+from engines.tools.tool_services.web_search.base_search import BaseSearch
+from engines.tools.tool_services.web_search.cached_search import CachedSearch, SearchResultCache
+from engines.tools.tool_services.web_search.schemas import SearchResult, WebSearchResults
+
+
+class CountingSearch(BaseSearch):
+    engine_name = "counting"
+
+    def __init__(self, search_params: dict | None = None):
+        self.search_params = search_params or {}
+        self.call_count = 0
+
+    @property
+    def cache_params(self) -> dict:
+        return self.search_params
+
+    def search(self, query: str) -> WebSearchResults:
+        self.call_count += 1
+        return WebSearchResults(
+            search_engine=self.engine_name,
+            results=[SearchResult(title=query, link="https://a.com", content=str(self.call_count))],
+        )
+
+    async def asearch(self, query: str) -> WebSearchResults:
+        await asyncio.sleep(0.05)
+        return self.search(query)
+
+
+async def test_singleflight_coalesces_concurrent_searches():
+    upstream = CountingSearch()
+    cached = CachedSearch(upstream, SearchResultCache())
+
+    results = await asyncio.gather(*[cached.asearch("北京 天气") for _ in range(50)])
+
+    assert upstream.call_count == 1
+    assert all(res.results[0].title == "北京 天气" for res in results)
+    stats = cached.cache.get_stats()
+    assert stats.misses == 1
+    assert stats.coalesced == 49
+
+    # 规范化后相同的查询直接命中缓存
+    await cached.asearch("  北京   天气 ")
+    assert upstream.call_count == 1
+    assert cached.cache.get_stats().hits == 1
+
+
+def test_cache_key_includes_search_params():
+    cache = SearchResultCache()
+    assert cache.make_key("serper", "Query", {"num": 10}) == cache.make_key("serper", " query ", {"num": 10})
+    assert cache.make_key("serper", "query", {"num": 10}) != cache.make_key("serper", "query", {"num": 5})
+    assert cache.make_key("serper", "query") != cache.make_key("zhipu", "query")
+
+
+def test_lru_eviction_and_ttl():
+    upstream = CountingSearch()
+    cached = CachedSearch(upstream, SearchResultCache(max_size=2, ttl=600))
+    for query in ["a", "b", "a", "c", "a", "b"]:
+        cached.search(query)
+
+    # "b" 在插入 "c" 时被淘汰，之后重新搜索
+    assert upstream.call_count == 4
+    assert cached.cache.get_stats().evictions == 2
+
+    expired = CachedSearch(upstream, SearchResultCache(ttl=-1))
+    expired.search("a")
+    expired.search("a")
+    assert expired.cache.get_stats().expirations == 1
+
+
+def test_sqlite_persistence(tmp_path):
+    sqlite_path = str(tmp_path / "search_cache.db")
+    upstream = CountingSearch()
+
+    cache = SearchResultCache(sqlite_path=sqlite_path)
+    CachedSearch(upstream, cache).search("a")
+    cache.close()
+
+    # 新的缓存实例（模拟进程重启）从 sqlite 中读取
+    cache = SearchResultCache(sqlite_path=sqlite_path)
+    result = CachedSearch(upstream, cache).search("a")
+    assert upstream.call_count == 1
+    assert result.results[0].title == "a"
+    assert cache.get_stats().hits == 1
+
+
+async def test_async_sqlite_persistence_off_loop(tmp_path, monkeypatch):
+    sqlite_path = str(tmp_path / "search_cache.db")
+    upstream = CountingSearch()
+    threads = []
+    to_thread = asyncio.to_thread
+
+    async def recording_to_thread(func, *args):
+        threads.append(func.__name__)
+        return await to_thread(func, *args)
+
+    monkeypatch.setattr(asyncio, "to_thread", recording_to_thread)
+    cache = SearchResultCache(sqlite_path=sqlite_path)
+    await CachedSearch(upstream, cache).asearch("a")
+    cache.close()
+
+    # sqlite 的读写都在线程中执行，重启后并发的相同搜索只读取一次 sqlite
+    cache = SearchResultCache(sqlite_path=sqlite_path)
+    cached = CachedSearch(upstream, cache)
+    results = await asyncio.gather(*[cached.asearch("a") for _ in range(5)])
+    assert upstream.call_count == 1 and all(result.results[0].title == "a" for result in results)
+    assert threads == ["_get_db", "_set_db", "_get_db"]
+    assert cache.get_stats().hits == 1 and cache.get_stats().coalesced == 4
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from engines.llm.conversation_registry import ConversationRegistry
+from engines.llm.openai_llm_invoke import global_conversation_registry
+from engines.llm.stop_signal import (
+    InMemoryPubSub,
+    InProcessStopSignalBackend,
+    PubSubStopSignalBackend,
+    UnixSocketStopSignalBackend,
+)
+
+
+async def wait_stopped(entry):
+    async with asyncio.timeout(1.0):
+        await entry.event.wait()
+    return entry.stopped
+
+
+async def test_in_process_backend():
+    registry = ConversationRegistry()
+    entry = registry.register("c1")
+    assert not await registry.stop("unknown")
+    assert await registry.stop("c1")
+    assert entry.stopped
+
+
+async def test_unix_socket_backend(tmp_path):
+    # 两个注册表模拟同一台机器上的两个进程
+    worker_a, worker_b = ConversationRegistry(), ConversationRegistry()
+    await worker_a.set_signal_backend(UnixSocketStopSignalBackend(str(tmp_path)))
+    await worker_b.set_signal_backend(UnixSocketStopSignalBackend(str(tmp_path)))
+
+    entry = worker_b.register("c1")
+    assert await worker_a.stop("c1")
+    assert await wait_stopped(entry)
+
+    # 已经退出的进程留下的 socket 文件在发送时被清理
+    stale_socket = tmp_path / "worker-0-stale.sock"
+    stale_backend = UnixSocketStopSignalBackend(str(tmp_path))
+    stale_backend.socket_path = stale_socket
+    await stale_backend.start(worker_a.stop_local)
+    stale_backend._loop.remove_reader(stale_backend._sock.fileno())
+    stale_backend._sock.close()
+    assert stale_socket.exists()
+    await worker_a.stop("c2")
+    assert not stale_socket.exists()
+
+    await worker_a.signal_backend.close()
+    await worker_b.signal_backend.close()
+    assert list(tmp_path.glob("*.sock")) == []
+
+
+async def test_pubsub_backend():
+    pubsub = InMemoryPubSub()
+    worker_a, worker_b = ConversationRegistry(), ConversationRegistry()
+    await worker_a.set_signal_backend(PubSubStopSignalBackend(pubsub))
+    await worker_b.set_signal_backend(PubSubStopSignalBackend(pubsub))
+
+    entry = worker_b.register("c1")
+    other_entry = worker_b.register("c2")
+    assert await worker_a.stop("c1")
+    assert await wait_stopped(entry)
+    assert not other_entry.stopped
+
+    await worker_a.signal_backend.close()
+    await worker_b.signal_backend.close()
+    assert not await worker_a.signal_backend.publish("c2")
+
+
+@pytest.mark.mock_server(token_interval=0.01)
+async def test_cross_worker_stream_stop(llm_invoke):
+    pubsub = InMemoryPubSub()
+    # global_conversation_registry 作为持有流式输出的进程，另一个注册表作为收到停止请求的进程
+    await global_conversation_registry.set_signal_backend(PubSubStopSignalBackend(pubsub))
+    other_worker = ConversationRegistry()
+    await other_worker.set_signal_backend(PubSubStopSignalBackend(pubsub))
+
+    res = await llm_invoke.invoke(user_prompt="x" * 2000, model_id="mock", is_stream=True, conversation_id="c1")
+    full_res = ""
+    async for content in res:
+        full_res += content
+        if len(full_res) == 20:
+            assert await other_worker.stop("c1")
+
+    assert len(full_res) < 100
+    await other_worker.signal_backend.close()
+    await global_conversation_registry.set_signal_backend(InProcessStopSignalBackend())
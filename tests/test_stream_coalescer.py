@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from engines.llm.stream_coalescer import StreamCoalescer, StreamOverflowError
+
+
+class Source:
+    """
+    按 (内容, 之前的等待时间) 依次返回的流式输出，记录读取进度和是否被关闭
+    """
+
+    def __init__(self, items: list[tuple[str, float]]):
+        self.items = items
+        self.produced = 0
+        self.closed = False
+
+    async def generate(self):
+        try:
+            for content, delay in self.items:
+                if delay:
+                    await asyncio.sleep(delay)
+                self.produced += 1
+                yield content
+        finally:
+            self.closed = True
+
+
+async def test_coalesce_by_bytes_and_time_window():
+    coalescer = StreamCoalescer(max_bytes=8, max_delay=0.05)
+    source = Source([("a", 0)] + [("b", 0.001)] * 20 + [("c", 0.2), ("d", 0)])
+    outputs = [content async for content in coalescer.coalesce(source.generate())]
+
+    assert "".join(outputs) == "a" + "b" * 20 + "cd"
+    # 第一个 chunk 立即返回；之后按字节数合并；上游停顿时不等到下一个 chunk，按时间窗口返回
+    assert outputs[0] == "a"
+    assert all(len(content) <= 8 for content in outputs[1:])
+    assert outputs[-1] == "cd" and outputs[-2].endswith("b")
+    stats = coalescer.get_stats()
+    assert stats.chunks == 23 and stats.flushes == len(outputs) < 10
+
+
+async def test_slow_consumer_overflow():
+    items = [("x" * 10, 0)] * 100
+
+    source = Source(items)
+    generator = StreamCoalescer(max_bytes=20, max_buffer_bytes=100).coalesce(source.generate())
+    received = []
+    with pytest.raises(StreamOverflowError):
+        async for content in generator:
+            received.append(content)
+            await asyncio.sleep(0.05)
+    # 不会无限缓冲，中止时关闭上游
+    assert source.closed and source.produced < 20
+    assert len("".join(received)) <= 100 + 10
+
+    source = Source(items)
+    coalescer = StreamCoalescer(max_bytes=20, max_buffer_bytes=100, overflow="block")
+    received = []
+    async for content in coalescer.coalesce(source.generate()):
+        received.append(content)
+        # 暂停读取上游，已读取但未取走的内容不超过 max_buffer_bytes
+        assert (source.produced * 10) - len("".join(received)) <= 100
+        await asyncio.sleep(0.01)
+    assert "".join(received) == "x" * 1000 and coalescer.get_stats().blocked > 0
+
+
+@pytest.mark.mock_server(chunk_size=1, token_interval=0.002)
+@pytest.mark.llm_invoke(stream_coalescer=StreamCoalescer(max_bytes=64, max_delay=0.03))
+async def test_invoke_with_stream_coalescer(llm_invoke):
+    generator = await llm_invoke.invoke(user_prompt="q" * 40, model_id="mock", is_stream=True)
+    outputs = [content async for content in generator]
+    assert "".join(outputs) == f"answer:{'q' * 40}|tools:"
+    assert outputs[0] == "a" and len(outputs) < 10
+
+    generator = await llm_invoke.invoke(user_prompt="q" * 40, model_id="mock", is_stream=True, coalesce_stream=False)
+    assert len([content async for content in generator]) == len("answer:|tools:") + 40
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from engines.llm.stream_hub import StreamHub, StreamOffsetExpiredError
+
+
+async def generate(count: int, interval: float = 0.0):
+    for i in range(count):
+        if interval:
+            await asyncio.sleep(interval)
+        yield f"{i % 10}" * 10
+
+
+async def test_ring_buffer_offsets_and_eviction():
+    hub = StreamHub(max_streams=2, ttl=0.05, max_buffer_chars=50)
+    stream = hub.publish("c1", generate(100))
+    # 从中间的偏移量开始读取，已生成的内容一次返回
+    assert "".join([content async for content in hub.subscribe("c1", 985)]) == "8" * 5 + "9" * 10
+    assert stream.done and stream.end_offset == 1000 and 950 <= stream.start_offset <= 990
+    with pytest.raises(StreamOffsetExpiredError):
+        async for _ in hub.subscribe("c1", 0):
+            pass
+
+    hub.publish("c2", generate(100, 0.01))
+    hub.publish("c3", generate(1))
+    # 超出数量上限时移除已完成的 c1，进行中的 c2 不会被移除
+    assert "c1" not in hub and "c2" in hub and len(hub) == 2
+    # 完成超过 ttl 的流式输出在没有新的发布和订阅时同样会被移除
+    await asyncio.sleep(0.1)
+    assert "c3" not in hub and "c2" in hub
+    await hub.aclose()
+    assert len(hub) == 0
+
+
+async def test_republish_stops_previous_stream():
+    hub = StreamHub()
+    closed = []
+
+    async def slow_source():
+        try:
+            while True:
+                yield "x"
+                await asyncio.sleep(0.01)
+        finally:
+            closed.append(True)
+
+    previous = hub.publish("c1", slow_source())
+    subscriber = hub.subscribe("c1")
+    assert await anext(subscriber) == "x"
+    # 同一个会话 ID 重新发布时停止读取之前的上游，之前的订阅者随之结束
+    stream = hub.publish("c1", generate(1))
+    assert "".join([content async for content in subscriber]) == "x" * (previous.end_offset - 1)
+    assert previous.done and closed == [True] and hub.get("c1") is stream
+    await hub.aclose()
+
+
+@pytest.mark.mock_server(chunk_size=2, token_interval=0.01)
+@pytest.mark.llm_invoke(stream_hub=StreamHub())
+async def test_invoke_reconnect_and_multiple_subscribers(mock_server, llm_invoke):
+    expected = f"answer:{'q' * 20}|tools:"
+
+    generator = await llm_invoke.invoke(user_prompt="q" * 20, model_id="mock", is_stream=True, conversation_id="c1")
+    second_tab = llm_invoke.subscribe_stream("c1")
+    received = ""
+    async for content in generator:
+        received += content
+        if len(received) >= 6:
+            break
+    # 客户端断开后上游继续生成，重连时从已收到的位置继续读取
+    await generator.aclose()
+    await asyncio.sleep(0.05)
+    reconnected = llm_invoke.subscribe_stream("c1", offset=len(received))
+    received += "".join([content async for content in reconnected])
+
+    assert received == expected
+    assert "".join([content async for content in second_tab]) == expected
+    assert len(mock_server.requests) == 1 and mock_server.aborted_streams == 0
+    assert llm_invoke.subscribe_stream("missing") is None
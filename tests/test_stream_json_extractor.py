@@ -0,0 +1,60 @@
+import json
+
+from engines.llm.stream_json_extractor import StreamJsonExtractor
+
+
+def feed_all(extractor: StreamJsonExtractor, text: str, chunk_size: int) -> list:
+    events = []
+    for i in range(0, len(text), chunk_size):
+        events.extend(extractor.feed(text[i : i + chunk_size]))
+    return events
+
+
+def test_extractor_fields_and_final():
+    data = {"title": 'a {b} "c"', "items": [1, {"x": [2, 3]}], "summary": "long text " * 5, "ok": True}
+    text = f"好的，结果如下：\n```json\n{json.dumps(data, ensure_ascii=False)}\n```\n以上 {{说明}}"
+
+    for chunk_size in (1, 3, 7, len(text)):
+        extractor = StreamJsonExtractor()
+        events = feed_all(extractor, text, chunk_size)
+        fields = [(event.key, event.value) for event in events if event.type == "field"]
+        assert fields == list(data.items())
+        assert extractor.finish().data == data
+
+    # 长文本字段在输出过程中返回部分结果
+    extractor = StreamJsonExtractor()
+    partials = [event.data for event in feed_all(extractor, text, 5) if event.type == "partial"]
+    summary_partials = [partial["summary"] for partial in partials if "summary" in partial]
+    assert len(summary_partials) > 3
+    assert all(data["summary"].startswith(summary) for summary in summary_partials)
+
+
+def test_extractor_prose_braces_and_fallback():
+    # 说明文字中的 {name} 不是 json 对象，重新查找
+    extractor = StreamJsonExtractor()
+    events = feed_all(extractor, 'use {name} here: {"a": 1, "b": [1, 2]} done', 4)
+    assert [(event.key, event.value) for event in events if event.type == "field"] == [("a", 1), ("b", [1, 2])]
+    assert extractor.finish().data == {"a": 1, "b": [1, 2]}
+
+    # 一次输入包含大量说明文字中的 {}（如重连时一次返回的积压内容），重新查找不递归
+    extractor = StreamJsonExtractor()
+    events = extractor.feed("说明 {x} " * 2000 + '{"a": 1}')
+    assert [(event.key, event.value) for event in events if event.type == "field"] == [("a", 1)]
+    assert extractor.finish().data == {"a": 1}
+
+    # 截断的 json 返回已完整字段的部分结果，最终结果为空 dict
+    extractor = StreamJsonExtractor()
+    events = feed_all(extractor, '{"a": 1, "b": "unfinished', 3)
+    assert events[-1].data == {"a": 1, "b": "unfinished"}
+    assert extractor.finish().data == {}
+
+
+async def test_invoke_stream_is_dict(llm_invoke):
+    prompt = json.dumps({"a": "x" * 40, "b": [1, 2, 3]})
+    res = await llm_invoke.invoke(user_prompt=prompt, model_id="mock", is_stream=True, is_dict=True)
+    events = [event async for event in res]
+
+    assert [event.key for event in events if event.type == "field"] == ["a", "b"]
+    assert events[-1].type == "final"
+    assert events[-1].data == json.loads(prompt)
+    assert len([event for event in events if event.type == "partial"]) > 5
@@ -0,0 +1,102 @@
+import asyncio
+import time
+
+from openai.types.chat import ChatCompletionChunk
+
+from engines.llm.llm_schema import InvocationContext
+from engines.llm.openai_llm_invoke import OpenAILLMInvoke
+from engines.llm.tool_call_assembler import ToolCallAssembler
+from engines.tools import tool_functions
+from engines.tools.tool_services.tool_wrapper import tool_return
+
+
+def make_chunk(tool_calls: list[dict]) -> ChatCompletionChunk:
+    return ChatCompletionChunk.model_validate(
+        {
+            "id": "chunk",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "mock",
+            "choices": [{"index": 0, "delta": {"tool_calls": tool_calls}, "finish_reason": None}],
+        }
+    )
+
+
+def tool_delta(index: int, arguments: str = "", call_id: str | None = None, name: str | None = None) -> dict:
+    function = {"arguments": arguments}
+    if name:
+        function["name"] = name
+    return {"index": index, "id": call_id, "type": "function" if call_id else None, "function": function}
+
+
+def test_assembler_interleaved_tool_calls():
+    completed = []
+    assembler = ToolCallAssembler(on_complete=lambda tool_call: completed.append(tool_call.index))
+    deltas = [
+        tool_delta(0, call_id="call_0", name="web_search"),
+        tool_delta(1, call_id="call_1", name="web_search"),
+        tool_delta(0, '{"query": "a {'),
+        tool_delta(1, '{"query": "b\\"}'),
+        tool_delta(0, ' \\"x\\" }"'),
+        tool_delta(1, '"}'),
+        tool_delta(0, "}"),
+    ]
+    for delta in deltas:
+        assembler.feed(make_chunk([delta]).choices[0].delta.tool_calls)
+
+    # 字符串中的括号和转义的引号不影响参数完整性的判断，index 1 先完成
+    assert completed == [1, 0]
+    tool_calls = assembler.finish()
+    assert [tool_call.to_dict() for tool_call in tool_calls] == [
+        {
+            "id": "call_0",
+            "type": "function",
+            "function": {"name": "web_search", "arguments": '{"query": "a { \\"x\\" }"}'},
+        },
+        {"id": "call_1", "type": "function", "function": {"name": "web_search", "arguments": '{"query": "b\\"}"}'}},
+    ]
+
+
+def test_assembler_finish_completes_empty_arguments():
+    completed = []
+    assembler = ToolCallAssembler(on_complete=lambda tool_call: completed.append(tool_call.name))
+    assembler.feed(make_chunk([tool_delta(0, call_id="call_0", name="no_args")]).choices[0].delta.tool_calls)
+    assert completed == []
+    assert assembler.finish()[0].arguments == ""
+    assert completed == ["no_args"]
+
+
+async def test_stream_tool_call_dispatched_before_stream_ends(monkeypatch):
+    started = {}
+
+    @tool_return
+    async def slow_tool(name: str) -> str:
+        started[name] = time.perf_counter()
+        await asyncio.sleep(0.2)
+        return f"done:{name}"
+
+    monkeypatch.setattr(tool_functions, "slow_tool", slow_tool, raising=False)
+
+    async def llm_stream():
+        yield make_chunk([tool_delta(0, '"a"}')])
+        yield make_chunk([tool_delta(1, '{"name": "b"}', call_id="call_1", name="slow_tool")])
+        # 模拟模型继续输出的耗时，第一个工具在此期间已经开始执行
+        await asyncio.sleep(0.2)
+        yield make_chunk([tool_delta(1, "")])
+
+    llm_invoke = OpenAILLMInvoke(api_key="xxx", base_url="http://127.0.0.1:1")
+    first_deltas = make_chunk([tool_delta(0, '{"name": ', call_id="call_0", name="slow_tool")]).choices[0].delta
+
+    ctx = InvocationContext()
+    start_time = time.perf_counter()
+    await llm_invoke._tool_call_process(ctx, first_deltas.tool_calls, True, llm_stream())
+    elapsed = time.perf_counter() - start_time
+
+    assert started["a"] - start_time < 0.1
+    assert elapsed < 0.35
+    messages = ctx.tools_history_message.messages
+    assert [tool_call["id"] for tool_call in messages[0].tool_calls] == ["call_0", "call_1"]
+    assert [(message.tool_call_id, message.content) for message in messages[1:]] == [
+        ("call_0", "done:a"),
+        ("call_1", "done:b"),
+    ]
@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+from engines.llm.openai_llm_invoke import OpenAILLMInvoke
+from engines.tools.tool_services.tool_executor import ToolExecutor, global_tool_executor
+from engines.tools.tool_services.tool_wrapper import tool_return
+
+
+@tool_return
+def slow_sync_tool(query: str) -> tuple[str, dict]:
+    time.sleep(0.3)
+    return f"sync:{query}", {"query": query}
+
+
+@tool_return
+async def slow_async_tool(query: str) -> str:
+    await asyncio.sleep(0.3)
+    return f"async:{query}"
+
+
+@tool_return
+def error_tool() -> str:
+    raise RuntimeError("boom")
+
+
+async def test_execute_concurrent():
+    executor = ToolExecutor(max_workers=4)
+    calls = [
+        ("slow_sync_tool", slow_sync_tool, {"query": "a"}),
+        ("slow_async_tool", slow_async_tool, {"query": "b"}),
+        ("slow_sync_tool", slow_sync_tool, {"query": "c"}),
+    ]
+
+    start_time = time.perf_counter()
+    results = await asyncio.gather(*[executor.execute(*call) for call in calls])
+    elapsed = time.perf_counter() - start_time
+
+    assert [res.content for res in results] == ["sync:a", "async:b", "sync:c"]
+    assert results[0].origin_res == {"query": "a"}
+    assert results[1].origin_res is None
+    # 三个 0.3s 的工具并发执行，总耗时接近最慢的一个
+    assert elapsed < 0.6
+
+
+async def test_sync_tool_not_blocking_event_loop():
+    executor = ToolExecutor()
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        for _ in range(5):
+            await asyncio.sleep(0.04)
+            ticks += 1
+
+    await asyncio.gather(executor.execute("slow_sync_tool", slow_sync_tool, {"query": "a"}), ticker())
+    assert ticks == 5
+
+
+async def test_execute_timeout_and_error():
+    executor = ToolExecutor(default_timeout=5, tool_timeouts={"slow_async_tool": 0.05})
+    results = await asyncio.gather(
+        executor.execute("slow_async_tool", slow_async_tool, {"query": "a"}),
+        executor.execute("error_tool", error_tool, {}),
+        executor.execute("slow_sync_tool", slow_sync_tool, {"query": "b"}),
+    )
+
+    assert "超时" in results[0].error
+    assert "boom" in results[1].error
+    assert results[1].content == results[1].error
+    assert results[2].error is None
+
+
+def test_invoke_shares_default_executor():
+    # 未传入执行器的实例共用一个线程池，不随实例创建
+    executors = [OpenAILLMInvoke(api_key="xxx", base_url="http://127.0.0.1:1/v1").tool_executor for _ in range(2)]
+    assert executors == [global_tool_executor, global_tool_executor]
+    executor = ToolExecutor(max_workers=1)
+    assert (
+        OpenAILLMInvoke(api_key="xxx", base_url="http://127.0.0.1:1/v1", tool_executor=executor).tool_executor
+        is executor
+    )
+    executor.shutdown()
@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+from engines.llm.invoke_metrics import MetricsCollector
+from engines.llm.llm_schema import InvocationContext
+from engines.llm.openai_llm_invoke import OpenAILLMInvoke
+from engines.tools import tool_functions
+from engines.tools.tool_services.tool_memo import ToolMemoTable, global_tool_memo
+from engines.tools.tool_services.tool_wrapper import tool_memo, tool_return
+
+pytestmark = pytest.mark.echo_tool(delay=0.02, memo={"ttl": 0.2, "scope": "conversation"})
+
+
+@pytest.fixture
+def invocation_tool(monkeypatch, echo_tool):
+    """
+    invocation 作用域的工具函数，执行记录与 echo_tool 共用
+    """
+
+    @tool_memo(scope="invocation")
+    @tool_return
+    def invocation_tool(text: str) -> str:
+        echo_tool.calls.append(text)
+        return text
+
+    monkeypatch.setattr(tool_functions, "invocation_tool", invocation_tool, raising=False)
+    return invocation_tool
+
+
+def test_make_key_canonical():
+    assert ToolMemoTable.make_key("f", {"b": 1, "a": [1, "中"]}) == ToolMemoTable.make_key(
+        "f", {"a": [1, "中"], "b": 1}
+    )
+    assert ToolMemoTable.make_key("f", {"a": 1}) != ToolMemoTable.make_key("g", {"a": 1})
+
+
+async def test_memo_scopes(echo_tool, invocation_tool):
+    calls = echo_tool.calls
+    llm_invoke = OpenAILLMInvoke(api_key="xxx", base_url="http://127.0.0.1:1/v1", tool_memo=ToolMemoTable())
+
+    ctx = InvocationContext(conversation_id="c1")
+    # 同一轮中相同的调用只执行一次，参数顺序不影响
+    await llm_invoke.exec_tool_funcs(
+        ctx,
+        [
+            ("echo_tool", {"text": "a"}, "1"),
+            ("echo_tool", {"text": "a"}, "2"),
+            ("echo_tool", {"text": "error"}, "3"),
+            ("invocation_tool", {"text": "x"}, "4"),
+        ],
+    )
+    await llm_invoke.exec_tool_funcs(ctx, [("invocation_tool", {"text": "x"}, "5")])
+    assert sorted(calls) == ["a", "error", "x"]
+    assert [message.content for message in ctx.tools_history_message.messages] == [
+        "echo(a)",
+        "echo(a)",
+        "工具函数调用出错：error",
+        "x",
+        "x",
+    ]
+
+    # 同一个会话的后续调用复用结果，出错的结果和 invocation 作用域的结果不复用
+    await llm_invoke.exec_tool_funcs(
+        InvocationContext(conversation_id="c1"),
+        [
+            ("echo_tool", {"text": "a"}, "1"),
+            ("echo_tool", {"text": "error"}, "2"),
+            ("invocation_tool", {"text": "x"}, "3"),
+        ],
+    )
+    await llm_invoke.exec_tool_funcs(InvocationContext(conversation_id="c2"), [("echo_tool", {"text": "a"}, "1")])
+    assert sorted(calls[3:]) == ["a", "error", "x"] and len(calls) == 6
+
+    # 过期后重新执行
+    await asyncio.sleep(0.25)
+    await llm_invoke.exec_tool_funcs(InvocationContext(conversation_id="c1"), [("echo_tool", {"text": "a"}, "1")])
+    assert calls[-1] == "a" and len(calls) == 7
+
+    stats = llm_invoke.tool_memo.get_stats()
+    assert stats.hits == 2 and stats.coalesced == 1 and stats.saved == 3
+    assert stats.saved_seconds > 0.04 and stats.size == 2
+
+
+@pytest.mark.llm_invoke(hooks=[MetricsCollector()])
+async def test_invoke_reuses_tool_result(llm_invoke, echo_tool, echo_tool_param):
+    global_tool_memo.clear()
+    for _ in range(2):
+        answer = await llm_invoke.invoke(
+            user_prompt="tool:q", model_id="mock", tools=[echo_tool_param], conversation_id="c1"
+        )
+        assert answer == "answer:tool:q|tools:echo(tool:q)"
+
+    assert echo_tool.calls == ["tool:q"]
+    [metrics] = llm_invoke.hooks
+    assert metrics.get_counter("tool_calls_total", tool="echo_tool", status="ok") == 1
+    assert metrics.get_counter("tool_calls_total", tool="echo_tool", status="memoized") == 1
+
+
+async def test_conversation_memo_shared_across_instances(echo_tool):
+    calls = echo_tool.calls
+    global_tool_memo.clear()
+    # 按请求创建的实例默认共用 global_tool_memo，同一个会话的结果在实例之间复用
+    for _ in range(2):
+        llm_invoke = OpenAILLMInvoke(api_key="xxx", base_url="http://127.0.0.1:1/v1")
+        assert llm_invoke.tool_memo is global_tool_memo
+        ctx = InvocationContext(conversation_id="shared-memo")
+        await llm_invoke.exec_tool_funcs(ctx, [("echo_tool", {"text": "a"}, "1")])
+        assert ctx.tools_history_message.messages[-1].content == "echo(a)"
+    assert calls == ["a"]
+    await OpenAILLMInvoke(api_key="xxx", base_url="http://127.0.0.1:1/v1").exec_tool_funcs(
+        InvocationContext(conversation_id="other"), [("echo_tool", {"text": "a"}, "1")]
+    )
+    assert calls == ["a", "a"]
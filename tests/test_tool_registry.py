@@ -0,0 +1,78 @@
+import subprocess
+import sys
+from typing import Literal
+
+import pytest
+
+from engines.tools.tool_functions import get_web_search
+from engines.tools.tool_services.tool_registry import ToolRegistry, global_tool_registry
+
+
+def test_schema_from_type_hints_and_docstring():
+    registry = ToolRegistry(packages=())
+
+    @registry.register
+    def lookup(city: str, days: int = 3, unit: Literal["c", "f"] | None = None, tags: list[str] | None = None) -> str:
+        """
+        查询城市天气
+        :param city: 城市名称
+        :param days: 查询天数
+            最多 7 天
+        :param unit: 温度单位
+        :return: 天气信息
+        """
+        return city
+
+    tool = registry.get("lookup")
+    assert tool.func is lookup
+    assert tool.param.function.description == "查询城市天气"
+    assert tool.param.function.parameters == {
+        "type": "object",
+        "properties": {
+            "city": {"type": "string", "description": "城市名称"},
+            "days": {"type": "integer", "description": "查询天数 最多 7 天", "default": 3},
+            "unit": {"enum": ["c", "f"], "description": "温度单位"},
+            "tags": {"type": "array", "items": {"type": "string"}},
+        },
+        "required": ["city"],
+    }
+
+    registry.validate_arguments(tool, {"city": "北京", "days": 1})
+    with pytest.raises(ValueError, match="缺少参数：city"):
+        registry.validate_arguments(tool, {"days": 1})
+    with pytest.raises(ValueError, match="不支持参数：country"):
+        registry.validate_arguments(tool, {"city": "北京", "country": "中国"})
+
+
+def test_dump_tools_cached():
+    web_search_tool = get_web_search()
+    assert web_search_tool.function.parameters["required"] == ["query"]
+
+    dumped = global_tool_registry.dump_tools([web_search_tool])
+    # 相同的工具列表复用同一个序列化结果
+    assert global_tool_registry.dump_tools(["web_search"]) is dumped
+    assert dumped == [web_search_tool.model_dump()]
+
+    # 调用方自行构造的工具参数按原样序列化
+    custom_tool = web_search_tool.model_copy(deep=True)
+    custom_tool.function.description = "自定义描述"
+    assert global_tool_registry.dump_tools([custom_tool])[0]["function"]["description"] == "自定义描述"
+    with pytest.raises(ValueError):
+        global_tool_registry.dump_tools(["not_exists"])
+
+
+def test_import_does_not_load_tools():
+    code = (
+        "import sys, engines.llm.openai_llm_invoke;"
+        "print(any(name.startswith(('zhipuai', 'engines.tools.tool_functions')) for name in sys.modules))"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "False"
+
+
+async def test_invoke_unknown_tool_reported(llm_invoke):
+    # 工具函数不存在时与其他调用错误一样返回 None，事件流中返回 error 事件
+    assert await llm_invoke.invoke(user_prompt="tool:q", model_id="mock", tools=["not_exists"]) is None
+    generator = await llm_invoke.invoke(user_prompt="tool:q", model_id="mock", tools=["not_exists"], event_stream=True)
+    events = [event async for event in generator]
+    assert events[-1].type == "error" and "not_exists" in events[-1].error
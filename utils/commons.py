@@ -1,10 +1,20 @@
 from uuid import uuid4
 
 
-
 def get_uuid() -> str:
     """
     生成 str 类型的 32 位 uuid
     """
     return uuid4().hex
 
+
+def estimate_tokens(text: str) -> int:
+    """
+    离线快速估算文本的 token 数：中日韩等多字节字符按 1 个字符 1 个 token，其他字符按 4 个字符 1 个 token
+    通过 utf-8 编码后的字节数推算多字节字符数量，不逐字符遍历
+    """
+    if not text:
+        return 0
+    char_count = len(text)
+    multi_byte_count = (len(text.encode("utf-8")) - char_count) // 2
+    return multi_byte_count + (char_count - multi_byte_count + 3) // 4
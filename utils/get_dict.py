@@ -1,55 +1,86 @@
 import re
 import json
+from typing import Literal
 
+_DECODER = json.JSONDecoder()
+_FENCE_START = re.compile(r"```(?:json)?[ \t]*\r?\n", re.IGNORECASE)
+# 合法的对象以 {" 或 {} 开始（中间可以有空白），说明文字中的 { 不需要交给解析器
+_OBJECT_START = re.compile(r'\{\s*["}]')
+_OBJECT_OR_ARRAY_START = re.compile(r'\{\s*["}]|\[\s*[]"{\[\d\-tfn]')
 
-def get_dict(text: str) -> dict | None:
+
+def get_dict(
+    text: str,
+    *,
+    select: Literal["first", "largest"] = "first",
+    allow_array: bool = False,
+    prefer_fenced: bool = True,
+) -> dict | list:
     """
     尝试从一段包含 json 格式的文本中提取 dict 数据
+
+    从每个候选的 { 开始用 JSONDecoder.raw_decode 解析，解析失败时从出错位置之后查找下一个候选：
+    - 出错位置之前的内容都已经被当作 json 解析过，其中的 {（字符串中的括号、出错对象内部的子对象）不再作为候选
+    - 每个字符最多被解析一次，耗时与文本长度线性相关，不受 { 数量和嵌套层数影响
+    - 被截断的 json 在文本末尾出错，其中已经完整的子对象不会被当作结果
+
+    :param text: 模型输出的文本
+    :param select: first 返回第一个有效的对象，largest 返回文本最长的有效对象
+    :param allow_array: 是否同时提取 json 数组
+    :param prefer_fenced: 是否优先从 ```json 代码块中提取
+    :return: 提取到的 dict（allow_array 为 True 时也可能是 list）
     """
-    # 方式1：find
-    start_pos = text.find("{")
-    end_pos = text.rfind("}") + 1
-    if 0 <= start_pos < end_pos:
-        json_str = text[start_pos:end_pos]
-        try:
-            parsed = json.loads(json_str)
-            return parsed
-        except json.JSONDecodeError:
-            pass
+    if prefer_fenced:
+        for block in _iter_fenced_blocks(text):
+            parsed = _extract(block, select, allow_array)
+            if parsed is not None:
+                return parsed
 
-    # 方式2，正则
-    match = re.search(r"\{.*\}", text, re.DOTALL)
-    if match:
-        potential_json = match.group(0)
+    parsed = _extract(text, select, allow_array)
+    if parsed is not None:
+        return parsed
+    raise ValueError("无法从文本中提取到有效的 JSON 数据")
+
+
+def _iter_fenced_blocks(text: str):
+    """
+    依次返回 ```json 或不带语言标记的代码块内容
+    """
+    pos = text.find("```")
+    while pos >= 0:
+        end = text.find("```", pos + 3)
+        if end < 0:
+            return
+        match = _FENCE_START.match(text, pos)
+        if match:
+            yield text[match.end() : end]
+        pos = text.find("```", end + 3)
+
+
+def _find_start(text: str, pos: int, allow_array: bool) -> int:
+    match = (_OBJECT_OR_ARRAY_START if allow_array else _OBJECT_START).search(text, pos)
+    return match.start() if match else -1
+
+
+def _extract(text: str, select: str, allow_array: bool) -> dict | list | None:
+    result = None
+    result_length = -1
+    start = _find_start(text, 0, allow_array)
+    while start >= 0:
         try:
-            # 验证是否是有效的JSON
-            parsed = json.loads(potential_json)
-            return parsed
-        except json.JSONDecodeError:
-            pass
-
-    # 方式3：遍历
-    brace_count = 0
-    start_pos = None
-
-    for i, char in enumerate(text):
-        if char == "{":
-            if brace_count == 0:
-                # 第一个 { 位置
-                start_pos = i
-            # 遇到 {，所有存在一层{}，数量 +1
-            brace_count += 1
-        elif char == "}":
-            # 遇到 }，所有从存放 {} 数量的 brace_count 中 -1
-            brace_count -= 1
-            # 减到最后，已经遍历了所有的 {}
-            if brace_count == 0 and start_pos is not None:
-                # 找到第一个 { 到最后一个 } 之间的内容
-                json_candidate = text[start_pos : i + 1]
-                try:
-                    parsed = json.loads(json_candidate)
-                    return parsed
-                except json.JSONDecodeError:
-                    pass
+            parsed, end = _DECODER.raw_decode(text, start)
+        except json.JSONDecodeError as e:
+            # e.pos 之前的内容都是合法的 json 前缀，从出错位置继续查找（出错位置本身可能就是下一个 {）
+            start = _find_start(text, max(start + 1, e.pos), allow_array)
+            continue
+        except RecursionError:
+            # 嵌套层数超出解析器的限制
+            start = _find_start(text, start + 1, allow_array)
+            continue
 
-    raise ValueError("无法从文本中提取到有效的 JSON 数据")
+        if select == "first":
+            return parsed
+        if end - start > result_length:
+            result, result_length = parsed, end - start
+        start = _find_start(text, end, allow_array)
+    return result
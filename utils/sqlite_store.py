@@ -0,0 +1,94 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+
+class SqliteDatabase:
+    """
+    在多个线程间共用的 sqlite 连接，所有读写加锁，多个进程可以共用同一个文件
+    sqlite 的读写会阻塞，异步调用方通过 arun 在线程中执行，不阻塞事件循环
+    """
+
+    def __init__(self, sqlite_path: str, schema: str):
+        """
+        :param sqlite_path: sqlite 文件路径
+        :param schema: 建表语句，打开时执行
+        """
+        self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.execute(schema)
+
+    def query(self, sql: str, params: tuple = ()) -> list[tuple]:
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def execute(self, sql: str, params: tuple = ()):
+        with self._lock:
+            self._db.execute(sql, params)
+            self._db.commit()
+
+    def transaction(self, func: Callable[[sqlite3.Connection], Any]) -> Any:
+        """
+        在同一次加锁中执行 func(connection) 并提交，用于需要先读后写的多条语句
+        """
+        with self._lock:
+            result = func(self._db)
+            self._db.commit()
+        return result
+
+    @staticmethod
+    async def arun(func: Callable[..., Any], *args) -> Any:
+        return await asyncio.to_thread(func, *args)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class SqliteKVStore(SqliteDatabase):
+    """
+    sqlite 键值存储，每个条目带有过期时间（time.time 的时间戳）
+    过期的条目不会被读取，每写入 purge_interval 次删除一次
+    """
+
+    def __init__(self, sqlite_path: str, table: str, purge_interval: int = 100):
+        """
+        :param table: 表名，同一个文件可以保存多个存储
+        :param purge_interval: 每写入多少次清理一次过期的条目
+        """
+        self.table = table
+        self.purge_interval = purge_interval
+        self._writes = 0
+        super().__init__(
+            sqlite_path,
+            f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, expire_at REAL)",
+        )
+
+    def get(self, key: str) -> tuple[str, float] | None:
+        """
+        返回未过期的 (值, 过期时间)，不存在或已过期时返回 None
+        """
+        rows = self.query(
+            f"SELECT value, expire_at FROM {self.table} WHERE key = ? AND expire_at > ?", (key, time.time())
+        )
+        return rows[0] if rows else None
+
+    def set(self, key: str, value: str, expire_at: float):
+        def write(db: sqlite3.Connection):
+            db.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expire_at) VALUES (?, ?, ?)", (key, value, expire_at)
+            )
+            self._writes += 1
+            if self._writes % self.purge_interval == 0:
+                db.execute(f"DELETE FROM {self.table} WHERE expire_at <= ?", (time.time(),))
+
+        self.transaction(write)
+
+    def size(self) -> int:
+        return self.query(f"SELECT COUNT(*) FROM {self.table}")[0][0]
+
+    def clear(self):
+        self.execute(f"DELETE FROM {self.table}")
@@ -0,0 +1,66 @@
+import math
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any
+
+
+class TTLLRUCache:
+    """
+    带过期时间的 LRU 缓存：超过 max_size 时淘汰最久未使用的条目，过期的条目在读取时删除
+    不加锁，跨线程使用时由调用方加锁；evictions 和 expirations 为累计淘汰和过期删除的条目数
+    """
+
+    def __init__(self, max_size: int, clock: Callable[[], float] = time.monotonic):
+        """
+        :param max_size: 最多保存的条目数
+        :param clock: 计算过期时间的时钟，与其他存储共用过期时间戳时传入 time.time
+        """
+        if max_size <= 0:
+            raise ValueError(f"max_size 必须大于 0，当前为 {max_size}")
+        self.max_size = max_size
+        self.clock = clock
+        self.evictions = 0
+        self.expirations = 0
+        self._items: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._items
+
+    def get(self, key: Hashable) -> Any:
+        """
+        返回未过期的值并标记为最近使用，不存在或已过期时返回 None
+        """
+        item = self._items.get(key)
+        if item is None:
+            return None
+        expire_at, value = item
+        if expire_at <= self.clock():
+            del self._items[key]
+            self.expirations += 1
+            return None
+        self._items.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None, expire_at: float | None = None):
+        """
+        :param ttl: 有效时间（秒），与 expire_at 都为 None 时不过期
+        :param expire_at: 过期时间（clock 的时间戳），用于恢复其他存储中已有过期时间的条目
+        """
+        if expire_at is None:
+            expire_at = self.clock() + ttl if ttl is not None else math.inf
+        self._items[key] = (expire_at, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable) -> Any:
+        item = self._items.pop(key, None)
+        return item[1] if item is not None else None
+
+    def clear(self):
+        self._items.clear()